@@ -48,12 +48,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings include every other middleware
+    'tickets.middleware.QueryMetricsMiddleware',
+    # Before anything that may read the database, including the session saved on the way out
+    'tickets.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'tickets.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.middleware.CachedAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,6 +69,8 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'], 
         'APP_DIRS': True,
+        # No 'loaders' given, so Django wraps these in the cached loader: each template is compiled
+        # once per process (and recompiled on change by the development server).
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -86,6 +92,102 @@ DATABASES = {
     )
 }
 
+# Read replicas, comma-separated URLs (aliases replica1, replica2, ...). Requests read from one of them and
+# write to default; tests and management commands use default only. Any second database works for trying
+# it out locally, e.g. DATABASE_REPLICA_URLS=sqlite:////tmp/ugc-replica.sqlite3 on a copy of the primary.
+REPLICA_DATABASES = []
+for number, url in enumerate(env.list('DATABASE_REPLICA_URLS', default=[]), start=1):
+    REPLICA_DATABASES.append(f'replica{number}')
+    DATABASES[f'replica{number}'] = {**env.db_url_config(url), 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['tickets.routers.PrimaryReplicaRouter']
+# After a write, that browser reads the primary for this long (covers replication lag)
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+
+# Cache
+# 'tracking' holds serialized public tracking payloads. LocMemCache evicts least recently
+# used entries; for a cache shared between workers on one host use the LRU file backend:
+#   TRACKING_CACHE_BACKEND=tickets.cache.LRUFileBasedCache TRACKING_CACHE_LOCATION=/var/tmp/ugc-tracking
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ugc-default',
+    },
+    'tracking': {
+        'BACKEND': env('TRACKING_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('TRACKING_CACHE_LOCATION', default='ugc-tracking'),
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('TRACKING_CACHE_MAX_ENTRIES', default=5000),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+    # Submission rate-limit buckets; share it between workers (e.g. the LRU file backend) to limit across them
+    'throttle': {
+        'BACKEND': env('THROTTLE_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('THROTTLE_CACHE_LOCATION', default='ugc-throttle'),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+    # Session data and the per-user auth context (user + staff profile). The per-process default is only
+    # allowed with one worker (WEB_CONCURRENCY); with several, point it at a shared backend (memcached, Redis,
+    # or the LRU file backend on one host), which drops a logged-out session everywhere at once. Cached
+    # auth contexts are re-checked against AuthContextStamp on every request either way.
+    'sessions': {
+        'BACKEND': env('SESSION_CACHE_BACKEND', default='tickets.cache.BoundedLocMemCache'),
+        'LOCATION': env('SESSION_CACHE_LOCATION', default='ugc-sessions'),
+        'TIMEOUT': env.int('SESSION_CACHE_SECONDS', default=60),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    },
+}
+
+# Worker processes serving requests (gunicorn and uvicorn read the same variable); more than one needs shared caches
+WEB_WORKERS = env.int('WEB_CONCURRENCY', default=1)
+
+# Sessions are written through to the database and read from the 'sessions' cache
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Ticket submission limits: token buckets per client IP and per email address (burst, seconds per new token)
+SUBMISSION_IP_BURST = env.int('SUBMISSION_IP_BURST', default=30)
+SUBMISSION_IP_REFILL_SECONDS = env.float('SUBMISSION_IP_REFILL_SECONDS', default=6)
+SUBMISSION_EMAIL_BURST = env.int('SUBMISSION_EMAIL_BURST', default=5)
+SUBMISSION_EMAIL_REFILL_SECONDS = env.float('SUBMISSION_EMAIL_REFILL_SECONDS', default=120)
+# Behind a reverse proxy that sets X-Forwarded-For, key the IP bucket on the client address it reports
+THROTTLE_TRUST_X_FORWARDED_FOR = env.bool('THROTTLE_TRUST_X_FORWARDED_FOR', default=False)
+# Proxies of your own that append to X-Forwarded-For (load balancer + nginx = 2); the entry that many from the right is used
+THROTTLE_PROXY_HOPS = env.int('THROTTLE_PROXY_HOPS', default=1)
+# The same email, subject and message within this many minutes returns the existing reference
+SUBMISSION_DEDUP_MINUTES = env.int('SUBMISSION_DEDUP_MINUTES', default=10)
+
+# `manage.py archive_tickets` moves tickets resolved longer ago than this into the archive tables
+ARCHIVE_AFTER_DAYS = env.int('ARCHIVE_AFTER_DAYS', default=365)
+
+# Maildir directory or mbox file that `manage.py ingest_email_replies` reads emailed replies from
+INBOUND_EMAIL_SPOOL = env('INBOUND_EMAIL_SPOOL', default='')
+
+# Deleted tickets can be restored for this many days; `manage.py purge_deleted_tickets` then removes them for good
+TICKET_RESTORE_DAYS = env.int('TICKET_RESTORE_DAYS', default=30)
+
+# Seconds a worker trusts its in-memory map of active student/staff IDs before reloading it
+IDENTITY_CACHE_TTL = env.int('IDENTITY_CACHE_TTL', default=300)
+
+# Full-text search. Defaults to tsvector/GIN on PostgreSQL and the SearchPosting inverted index elsewhere.
+TICKET_SEARCH_BACKEND = env('TICKET_SEARCH_BACKEND', default=None)
+
+# Live dashboard events (served over ASGI: `uvicorn core.asgi:application`)
+# InMemoryBroker only reaches clients of the same process; use PostgresBroker with several workers.
+TICKET_EVENTS_BACKEND = env('TICKET_EVENTS_BACKEND', default='tickets.events.InMemoryBroker')
+
+# Serve the public intake and tracking endpoints with their async views (core/asgi.py turns this on)
+ASYNC_PUBLIC_VIEWS = env.bool('ASYNC_PUBLIC_VIEWS', default=False)
+# Longest a ?since=&wait= thread poll is held open by the async views; keep it below proxy read timeouts
+THREAD_LONG_POLL_SECONDS = env.int('THREAD_LONG_POLL_SECONDS', default=25)
+
+# Request metrics, scraped from /metrics/ (send `Authorization: Bearer $METRICS_TOKEN`).
+# Requests slower than the threshold are logged by 'tickets.metrics' with their slowest SQL.
+METRICS_TOKEN = env('METRICS_TOKEN', default=None)
+METRICS_SLOW_REQUEST_SECONDS = env.float('METRICS_SLOW_REQUEST_SECONDS', default=1.0)
+METRICS_N_PLUS_ONE_THRESHOLD = env.int('METRICS_N_PLUS_ONE_THRESHOLD', default=5)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -107,8 +209,15 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# WhiteNoise storage
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# WhiteNoise storage: content-hashed, pre-compressed files that browsers may cache indefinitely.
+# {% static %} resolves names through the manifest, so run collectstatic before serving with DEBUG off.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+
+# Home, enquiry and tracking pages are cached whole, here and in browsers, for this long
+PUBLIC_PAGE_CACHE_SECONDS = env.int('PUBLIC_PAGE_CACHE_SECONDS', default=600)
 
 # --- EMAIL NOTIFICATION CONFIGURATION ---
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -120,6 +229,14 @@ EMAIL_HOST_USER = env('EMAIL_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_PASSWORD') 
 DEFAULT_FROM_EMAIL = f"UGC Support <{EMAIL_HOST_USER}>"
 
+# --- OUTBOUND EMAIL QUEUE (drained by `manage.py send_queued_emails --loop`) ---
+OUTBOX_BATCH_SIZE = 50
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_RETRY_BASE_SECONDS = 30
+OUTBOX_RETRY_MAX_SECONDS = 3600
+# A batch claimed by a worker that dies is picked up again after this long; keep it above a batch's send time
+OUTBOX_LEASE_SECONDS = 300
+
 # --- UNIVERSITY NOTIFICATION SETTINGS ---
 UNIVERSITY_CENTRAL_EMAIL = 'university-enquiries@ugc.edu.gh'
 
@@ -1,23 +1,40 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 # We import the functions directly here
 from tickets.views import (
     submit_ticket, 
+    asubmit_ticket,
     home, 
     public_enquiry, 
     login_view, 
     logout_view, 
     track_status,
+    csrf_cookie,
     track_query,
+    atrack_query,
     staff_dashboard,
+    department_reports,
+    dashboard_tickets,
+    dashboard_events,
+    export_tickets,
+    ticket_search,
+    metrics,
     submit_reply,
     user_reply,
     update_status,
     delete_ticket,
     bulk_delete_tickets,
-    get_messages
+    restore_deleted_tickets,
+    bulk_update,
+    get_messages,
+    aget_messages,
 )
 
+# Under ASGI the public intake and tracking endpoints, and thread polling, are served by their async views
+if settings.ASYNC_PUBLIC_VIEWS:
+    submit_ticket, track_query, get_messages = asubmit_ticket, atrack_query, aget_messages
+
 # --- UGC ADMIN BRANDING ---
 admin.site.site_header = "UGC Admin Portal"
 admin.site.site_title = "UGC Admin"
@@ -31,6 +48,7 @@ urlpatterns = [
     path('', home, name='home'),
     path('public-enquiry/', public_enquiry, name='public_enquiry'),
     path('track-enquiry/', track_status, name='track_enquiry'),
+    path('csrf/', csrf_cookie, name='csrf_cookie'),
     
     # Authentication
     path('login/', login_view, name='login'),
@@ -38,13 +56,21 @@ urlpatterns = [
     
     # Staff Area
     path('dashboard/', staff_dashboard, name='staff_dashboard'),
+    path('dashboard/reports/', department_reports, name='department_reports'),
+    path('api/dashboard/tickets/', dashboard_tickets, name='dashboard_tickets'),
+    path('api/dashboard/events/', dashboard_events, name='dashboard_events'),
+    path('api/export/tickets/', export_tickets, name='export_tickets'),
+    path('api/search/', ticket_search, name='ticket_search'),
+    path('metrics/', metrics, name='metrics'),
     
     # Status Updates
     path('update-status/<int:ticket_id>/', update_status, name='update_status'),
+    path('api/tickets/bulk-update/', bulk_update, name='bulk_update'),
     
     # Delete Actions
     path('delete-ticket/<int:ticket_id>/', delete_ticket, name='delete_ticket'),
     path('bulk-delete-tickets/', bulk_delete_tickets, name='bulk_delete_tickets'),
+    path('restore-tickets/', restore_deleted_tickets, name='restore_tickets'),
     
     # --- REPLY & CONVERSATION ENDPOINTS ---
     path('get-messages/<int:ticket_id>/', get_messages, name='get_messages'), 
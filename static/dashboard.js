@@ -0,0 +1,575 @@
+// Per-user values rendered into the page by staff_dashboard
+const DASHBOARD = JSON.parse(document.getElementById('dashboard-config').textContent);
+const CSRF_TOKEN = DASHBOARD.csrf_token;
+
+let activeTicketData = {};
+let deleteTargetId = null;
+let selectedParentMessageId = null; 
+let messagesMap = {}; 
+let threadCursor = 0;
+let threadGeneration = 0;
+const LONG_POLL_SECONDS = 25;
+const POLL_INTERVAL_MS = 15000;
+
+function showToast(message, title = "System Update", type = "success") {
+    const toast = document.getElementById('replyToast');
+    const icon = document.getElementById('toastIcon');
+    const titleEl = document.getElementById('toastTitle');
+    const messageEl = document.getElementById('toastMessage');
+
+    toast.classList.remove('toast-delete', 'show');
+    void toast.offsetWidth; 
+
+    if (type === "delete" || type === "deleted" || type === "error") {
+        toast.classList.add('toast-delete');
+        icon.innerText = "✕"; 
+        titleEl.style.color = "var(--error)";
+    } else {
+        icon.innerText = "✓";
+        titleEl.style.color = "var(--gold)";
+    }
+
+    titleEl.innerText = title;
+    messageEl.innerHTML = message;
+
+    toast.classList.add('show');
+    setTimeout(() => toast.classList.remove('show'), 4500);
+}
+
+function confirmDelete(id) {
+    deleteTargetId = id;
+    document.querySelector('#deleteConfirmModal .delete-modal-text').innerText = `Delete this record? It can be restored for ${DASHBOARD.restore_days} days.`;
+    document.getElementById('confirmDeleteBtn').onclick = executeDelete;
+    document.getElementById('deleteConfirmModal').style.display = 'flex';
+}
+
+function closeDeleteModal() {
+    document.getElementById('deleteConfirmModal').style.display = 'none';
+    deleteTargetId = null;
+}
+
+async function executeDelete() {
+    const id = deleteTargetId;
+    closeDeleteModal();
+    try {
+        const response = await fetch(window.location.origin + `/delete-ticket/${id}/`, {
+            headers: { 
+                'X-CSRFToken': CSRF_TOKEN,
+                'Content-Type': 'application/json'
+            }
+        });
+
+        if (!response.ok) {
+            showToast(`Server Error: ${response.status}`, "Request Failed", "error");
+            return;
+        }
+
+        const data = await response.json();
+
+        if (data.status === 'deleted') {
+            const row = document.getElementById(`row-${id}`);
+            if (row) {
+                row.style.background = "rgba(255, 77, 77, 0.15)";
+                row.style.opacity = '0.3';
+                row.style.pointerEvents = 'none';
+                row.style.transition = "0.5s ease";
+                setTimeout(() => row.remove(), 1000);
+            }
+            showToast((data.message || "Record deleted.") + undoLink(data.ticket_ids), "Ticket Deleted", "delete");
+            const countEl = document.getElementById('countPending');
+            if (countEl) countEl.innerText = Math.max(0, parseInt(countEl.innerText) - 1);
+        } else { 
+            showToast(data.message || "Action Denied.", "System Error", "error");
+        }
+    } catch (err) { 
+        showToast(`Debug: ${err.message}`, "Connection Error", "error");
+    }
+}
+
+async function handleBulkDelete() {
+    const selectedIds = Array.from(document.querySelectorAll('.ticket-checkbox:checked')).map(cb => cb.value);
+    if (selectedIds.length === 0) return;
+
+    document.querySelector('#deleteConfirmModal .delete-modal-text').innerText = `DELETE ${selectedIds.length} RECORDS? They can be restored for ${DASHBOARD.restore_days} days.`;
+    document.getElementById('confirmDeleteBtn').onclick = async () => {
+        closeDeleteModal();
+        try {
+            const response = await fetch(window.location.origin + `/bulk-delete-tickets/`, {
+                method: 'POST',
+                headers: {
+                    'X-CSRFToken': CSRF_TOKEN,
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ ticket_ids: selectedIds })
+            });
+
+            if (!response.ok) {
+                showToast(`Server Error: ${response.status}`, "Bulk Failed", "error");
+                return;
+            }
+
+            const data = await response.json();
+            if (data.status === 'deleted') {
+                showToast(`${data.ticket_ids.length} records deleted.` + undoLink(data.ticket_ids), "Bulk Delete Complete", "delete");
+                setTimeout(reloadTickets, 1500);
+            } else { 
+                showToast("Bulk operation denied.", "System Error", "error"); 
+            }
+        } catch (err) { 
+            showToast(`Debug: ${err.message}`, "Network Error", "error"); 
+        }
+    };
+    document.getElementById('deleteConfirmModal').style.display = 'flex';
+}
+
+function undoLink(ids) {
+    return ` <a href="#" class="toast-undo" onclick="restoreTickets([${ids.map(Number).join(',')}]); return false;">Undo</a>`;
+}
+
+async function restoreTickets(ids) {
+    try {
+        const response = await fetch(`/restore-tickets/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': CSRF_TOKEN,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ ticket_ids: ids })
+        });
+        const data = await response.json();
+        if (!response.ok || data.status !== 'success') {
+            showToast(data.message || `Restore failed: ${response.status}`, "Server Error", "error");
+            return;
+        }
+        showToast(`${data.restored.length} ticket(s) restored.`, "Restored", "success");
+        reloadTickets();
+    } catch (err) { showToast(`Debug: ${err.message}`, "Network Error", "error"); }
+}
+
+async function handleBulkUpdate() {
+    const selectedIds = Array.from(document.querySelectorAll('.ticket-checkbox:checked')).map(cb => cb.value);
+    const status = document.getElementById('bulkStatus').value;
+    const department = document.getElementById('bulkDepartment').value;
+    if (selectedIds.length === 0) return;
+    if (!status && !department) {
+        showToast("Choose a status or a department first.", "Bulk Update", "error");
+        return;
+    }
+
+    try {
+        // One request for the whole selection; the server applies it in a single UPDATE
+        const response = await fetch('/api/tickets/bulk-update/', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': CSRF_TOKEN,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ ticket_ids: selectedIds, status: status, department: department })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            showToast(data.message || `Server Error: ${response.status}`, "Bulk Failed", "error");
+            return;
+        }
+        const skipped = data.skipped.length ? ` ${data.skipped.length} outside your department skipped.` : '';
+        showToast(`${data.updated.length} tickets updated.${skipped}`, "Bulk Update Complete", "success");
+        document.getElementById('bulkStatus').value = '';
+        document.getElementById('bulkDepartment').value = '';
+        setTimeout(reloadTickets, 800);
+    } catch (err) {
+        showToast(`Debug: ${err.message}`, "Network Error", "error");
+    }
+}
+
+async function openModal(id, msg, formattedId, email, name) {
+    activeTicketData = { id, formattedId, email, name };
+    document.getElementById('replyEmail').innerText = `To: ${email}`;
+    document.getElementById('replyTo').innerText = `Ref: ${formattedId}`;
+    const container = document.getElementById('messageThreadContainer');
+    container.innerHTML = "<p style='color:var(--gold); font-size:10px;'>Fetching conversation history...</p>";
+
+    clearQuote();
+    document.getElementById('replyModal').style.display = 'flex';
+    const generation = ++threadGeneration;
+
+    try {
+        const res = await fetch(`/get-messages/${id}/`);
+        const data = await res.json();
+        if (generation !== threadGeneration) return;
+
+        messagesMap = {}; 
+        if(data.messages && data.messages.length > 0) {
+            container.innerHTML = "";
+            data.messages.forEach(appendThreadEntry);
+            container.scrollTop = container.scrollHeight;
+        } else {
+            container.innerHTML = `<div class="thread-entry"><div class="thread-msg">${msg}</div></div>`;
+        }
+        threadCursor = data.cursor || 0;
+        pollThread(id, generation);
+    } catch(e) { 
+        container.innerHTML = `<div class="thread-entry"><div class="thread-msg">${msg}</div></div>`;
+    }
+}
+
+function appendThreadEntry(m) {
+    const container = document.getElementById('messageThreadContainer');
+    if (Object.keys(messagesMap).length === 0) container.innerHTML = "";
+    messagesMap[m.id] = m.message; 
+
+    let contextHtml = "";
+    if(m.parent_id && messagesMap[m.parent_id]) {
+        contextHtml = `<div class="staff-reply-context">Replying to: "${messagesMap[m.parent_id].substring(0, 40)}..."</div>`;
+    }
+
+    const entry = document.createElement('div');
+    entry.className = "thread-entry";
+    entry.innerHTML = `
+        <div class="thread-meta">
+            <span class="thread-sender">${m.sender_name} ${m.is_staff ? '(Staff)' : ''}</span>
+            <span>${m.created_at}</span>
+        </div>
+        ${contextHtml}
+        <div class="thread-msg">${m.message}</div>
+        <div style="text-align:right; margin-top:5px;">
+            <button type="button" class="btn-inline-reply" onclick="setReplyParent('${m.id}', '${m.message.replace(/'/g, "\\'").substring(0,60)}...')">Reply to this</button>
+        </div>
+    `;
+    container.appendChild(entry);
+}
+
+// While the modal is open, ask only for messages after threadCursor; under ASGI the server
+// holds each request until a reply arrives, under WSGI it answers at once and we pause.
+async function pollThread(id, generation) {
+    while (generation === threadGeneration) {
+        let delay = 0;
+        try {
+            const res = await fetch(`/get-messages/${id}/?since=${threadCursor}&wait=${LONG_POLL_SECONDS}`);
+            const data = await res.json();
+            if (generation !== threadGeneration) return;
+            if (!res.ok) return;
+            data.messages.forEach(m => { if (!messagesMap[m.id]) appendThreadEntry(m); });
+            if (data.messages.length) {
+                const container = document.getElementById('messageThreadContainer');
+                container.scrollTop = container.scrollHeight;
+            }
+            threadCursor = Math.max(threadCursor, data.cursor);
+            if (!data.messages.length && !data.long_poll) delay = POLL_INTERVAL_MS;
+        } catch (err) {
+            delay = POLL_INTERVAL_MS * 2;
+        }
+        if (delay) await new Promise(resolve => setTimeout(resolve, delay));
+    }
+}
+
+function setReplyParent(id, text) {
+    selectedParentMessageId = id;
+    document.getElementById('quoteText').innerText = text;
+    document.getElementById('quotePreview').style.display = 'block';
+    document.getElementById('replyText').focus();
+}
+
+function clearQuote() {
+    selectedParentMessageId = null;
+    document.getElementById('quotePreview').style.display = 'none';
+}
+
+function closeModal() {
+    threadGeneration++;
+    document.getElementById('replyModal').style.display = 'none';
+    document.getElementById('replyText').value = '';
+    clearQuote();
+}
+
+async function submitStaffReply() {
+    const replyText = document.getElementById('replyText').value.trim();
+    if (!replyText || !activeTicketData.id) return;
+
+    try {
+        const response = await fetch(`/submit-reply/${activeTicketData.id}/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': CSRF_TOKEN,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ 
+                'message': replyText,
+                'parent_id': selectedParentMessageId 
+            })
+        });
+        if (response.ok) {
+            closeModal();
+            showToast(`Response dispatched to <b>${escapeHtml(activeTicketData.name)}</b>`, "Reply Sent", "success");
+            setTimeout(reloadTickets, 1500);
+        } else {
+            showToast(`Reply failed: ${response.status}`, "Server Error", "error");
+        }
+    } catch (err) { showToast(`Debug: ${err.message}`, "Connection Error", "error"); }
+}
+
+function toggleSelectAll() {
+    const master = document.getElementById('selectAll');
+    const boxes = document.querySelectorAll('.ticket-checkbox');
+    boxes.forEach(box => box.checked = master.checked);
+    updateBulkBtn();
+}
+
+function updateBulkBtn() {
+    const selected = document.querySelectorAll('.ticket-checkbox:checked').length;
+    document.getElementById('bulkBar').style.display = selected > 0 ? 'flex' : 'none';
+    document.getElementById('bulkCount').innerText = `${selected} selected`;
+    const btn = document.getElementById('bulkDeleteBtn');
+    if(btn) {
+        btn.style.display = selected > 0 ? 'block' : 'none';
+        btn.innerText = `Delete Selected (${selected})`;
+    }
+}
+
+// --- SERVER-SIDE PAGINATED TICKET LIST ---
+const IS_SUPER_COMMAND = DASHBOARD.is_super_command;
+const PAGE_SIZE = DASHBOARD.page_size;
+let nextCursor = null;
+let nextPage = 1;
+let listExhausted = false;
+let listLoading = false;
+let listGeneration = 0;
+let searchTimer = null;
+
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+}
+
+function statusClass(status) {
+    if (status === 'Open') return 'status-open';
+    if (status === 'In-Progress') return 'status-progress';
+    return 'status-resolved';
+}
+
+function buildTicketRow(t) {
+    const row = document.createElement('tr');
+    row.className = 'ticket-row';
+    row.id = `row-${t.id}`;
+
+    const userReplied = t.last_reply_by === 'USER';
+    const accent = userReplied ? 'var(--error)' : 'var(--gold)';
+    const preview = t.snippet
+        ? `<span style="color: var(--gold);">Match:</span> ${escapeHtml(t.snippet)}`
+        : t.reply_message
+        ? `<span style="color: ${accent};">${userReplied ? 'User Response:' : `Latest Staff: (${escapeHtml(t.last_staff_name || 'Officer')})`}</span> ${escapeHtml(t.reply_message)}`
+        : escapeHtml(t.message);
+    const typeBg = t.user_type === 'STUDENT' ? '#2a5298' : (t.user_type === 'STAFF' ? '#c5a059' : '#333');
+    const typeFg = t.user_type === 'STAFF' ? '#000' : '#fff';
+    const identity = t.student_id || t.staff_id;
+    const statusOptions = ['Open', 'In-Progress', 'Resolved']
+        .map(s => `<option value="${s}" ${t.status === s ? 'selected' : ''}>${s}</option>`).join('');
+
+    row.innerHTML = `
+        <td class="check-col"><input type="checkbox" class="ticket-checkbox" value="${t.id}" onclick="updateBulkBtn()"></td>
+        <td style="font-weight: 700; color: var(--gold);" class="col-id">
+            ${escapeHtml(t.ref_id)}
+            ${userReplied ? '<span class="badge-new">NEW</span>' : ''}
+        </td>
+        <td class="col-subject">
+            <div style="max-width: 300px;">
+                <strong style="display: block; font-size: 0.9rem; margin-bottom: 4px;">${escapeHtml(t.subject)}</strong>
+                <small style="color: var(--text-muted); display: block; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; border-left: 2px solid ${accent}; padding-left: 8px;">${preview}</small>
+                <span style="font-size: 10px; color: #444;">Updated: ${escapeHtml(t.updated_display)}</span>
+            </div>
+        </td>
+        ${IS_SUPER_COMMAND ? `<td class="col-dept"><span class="dept-tag">${escapeHtml(t.department)}</span></td>` : ''}
+        <td class="col-sender">
+            <div style="line-height: 1.3;">
+                <strong style="color: #fff;">${escapeHtml(t.name)}</strong><br>
+                <span class="dept-tag" style="background: ${typeBg}; color: ${typeFg};">
+                    ${escapeHtml(t.user_type)} ${identity ? `(${escapeHtml(identity)})` : ''}
+                </span>
+            </div>
+        </td>
+        <td class="col-status">
+            <span class="status-pill ${statusClass(t.status)}">${escapeHtml(t.status)}</span>
+        </td>
+        <td class="action-cell">
+            <button class="btn-respond">Reply</button>
+            <select onchange="updateStatus('${t.id}', this.value)">${statusOptions}</select>
+            ${IS_SUPER_COMMAND ? `<button class="btn-delete" onclick="confirmDelete('${t.id}')">Delete</button>` : ''}
+        </td>
+    `;
+    row.querySelector('.btn-respond').onclick = () => openModal(String(t.id), t.message, t.ref_id, t.email, t.name);
+    return row;
+}
+
+function ticketQueryParams() {
+    const params = new URLSearchParams({ limit: PAGE_SIZE });
+    const search = document.getElementById('ticketSearch').value.trim();
+    const status = document.getElementById('statusFilter').value;
+    const deptFilterEl = document.getElementById('deptFilter');
+    if (search) params.set('q', search);
+    if (status) params.set('status', status);
+    if (deptFilterEl && deptFilterEl.value) params.set('department', deptFilterEl.value);
+    if (nextCursor) params.set('cursor', nextCursor);
+    return params;
+}
+
+function threadSearchActive() {
+    return document.getElementById('searchScope').value === 'threads'
+        && document.getElementById('ticketSearch').value.trim() !== '';
+}
+
+function listUrl() {
+    if (!threadSearchActive()) return `/api/dashboard/tickets/?${ticketQueryParams()}`;
+    // Ranked full-text search over whole conversations, paged by number
+    const params = ticketQueryParams();
+    params.delete('cursor');
+    params.delete('limit');
+    params.set('page', nextPage);
+    return `/api/search/?${params}`;
+}
+
+async function loadNextPage() {
+    if (listLoading || listExhausted) return;
+    listLoading = true;
+    const generation = listGeneration;
+    const statusEl = document.getElementById('ticketListStatus');
+    statusEl.innerText = 'Loading tickets...';
+
+    try {
+        const res = await fetch(listUrl());
+        const data = await res.json();
+        // A newer filter/search started while this page was in flight.
+        if (generation !== listGeneration) return;
+        if (!res.ok) {
+            statusEl.innerText = data.message || `Server Error: ${res.status}`;
+            listExhausted = true;
+            return;
+        }
+
+        const tbody = document.getElementById('ticketList');
+        if (data.results) {
+            data.results.forEach(t => tbody.appendChild(buildTicketRow(t)));
+            nextPage = data.next_page;
+            listExhausted = !nextPage;
+        } else {
+            data.tickets.forEach(t => tbody.appendChild(buildTicketRow(t)));
+            nextCursor = data.next_cursor;
+            listExhausted = !nextCursor;
+        }
+
+        if (!tbody.children.length) statusEl.innerText = 'No records found.';
+        else statusEl.innerText = listExhausted ? '' : 'Scroll for more...';
+    } catch (err) {
+        if (generation === listGeneration) statusEl.innerText = `Connection Error: ${err.message}`;
+    } finally {
+        if (generation === listGeneration) listLoading = false;
+    }
+}
+
+function reloadTickets() {
+    listGeneration++;
+    listLoading = false;
+    listExhausted = false;
+    nextCursor = null;
+    nextPage = 1;
+    document.getElementById('ticketList').innerHTML = '';
+    const master = document.getElementById('selectAll');
+    if (master) master.checked = false;
+    updateBulkBtn();
+    loadNextPage();
+}
+
+function scheduleSearch() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(reloadTickets, 300);
+}
+
+new IntersectionObserver(entries => {
+    if (entries.some(e => e.isIntersecting)) loadNextPage();
+}, { rootMargin: '400px' }).observe(document.getElementById('ticketListSentinel'));
+
+loadNextPage();
+
+// --- LIVE UPDATES (server-sent events over ASGI) ---
+const MY_DEPARTMENT = DASHBOARD.department;
+
+function rowMatchesFilters(t) {
+    const status = document.getElementById('statusFilter').value;
+    const deptFilterEl = document.getElementById('deptFilter');
+    if (MY_DEPARTMENT && t.department !== MY_DEPARTMENT) return false;
+    if (status && t.status !== status) return false;
+    if (deptFilterEl && deptFilterEl.value && t.department !== deptFilterEl.value) return false;
+    return true;
+}
+
+function applyTicketEvent(event) {
+    const t = event.ticket;
+    const existing = document.getElementById(`row-${t.id}`);
+    const tbody = document.getElementById('ticketList');
+
+    if (!rowMatchesFilters(t)) {
+        if (existing) existing.remove();
+        return;
+    }
+
+    const row = buildTicketRow(t);
+    if (existing) {
+        const box = existing.querySelector('.ticket-checkbox');
+        if (box && box.checked) row.querySelector('.ticket-checkbox').checked = true;
+    }
+    if (event.type === 'new_ticket' && !existing) {
+        const countEl = document.getElementById('countPending');
+        if (countEl) countEl.innerText = parseInt(countEl.innerText) + 1;
+    }
+
+    // Free-text matching lives on the server, so a searched list is only patched in place
+    if (document.getElementById('ticketSearch').value.trim()) {
+        if (existing) existing.replaceWith(row);
+        return;
+    }
+    // Otherwise most recently updated goes first, matching the server ordering
+    if (existing) existing.remove();
+    tbody.prepend(row);
+    if (tbody.children.length === 1) document.getElementById('ticketListStatus').innerText = '';
+}
+
+if (window.EventSource) {
+    const liveEvents = new EventSource('/api/dashboard/events/');
+    ['new_ticket', 'new_reply', 'status_changed', 'ticket_updated'].forEach(type => {
+        liveEvents.addEventListener(type, e => applyTicketEvent(JSON.parse(e.data)));
+    });
+    // Bulk updates arrive as one batch of the same per-ticket events
+    liveEvents.addEventListener('tickets_bulk_updated', e => JSON.parse(e.data).events.forEach(applyTicketEvent));
+    liveEvents.addEventListener('tickets_deleted', e => JSON.parse(e.data).ticket_ids.forEach(id => {
+        const row = document.getElementById(`row-${id}`);
+        if (row) row.remove();
+    }));
+    // 501 under WSGI: no live updates, the page keeps working from the paginated API
+    liveEvents.onerror = () => { if (liveEvents.readyState === EventSource.CLOSED) liveEvents.close(); };
+}
+
+async function updateStatus(id, newStatus) {
+    try {
+        const response = await fetch(`/update-status/${id}/`, {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': CSRF_TOKEN,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ 'status': newStatus })
+        });
+        if (response.ok) {
+            showToast(`Ticket status transitioned to ${newStatus}`, "Status Updated", "success");
+            setTimeout(reloadTickets, 800);
+        } else {
+            showToast(`Update failed: ${response.status}`, "Server Error", "error");
+        }
+    } catch (err) { showToast(`Debug: ${err.message}`, "Error", "error"); }
+}
+
+function exportTickets() {
+    // Streams every ticket matching the status/department filters, not just the loaded pages
+    const params = new URLSearchParams({ format: 'csv' });
+    const status = document.getElementById('statusFilter').value;
+    const deptFilterEl = document.getElementById('deptFilter');
+    if (status) params.set('status', status);
+    if (deptFilterEl && deptFilterEl.value) params.set('department', deptFilterEl.value);
+    window.location.href = `/api/export/tickets/?${params}`;
+}
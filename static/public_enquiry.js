@@ -0,0 +1,97 @@
+// Keeping all form/logic scripts exactly as requested
+function readCsrfCookie() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+// The page itself is cached and shared, so it carries no token; the cookie is fetched on first submit
+async function getCsrfToken(form) {
+    if (!readCsrfCookie()) await fetch(form.dataset.csrfUrl, { credentials: 'same-origin' });
+    return readCsrfCookie();
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    const form = document.getElementById('enquiryForm');
+    const btn = document.getElementById('submitBtn');
+    const formView = document.getElementById('formView');
+    const successView = document.getElementById('successView');
+    const heroContent = document.getElementById('heroContent');
+    const errorBox = document.getElementById('errorBox');
+    const errorMsg = document.getElementById('errorMsg');
+
+    if (!form) return;
+
+    form.addEventListener('submit', function(e) {
+        e.preventDefault();
+        errorBox.style.display = 'none';
+
+        if (typeof window.showLoader === "function") window.showLoader();
+
+        btn.innerText = "Processing...";
+        btn.disabled = true;
+
+        const ticketData = {
+            name: document.getElementById('formName').value,
+            email: document.getElementById('formEmail').value,
+            phone: document.getElementById('formPhone').value,
+            user_type: document.getElementById('userType').value,
+            student_id: document.getElementById('studentId').value,
+            staff_id: document.getElementById('staffId').value,
+            department: document.getElementById('formCategory').value,
+            subject: document.getElementById('formSubject').value,
+            message: document.getElementById('formMessage').value
+        };
+
+        getCsrfToken(form)
+        .then(token => fetch(form.dataset.action, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': token,
+                'Accept': 'application/json'
+            },
+            body: JSON.stringify(ticketData)
+        }))
+        .then(async response => {
+            const isJson = response.headers.get('content-type')?.includes('application/json');
+            const data = isJson ? await response.json() : null;
+            if (!response.ok) throw new Error(data ? data.message : 'Server error: ' + response.status);
+            return data;
+        })
+        .then(data => {
+            if (data && data.status === 'success') {
+                document.getElementById('sumName').innerText = data.name;
+                document.getElementById('sumCategory').innerText = ticketData.department;
+                document.getElementById('sumSubject').innerText = ticketData.subject;
+                document.getElementById('refNumDisplay').innerText = data.ref_id;
+                formView.style.display = 'none';
+                if (heroContent) heroContent.style.display = 'none'; 
+                successView.style.display = 'block';
+                window.scrollTo({ top: 0, behavior: 'smooth' });
+            } else {
+                errorMsg.innerText = "Error: " + (data.message || "Check your inputs.");
+                errorBox.style.display = 'block';
+                errorBox.scrollIntoView({ behavior: 'smooth', block: 'center' });
+            }
+        })
+        .catch(error => {
+            errorMsg.innerHTML = "<b>Validation Failed:</b> " + error.message;
+            errorBox.style.display = 'block';
+        })
+        .finally(() => {
+            if (typeof window.hideLoader === "function") window.hideLoader();
+            btn.innerText = "Submit Enquiry";
+            btn.disabled = false;
+        });
+    });
+});
+
+function toggleIdFields() {
+    const userType = document.getElementById('userType').value;
+    const studentGroup = document.getElementById('studentIdGroup');
+    const staffGroup = document.getElementById('staffIdGroup');
+    studentGroup.style.display = userType === 'student' ? 'flex' : 'none';
+    staffGroup.style.display = userType === 'staff' ? 'flex' : 'none';
+    document.getElementById('studentId').required = (userType === 'student');
+    document.getElementById('staffId').required = (userType === 'staff');
+}
@@ -0,0 +1,199 @@
+let currentTicketId = null;
+let activeParentId = null;
+let messagesMap = {}; 
+let currentRef = null;
+let threadCursor = 0;
+let threadArchived = false;
+let pollGeneration = 0;
+const LONG_POLL_SECONDS = 25;
+const POLL_INTERVAL_MS = 15000;
+
+function getCookie(name) {
+    let cookieValue = null;
+    if (document.cookie && document.cookie !== '') {
+        const cookies = document.cookie.split(';');
+        for (let i = 0; i < cookies.length; i++) {
+            const cookie = cookies[i].trim();
+            if (cookie.substring(0, name.length + 1) === (name + '=')) {
+                cookieValue = decodeURIComponent(cookie.substring(name.length + 1));
+                break;
+            }
+        }
+    }
+    return cookieValue;
+}
+
+window.addEventListener('load', function() {
+    const loader = document.getElementById('global-loader');
+    if(loader) {
+        loader.style.opacity = '0';
+        setTimeout(() => { loader.style.display = 'none'; }, 500);
+    }
+});
+
+async function trackTicket() {
+    const refInput = document.getElementById('refNumber').value.trim();
+    const resultArea = document.getElementById('resultArea');
+    const searchBox = document.getElementById('searchBox');
+    const chatThread = document.getElementById('chatThread');
+
+    if (!refInput) return;
+
+    try {
+        const response = await fetch(`/track-query/?ref=${encodeURIComponent(refInput)}`);
+        const data = await response.json();
+
+        if (data.error) {
+            Swal.fire({ icon: 'error', title: 'Not Found', text: data.error, background: '#141414', color: '#fff' });
+            return;
+        }
+
+        currentTicketId = data.id; 
+        currentRef = refInput;
+        threadArchived = Boolean(data.archived);
+        searchBox.style.display = 'none';
+        resultArea.style.display = 'block';
+
+        document.getElementById('ticketDetail').innerHTML = `
+            <p><strong>Ref ID:</strong> ${data.ref_id}</p>
+            <p><strong>Subject:</strong> ${data.subject}</p>
+            <p><strong>Status:</strong> <span id="ticketStatus" style="color: #d4af37">${data.status}</span></p>
+        `;
+
+        updateStepper(data.status);
+        // Archived tickets are read-only; new questions need a new enquiry
+        document.getElementById('userReplySection').style.display = data.archived ? 'none' : '';
+
+        chatThread.innerHTML = ''; 
+        messagesMap = {}; 
+
+        if (data.thread && data.thread.length > 0) {
+            data.thread.forEach(appendThreadMessage);
+        } else {
+            chatThread.innerHTML = `<p class="text-muted">No messages found.</p>`;
+        }
+
+        chatThread.scrollTop = chatThread.scrollHeight;
+
+        threadCursor = data.cursor || 0;
+        // Archived threads never change, so there is nothing to poll for
+        if (!data.archived) pollThread(++pollGeneration);
+
+    } catch (err) {
+        Swal.fire({ icon: 'error', title: 'Error', text: 'Server connection failed.', background: '#141414', color: '#fff' });
+    }
+}
+
+function appendThreadMessage(msg) {
+    const chatThread = document.getElementById('chatThread');
+    const isFirst = Object.keys(messagesMap).length === 0;
+    if (isFirst) chatThread.innerHTML = '';
+    messagesMap[msg.id] = msg.message;
+    const typeClass = msg.is_staff ? 'staff' : 'user';
+    const label = (isFirst && !msg.is_staff) ? "Original Enquiry" : (msg.is_staff ? "UGC OFFICER" : "YOU");
+
+    let parentQuote = "";
+    if(msg.parent_id && messagesMap[msg.parent_id]) {
+        const quoteText = messagesMap[msg.parent_id].substring(0, 60) + (messagesMap[msg.parent_id].length > 60 ? "..." : "");
+        parentQuote = `<div style="font-size: 0.75rem; border-left: 2px solid #d4af37; padding-left: 8px; margin-bottom: 8px; opacity: 0.6; font-style: italic; background: rgba(0,0,0,0.2); padding: 5px;">
+            Replying to: "${quoteText}"
+        </div>`;
+    }
+
+    chatThread.innerHTML += `
+        <div class="message-bubble ${typeClass}" id="msg-${msg.id}">
+            <span class="msg-meta">${label} • ${msg.timestamp}</span>
+            ${parentQuote}
+            <p class="msg-text">${msg.message}</p>
+            ${threadArchived ? '' : `<button class="btn-mini-reply" onclick="setReply(${msg.id})">Reply to this</button>`}
+        </div>
+    `;
+}
+
+// Fetches only the messages after threadCursor (plus the current status); with wait > 0 the
+// ASGI server holds the request until something happens, WSGI answers straight away.
+async function fetchThreadUpdates(wait) {
+    const response = await fetch(`/track-query/?ref=${encodeURIComponent(currentRef)}&since=${threadCursor}&wait=${wait}`);
+    const data = await response.json();
+    if (data.error) throw new Error(data.error);
+
+    const chatThread = document.getElementById('chatThread');
+    data.thread.forEach(msg => { if (!messagesMap[msg.id]) appendThreadMessage(msg); });
+    if (data.thread.length) chatThread.scrollTop = chatThread.scrollHeight;
+    threadCursor = Math.max(threadCursor, data.cursor);
+    document.getElementById('ticketStatus').innerText = data.status;
+    updateStepper(data.status);
+    return data;
+}
+
+async function pollThread(generation) {
+    while (generation === pollGeneration) {
+        let delay = 0;
+        try {
+            const data = await fetchThreadUpdates(LONG_POLL_SECONDS);
+            // Without long-polling, pause between empty polls instead of spinning
+            if (!data.thread.length && !data.long_poll) delay = POLL_INTERVAL_MS;
+        } catch (err) {
+            delay = POLL_INTERVAL_MS * 2;
+        }
+        if (delay) await new Promise(resolve => setTimeout(resolve, delay));
+    }
+}
+
+function setReply(id) {
+    activeParentId = id;
+    const fullText = messagesMap[id] || "";
+    const previewText = fullText.substring(0, 100) + (fullText.length > 100 ? "..." : "");
+    document.getElementById('replyIndicator').style.display = 'block';
+    document.getElementById('replyPreviewText').innerText = `"${previewText}"`;
+    document.getElementById('userReplyText').focus();
+    document.getElementById('userReplySection').scrollIntoView({ behavior: 'smooth' });
+}
+
+function cancelReply() {
+    activeParentId = null;
+    document.getElementById('replyIndicator').style.display = 'none';
+}
+
+function updateStepper(status) {
+    document.querySelectorAll('.step').forEach(s => s.classList.remove('active', 'completed'));
+    const s1 = document.getElementById('step1'), s2 = document.getElementById('step2'), s3 = document.getElementById('step3');
+    if (status === 'Open') s1.classList.add('active');
+    else if (status === 'In-Progress') { s1.classList.add('completed'); s2.classList.add('active'); }
+    else if (status === 'Resolved') { s1.classList.add('completed'); s2.classList.add('completed'); s3.classList.add('active'); }
+}
+
+async function submitUserReply() {
+    const msgInput = document.getElementById('userReplyText');
+    const msg = msgInput.value.trim();
+
+    if (!msg) {
+        Swal.fire({ icon: 'warning', title: 'Empty Message', text: 'Please type something.', background: '#141414', color: '#fff' });
+        return;
+    }
+
+    try {
+        const response = await fetch(`/user-reply/${currentTicketId}/`, {
+            method: 'POST',
+            headers: { 
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken')
+            },
+            body: JSON.stringify({ 
+                'message': msg,
+                'parent_id': activeParentId 
+            })
+        });
+
+        if (response.ok) {
+            msgInput.value = '';
+            cancelReply();
+            Swal.fire({ icon: 'success', title: 'Sent', timer: 1500, showConfirmButton: false, background: '#141414', color: '#fff' });
+            fetchThreadUpdates(0).catch(() => {});
+        } else {
+            throw new Error('Failed to send reply');
+        }
+    } catch (err) {
+        Swal.fire({ icon: 'error', title: 'Failed', text: err.message, background: '#141414', color: '#fff' });
+    }
+}
@@ -1,22 +1,77 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
 from import_export import resources, fields
 from import_export.admin import ExportActionMixin
-from .models import Ticket, StaffProfile, StudentMaster, StaffMaster, TicketMessage
+from django.utils import timezone
+from .importers import MasterListFormatError, import_master_list, iter_rows
+from .models import Ticket, StaffProfile, StudentMaster, StaffMaster, TicketMessage, OutboundEmail, ArchivedTicket, InboundEmail
+from .services import restore_tickets, soft_delete_tickets
 
 # --- 1. MASTER LIST MANAGEMENT ---
 
+class MasterListUploadForm(forms.Form):
+    file = forms.FileField(help_text="CSV or XLSX with a header row.")
+    deactivate_missing = forms.BooleanField(
+        required=False, initial=True,
+        help_text="Mark records that are not in the file as inactive.",
+    )
+
+class MasterListImportMixin:
+    """Adds an 'Import CSV/XLSX' page that streams a registrar file into the master list."""
+    import_kind = None
+    change_list_template = 'admin/tickets/master_list_change_list.html'
+
+    def get_urls(self):
+        custom = [
+            path('import/', self.admin_site.admin_view(self.import_view), name=f'tickets_{self.import_kind}_import'),
+        ]
+        return custom + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            return redirect('admin:index')
+
+        form = MasterListUploadForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_master_list(
+                    self.import_kind,
+                    iter_rows(upload.file, upload.name),
+                    deactivate_missing=form.cleaned_data['deactivate_missing'],
+                )
+            except MasterListFormatError as e:
+                self.message_user(request, str(e), messages.ERROR)
+                return redirect(f'admin:tickets_{self.model._meta.model_name}_changelist')
+            self.message_user(request, f"Import finished: {result.summary()}.", messages.SUCCESS)
+            for error in result.errors:
+                self.message_user(request, error, messages.WARNING)
+            return redirect(f'admin:tickets_{self.model._meta.model_name}_changelist')
+
+        return TemplateResponse(request, 'admin/tickets/import_master_list.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': f"Import {self.model._meta.verbose_name_plural}",
+        })
+
 @admin.register(StudentMaster)
-class StudentMasterAdmin(admin.ModelAdmin):
+class StudentMasterAdmin(MasterListImportMixin, admin.ModelAdmin):
+    import_kind = 'students'
     list_display = ('index_number', 'full_name', 'course', 'is_active', 'created_at')
     search_fields = ('index_number', 'full_name', 'email')
     list_filter = ('is_active', 'course')
     list_editable = ('is_active',)
 
 @admin.register(StaffMaster)
-class StaffMasterAdmin(admin.ModelAdmin):
+class StaffMasterAdmin(MasterListImportMixin, admin.ModelAdmin):
+    import_kind = 'staff'
     list_display = ('staff_id', 'full_name', 'email', 'is_active')
     search_fields = ('staff_id', 'full_name', 'email')
     list_filter = ('is_active',)
@@ -73,12 +128,30 @@ class TicketResource(resources.ModelResource):
 class TicketAdmin(ExportActionMixin, admin.ModelAdmin):
     resource_class = TicketResource
     list_display = ('formatted_id', 'name', 'user_type', 'colored_status', 'colored_reply_by', 'colored_dept', 'id_verified', 'updated_at')
-    list_filter = ('user_type', 'department', 'status', 'last_reply_by', 'created_at')
+    list_filter = ('user_type', 'department', 'status', 'last_reply_by', 'created_at', ('deleted_at', admin.EmptyFieldListFilter))
     search_fields = ('name', 'subject', 'email', 'student_id', 'staff_id')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('message_count', 'last_staff_name', 'last_activity_at', 'created_at', 'updated_at', 'deleted_at')
+    actions = ['restore_selected']
     
     inlines = [TicketMessageInline]
 
+    def get_queryset(self, request):
+        # Deleted tickets stay listed (filter on "Deleted at") until purge_deleted_tickets removes them
+        queryset = Ticket.all_objects.all()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    def delete_model(self, request, obj):
+        soft_delete_tickets(Ticket.objects.filter(id=obj.id))
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_tickets(Ticket.objects.filter(id__in=queryset.values('id')))
+
+    @admin.action(description="Restore selected deleted tickets")
+    def restore_selected(self, request, queryset):
+        restored = restore_tickets(queryset.values_list('id', flat=True))
+        self.message_user(request, f"{len(restored)} tickets restored.")
+
     def colored_reply_by(self, obj):
         """Highlights USER replies in Gold."""
         if obj.last_reply_by == "USER":
@@ -120,4 +193,55 @@ class TicketAdmin(ExportActionMixin, admin.ModelAdmin):
 class StaffProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'department', 'role', 'staff_email')
     search_fields = ('user__username', 'department', 'staff_email')
-    list_filter = ('department', 'role')
\ No newline at end of file
+    list_filter = ('department', 'role')
+
+# --- 7. OUTBOUND EMAIL QUEUE ---
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipient_list', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('subject', 'body', 'recipients', 'attempts', 'last_error', 'created_at', 'sent_at')
+    ordering = ('-created_at',)
+    actions = ['retry_now']
+
+    def recipient_list(self, obj):
+        return ", ".join(obj.recipients)
+    recipient_list.short_description = 'To'
+
+    @admin.action(description="Retry selected emails now")
+    def retry_now(self, request, queryset):
+        # An email being sent right now is left to its worker
+        updated = queryset.exclude(status__in=('SENT', 'SENDING')).update(status='PENDING', next_attempt_at=timezone.now())
+        self.message_user(request, f"{updated} emails re-queued.")
+
+# --- 8. ARCHIVE (read-only) ---
+
+@admin.register(ArchivedTicket)
+class ArchivedTicketAdmin(admin.ModelAdmin):
+    list_display = ('formatted_id', 'name', 'department', 'status', 'resolved_at', 'archived_at')
+    list_filter = ('department', 'archived_at')
+    search_fields = ('=id', 'name', 'email', 'subject')
+    ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# --- 9. INBOUND EMAIL LOG (read-only) ---
+
+@admin.register(InboundEmail)
+class InboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'sender', 'ticket_id', 'outcome', 'received_at')
+    list_filter = ('outcome', 'received_at')
+    search_fields = ('=ticket_id', 'sender', 'subject', 'message_id')
+    ordering = ('-received_at',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
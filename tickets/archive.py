@@ -0,0 +1,77 @@
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Ticket, TicketMessage, ArchivedTicket, ArchivedTicketMessage
+from .purge import delete_tickets
+from .tracking import invalidate_tracking
+
+
+def archive_after_days():
+    return getattr(settings, 'ARCHIVE_AFTER_DAYS', 365)
+
+
+def archivable(cutoff):
+    """Resolved tickets last resolved before the cutoff (tickets older than resolved_at go by updated_at)."""
+    return Ticket.objects.filter(status='Resolved').filter(
+        Q(resolved_at__lt=cutoff) | Q(resolved_at__isnull=True, updated_at__lt=cutoff)
+    )
+
+
+def archive_batch(ticket_ids, cutoff, compress=False):
+    """Moves these tickets and their threads into the archive in one transaction.
+
+    The rows are locked and re-checked first, so a ticket reopened since it
+    was picked stays live. Returns (tickets, messages) archived.
+    """
+    with transaction.atomic():
+        tickets = list(
+            archivable(cutoff).select_for_update().filter(id__in=ticket_ids).values(*ArchivedTicket.COPIED_FIELDS)
+        )
+        if not tickets:
+            return 0, 0
+        ids = [t['id'] for t in tickets]
+        messages = list(
+            TicketMessage.objects.filter(ticket_id__in=ids)
+            .order_by('ticket_id', 'created_at', 'id')
+            .values('ticket_id', *ArchivedTicketMessage.THREAD_COLUMNS)
+        )
+        threads = {
+            ticket_id: [{k: v for k, v in row.items() if k != 'ticket_id'} for row in rows]
+            for ticket_id, rows in groupby(messages, key=lambda row: row['ticket_id'])
+        }
+
+        archived = [ArchivedTicket(**values) for values in tickets]
+        if compress:
+            for ticket in archived:
+                ticket.thread_data = ArchivedTicket.compress_thread(threads.get(ticket.id, []))
+        ArchivedTicket.objects.bulk_create(archived, batch_size=1000)
+        if not compress:
+            ArchivedTicketMessage.objects.bulk_create(
+                [ArchivedTicketMessage(**row) for row in messages],
+                batch_size=2000,
+            )
+
+        # The live thread and search entries go with plain DELETEs, as in purge_batch
+        delete_tickets(ids)
+        transaction.on_commit(lambda: invalidate_tracking(*ids))
+    return len(ids), len(messages)
+
+
+def archive_resolved(older_than_days=None, batch_size=500, compress=False, limit=None):
+    """Archives resolved tickets in batches, oldest ids first; yields (tickets, messages) per batch."""
+    days = archive_after_days() if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    archived = 0
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        ids = list(archivable(cutoff).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            return
+        tickets, messages = archive_batch(ids, cutoff, compress=compress)
+        archived += tickets
+        yield tickets, messages
@@ -0,0 +1,139 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import auth
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import F
+from django.utils.crypto import constant_time_compare
+
+from .models import AuthContextStamp, StaffProfile
+
+CACHED_SESSION_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+def context_cache_alias():
+    return getattr(settings, 'AUTH_CONTEXT_CACHE_ALIAS', 'sessions')
+
+
+def context_cache():
+    return caches[context_cache_alias()]
+
+
+def check_shared_caches():
+    """Refuses per-process session and auth context caches when several workers serve requests.
+
+    A logout or deactivation only clears the cache of the worker that
+    handled it; with LocMemCache every other worker would keep accepting
+    the old session until its entry expired.
+    """
+    if getattr(settings, 'WEB_WORKERS', 1) <= 1:
+        return
+    aliases = {context_cache_alias()}
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        aliases.add(settings.SESSION_CACHE_ALIAS)
+    local = sorted(alias for alias in aliases if isinstance(caches[alias], LocMemCache))
+    if local:
+        raise ImproperlyConfigured(
+            f"WEB_CONCURRENCY is {settings.WEB_WORKERS} but the {', '.join(local)} cache is per process; "
+            "set SESSION_CACHE_BACKEND to a shared backend (memcached, Redis, or tickets.cache.LRUFileBasedCache on one host)."
+        )
+
+
+def context_key(user_id):
+    return f"auth-context:{user_id}"
+
+
+def staff_profile(user):
+    """(department, role) of the user's StaffProfile, or None; read at most once per user object."""
+    if not hasattr(user, '_staff_profile'):
+        user._staff_profile = StaffProfile.objects.filter(user_id=user.pk).values_list('department', 'role').first()
+    return user._staff_profile
+
+
+def current_stamp():
+    """The AuthContextStamp version, read from the primary so a replica's lag cannot delay a revocation."""
+    return AuthContextStamp.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+async def acurrent_stamp():
+    return await AuthContextStamp.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).values_list('version', flat=True).afirst() or 0
+
+
+def bump_stamp():
+    """Retires every cached auth context; called inside the transaction that changes a user or profile."""
+    if not AuthContextStamp.objects.filter(pk=1).update(version=F('version') + 1):
+        AuthContextStamp.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def verified(request, user, backend_path):
+    """The checks auth.get_user makes on a freshly loaded user, applied to a cached one."""
+    return (
+        backend_path in settings.AUTHENTICATION_BACKENDS
+        and user.is_active
+        and constant_time_compare(request.session.get(HASH_SESSION_KEY) or '', user.get_session_auth_hash())
+    )
+
+
+def load_user(request):
+    """request.user, with its staff profile, from the context cache; auth.get_user() on a miss.
+
+    The entry is the user object itself, carrying the (department, role)
+    read by staff_profile, stored with the AuthContextStamp version it was
+    loaded at. A warm request makes one auth query, for that one-row stamp;
+    the session comes from cache as well with cached_db sessions. An entry
+    older than the stamp is reloaded, so is_active, is_superuser and the
+    department are never older than the last change committed anywhere. A
+    session whose auth hash no longer matches (password changed) goes
+    through auth.get_user, which logs it out.
+    """
+    user_id, backend_path = request.session.get(SESSION_KEY), request.session.get(BACKEND_SESSION_KEY)
+    if user_id is None:
+        return auth.get_user(request)
+    cache = context_cache()
+    # Read before the user is loaded, so an entry is never stamped newer than its data
+    stamp = current_stamp()
+    entry = cache.get(context_key(user_id))
+    if entry is not None and entry[0] == stamp and verified(request, entry[1], backend_path):
+        return entry[1]
+
+    user = auth.get_user(request)
+    if user.is_authenticated:
+        staff_profile(user)
+        cache.set(context_key(user.pk), (stamp, user))
+    return user
+
+
+async def aload_user(request):
+    user_id, backend_path = await request.session.aget(SESSION_KEY), await request.session.aget(BACKEND_SESSION_KEY)
+    if user_id is None:
+        return await auth.aget_user(request)
+    cache = context_cache()
+    stamp = await acurrent_stamp()
+    entry = await cache.aget(context_key(user_id))
+    if entry is not None and entry[0] == stamp and verified(request, entry[1], backend_path):
+        return entry[1]
+
+    user = await auth.aget_user(request)
+    if user.is_authenticated:
+        await sync_to_async(staff_profile)(user)
+        await cache.aset(context_key(user.pk), (stamp, user))
+    return user
+
+
+def get_user(request):
+    if not hasattr(request, '_cached_user'):
+        request._cached_user = load_user(request)
+    return request._cached_user
+
+
+async def auser(request):
+    if not hasattr(request, '_acached_user'):
+        request._acached_user = await aload_user(request)
+    return request._acached_user
+
+
+def invalidate_auth_context(*user_ids):
+    context_cache().delete_many([context_key(user_id) for user_id in user_ids])
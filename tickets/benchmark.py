@@ -0,0 +1,401 @@
+import itertools
+import json
+import random
+import subprocess
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.utils import timezone
+
+from .models import Ticket, TicketMessage, StudentMaster, StaffMaster, StaffProfile
+
+BENCH_DEPARTMENT = 'Finance'
+BENCH_PASSWORD = 'bench-pass'
+
+# Pages render with DEBUG off but without a collectstatic manifest, so {% static %} must not hash names
+PLAIN_STATIC_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+# --- SYNTHETIC DATA ---
+
+@dataclass
+class Volumes:
+    students: int = 5000
+    staff: int = 500
+    tickets: int = 5000
+    messages_per_ticket: int = 4
+
+
+def seed(volumes, rng):
+    """Bulk-loads a synthetic dataset and returns the ids the scenarios draw from."""
+    departments = [value for value, _ in Ticket.DEPARTMENT_CHOICES]
+    StudentMaster.objects.bulk_create(
+        [StudentMaster(index_number=f"BENCH-STU-{i:07d}", full_name=f"Student {i}") for i in range(volumes.students)],
+        batch_size=2000,
+    )
+    StaffMaster.objects.bulk_create(
+        [StaffMaster(staff_id=f"BENCH-STF-{i:06d}", full_name=f"Staff {i}", email=f"bench.staff{i}@ugc.edu.gh") for i in range(volumes.staff)],
+        batch_size=2000,
+    )
+    tickets = Ticket.objects.bulk_create(
+        [
+            Ticket(
+                name=f"Sender {i}", email=f"sender{i}@example.com", subject=f"Synthetic enquiry {i}",
+                message="Synthetic opening message", department=rng.choice(departments),
+                status=rng.choice(['Open', 'In-Progress', 'Resolved']),
+            )
+            for i in range(volumes.tickets)
+        ],
+        batch_size=2000,
+    )
+    now = timezone.now()
+    for offset, ticket in enumerate(tickets):
+        ticket.updated_at = now - timezone.timedelta(minutes=offset)
+    Ticket.objects.bulk_update(tickets, ['updated_at'], batch_size=2000)
+    TicketMessage.objects.bulk_create(
+        [
+            TicketMessage(ticket=ticket, sender_name="Synthetic", message=f"Message {n}", is_staff=bool(n % 2))
+            for ticket in tickets
+            for n in range(volumes.messages_per_ticket)
+        ],
+        batch_size=4000,
+    )
+    Ticket.objects.refresh_thread_summary()
+
+    officer = User.objects.create_user('bench_officer', 'bench.officer@ugc.edu.gh', BENCH_PASSWORD)
+    StaffProfile.objects.create(user=officer, department=BENCH_DEPARTMENT, role='Officer', staff_email=officer.email)
+
+    return {
+        'ticket_ids': [t.id for t in tickets],
+        'department_ticket_ids': [t.id for t in tickets if t.department == BENCH_DEPARTMENT] or [tickets[0].id],
+        'student_ids': [f"BENCH-STU-{i:07d}" for i in range(volumes.students)],
+        'officer': officer,
+    }
+
+
+# --- SCENARIOS ---
+
+@dataclass
+class Call:
+    method: str
+    path: str
+    body: dict = None
+    staff: bool = False
+
+
+def scenario_calls(data, rng):
+    """name -> function returning the next request of that scenario."""
+    submissions = itertools.count()
+
+    def submit_ticket():
+        # Distinct senders and messages, so neither the per-email limit nor deduplication applies
+        n = next(submissions)
+        return Call('POST', '/api/save-ticket/', {
+            'name': "Bench Student", 'email': f"bench{n}@example.com", 'user_type': 'student',
+            'student_id': rng.choice(data['student_ids']), 'department': BENCH_DEPARTMENT,
+            'subject': "Benchmark enquiry", 'message': f"Synthetic submission {n}",
+        })
+
+    def track_query():
+        return Call('GET', f"/track-query/?ref=UGC-{rng.choice(data['ticket_ids']):08d}")
+
+    def user_reply():
+        return Call('POST', f"/user-reply/{rng.choice(data['ticket_ids'])}/", {'message': "Any update?"})
+
+    def submit_reply():
+        return Call('POST', f"/submit-reply/{rng.choice(data['department_ticket_ids'])}/", {'message': "Looking into it."}, staff=True)
+
+    def get_messages():
+        return Call('GET', f"/get-messages/{rng.choice(data['department_ticket_ids'])}/", staff=True)
+
+    public_paths = itertools.cycle(['/', '/public-enquiry/', '/track-enquiry/'])
+
+    def public_pages():
+        return Call('GET', next(public_paths))
+
+    def staff_dashboard():
+        return Call('GET', '/dashboard/', staff=True)
+
+    def dashboard_tickets():
+        return Call('GET', '/api/dashboard/tickets/', staff=True)
+
+    return {
+        'submit_ticket': submit_ticket,
+        'track_query': track_query,
+        'user_reply': user_reply,
+        'submit_reply': submit_reply,
+        'get_messages': get_messages,
+        'public_pages': public_pages,
+        'staff_dashboard': staff_dashboard,
+        'dashboard_tickets': dashboard_tickets,
+    }
+
+
+SCENARIOS = tuple(scenario_calls({}, random.Random()))
+
+
+# --- TRANSPORTS ---
+
+class TestClientTransport:
+    """Calls the views in-process through django.test.Client (one client per worker thread)."""
+
+    def __init__(self, officer):
+        self.officer = officer
+        self.local = threading.local()
+
+    def prepare(self):
+        self.clients()
+
+    def clients(self):
+        if not hasattr(self.local, 'public'):
+            self.local.public = Client()
+            self.local.staff = Client()
+            self.local.staff.force_login(self.officer)
+        return self.local
+
+    def send(self, call):
+        clients = self.clients()
+        client = clients.staff if call.staff else clients.public
+        if call.method == 'GET':
+            response = client.get(call.path)
+        else:
+            response = client.post(call.path, json.dumps(call.body), content_type='application/json')
+        # Streaming bodies are consumed so their work is timed too
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        return response.status_code
+
+
+class HTTPTransport:
+    """Drives a running server over HTTP with a cookie-aware opener per worker thread."""
+
+    def __init__(self, base_url, officer):
+        self.base_url = base_url.rstrip('/')
+        self.officer = officer
+        self.local = threading.local()
+
+    def prepare(self):
+        self.opener(False)
+
+    def opener(self, staff):
+        if not hasattr(self.local, 'openers'):
+            public_jar, staff_jar = CookieJar(), CookieJar()
+            public, staff_opener = build_opener(HTTPCookieProcessor(public_jar)), build_opener(HTTPCookieProcessor(staff_jar))
+            # Pick up a CSRF cookie for the public form endpoint, and log the officer in
+            public.open(f"{self.base_url}/public-enquiry/").read()
+            staff_opener.open(f"{self.base_url}/login/").read()
+            login = Request(
+                f"{self.base_url}/login/",
+                data=f"username={self.officer.username}&password={BENCH_PASSWORD}".encode(),
+                headers={'Content-Type': 'application/x-www-form-urlencoded', 'X-CSRFToken': self.csrf(staff_jar)},
+            )
+            staff_opener.open(login).read()
+            self.local.openers = {False: (public, public_jar), True: (staff_opener, staff_jar)}
+        return self.local.openers[staff]
+
+    @staticmethod
+    def csrf(jar):
+        return next((cookie.value for cookie in jar if cookie.name == 'csrftoken'), '')
+
+    def send(self, call):
+        opener, jar = self.opener(call.staff)
+        headers = {'X-CSRFToken': self.csrf(jar)}
+        data = None
+        if call.body is not None:
+            data = json.dumps(call.body).encode()
+            headers['Content-Type'] = 'application/json'
+        request = Request(self.base_url + call.path, data=data, headers=headers, method=call.method)
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status
+        except HTTPError as e:
+            return e.code
+
+
+# --- LOCAL SERVERS ---
+
+def start_wsgi_server():
+    from django.core.servers.basehttp import ThreadedWSGIServer
+    from django.core.wsgi import get_wsgi_application
+    from django.test.testcases import QuietWSGIRequestHandler
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietWSGIRequestHandler, allow_reuse_address=False)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", server.shutdown
+
+
+def start_asgi_server():
+    import socket
+
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(get_asgi_application(), host='127.0.0.1', port=port, log_level='warning', lifespan='off'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+# --- MEASUREMENT ---
+
+class QueryCounter:
+    """Counts SQL statements on every database connection opened while installed."""
+
+    def __init__(self):
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        connection.execute_wrappers.append(self)
+
+    def install(self):
+        connection_created.connect(self.attach, weak=False)
+
+    def uninstall(self):
+        connection_created.disconnect(self.attach)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class ScenarioResult:
+    requests: int
+    errors: Counter
+    seconds: float
+    latencies: list = field(repr=False)
+    queries: int
+
+    def as_dict(self):
+        latencies = sorted(self.latencies)
+        ms = lambda value: None if value is None else round(value * 1000, 2)  # noqa: E731
+        return {
+            'requests': self.requests,
+            'errors': sum(self.errors.values()),
+            'error_statuses': {str(status): n for status, n in sorted(self.errors.items())},
+            'rps': round(self.requests / self.seconds, 1) if self.seconds else None,
+            'p50_ms': ms(percentile(latencies, 0.50)),
+            'p95_ms': ms(percentile(latencies, 0.95)),
+            'p99_ms': ms(percentile(latencies, 0.99)),
+            'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+            'queries_per_request': round(self.queries / self.requests, 2) if self.requests else None,
+        }
+
+
+def run_scenario(transport, make_call, requests, concurrency, counter, warmup=0):
+    """Sends `requests` calls from `concurrency` threads; returns a ScenarioResult.
+
+    Failed requests still count towards latency; they are tallied by status,
+    599 standing for a transport failure.
+    """
+    lock = threading.Lock()
+    latencies, errors = [], Counter()
+    remaining = [requests]
+
+    def take():
+        with lock:
+            if remaining[0] <= 0:
+                return None
+            remaining[0] -= 1
+            return make_call()
+
+    # Per-thread clients and staff logins are set up before the clock starts
+    ready = threading.Barrier(concurrency + 1)
+
+    def worker():
+        try:
+            try:
+                transport.prepare()
+            finally:
+                ready.wait()
+            while (call := take()) is not None:
+                started = time.perf_counter()
+                try:
+                    status = transport.send(call)
+                except Exception:
+                    status = 599
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+                    if status >= 400:
+                        errors[status] += 1
+        finally:
+            connections.close_all()
+
+    for _ in range(warmup):
+        transport.send(make_call())
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    queries_before = counter.count
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    return ScenarioResult(
+        requests=len(latencies), errors=errors, seconds=seconds,
+        latencies=latencies, queries=counter.count - queries_before,
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Lines describing each scenario's change against a baseline, plus whether any regressed."""
+    lines, regressed = [], False
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before or not before.get('p95_ms') or not before.get('rps'):
+            continue
+        p95_change = (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100
+        rps_change = (result['rps'] - before['rps']) / before['rps'] * 100
+        worse = p95_change > threshold or rps_change < -threshold
+        regressed |= worse
+        lines.append(
+            f"{name:<18} p95 {before['p95_ms']:>8.2f} -> {result['p95_ms']:>8.2f} ms ({p95_change:+.1f}%)  "
+            f"rps {before['rps']:>8.1f} -> {result['rps']:>8.1f} ({rps_change:+.1f}%)"
+            + ("  REGRESSION" if worse else "")
+        )
+    return lines, regressed
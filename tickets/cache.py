@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """File cache that evicts least recently used entries instead of random ones.
+
+    Expiry lives inside each file, so the file's mtime is free to record the
+    last access; culling then removes the stalest 1/CULL_FREQUENCY of entries.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except OSError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.path.getmtime(fname)
+            except OSError:
+                return 0
+
+        for fname in sorted(filelist, key=last_used)[:num_entries // self._cull_frequency]:
+            self._delete(fname)
+
+
+class BoundedLocMemCache(LocMemCache):
+    """LocMemCache that keeps no entry longer than its TIMEOUT, even when set() asks for longer.
+
+    For per-process copies of state other workers can change (cached_db
+    sessions are stored for their whole expiry age): a logout or profile
+    change made elsewhere is picked up within TIMEOUT seconds.
+    """
+
+    def get_backend_timeout(self, timeout=DEFAULT_TIMEOUT):
+        expires = super().get_backend_timeout(timeout)
+        if self.default_timeout is None:
+            return expires
+        limit = time.time() + self.default_timeout
+        return limit if expires is None else min(expires, limit)
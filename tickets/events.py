@@ -0,0 +1,339 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils.module_loading import import_string
+
+from . import metrics, routers
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7999
+
+# Long free text is trimmed, by UTF-8 length, so an event always fits in a NOTIFY payload
+PREVIEW_BYTES = 500
+
+# Bulk changes are announced as batches of ticket events, each kept under the NOTIFY limit
+BATCH_EVENT_TYPE = 'tickets_bulk_updated'
+MAX_BATCH_BYTES = 7000
+
+# Deleted tickets have no row to serialize; their ids go out per department, chunked to fit a payload
+DELETED_EVENT_TYPE = 'tickets_deleted'
+MAX_DELETED_IDS = 500
+
+
+def encode_event(event):
+    """The event as published: JSON with non-ASCII text kept as UTF-8 rather than 6-byte escapes."""
+    return json.dumps(event, ensure_ascii=False)
+
+
+def event_bytes(event):
+    return len(encode_event(event).encode('utf-8'))
+
+
+def preview(text, limit=PREVIEW_BYTES):
+    """text cut to at most `limit` UTF-8 bytes (plus '...'), never inside a character."""
+    data = text.encode('utf-8')
+    if len(data) <= limit:
+        return text
+    return data[:limit].decode('utf-8', 'ignore') + '...'
+
+
+class Subscription:
+    """Receives events on the asyncio loop that created it.
+
+    Publishers may run on any thread, so events are handed over with
+    call_soon_threadsafe. A slow client drops its oldest events rather than
+    growing without bound.
+    """
+
+    def __init__(self, broker, predicate, maxsize=100):
+        self.broker = broker
+        self.predicate = predicate
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        if self.predicate(event):
+            self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Next matching event, or None when the timeout expires first."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InMemoryBroker:
+    """Fans events out to subscribers inside this process (single worker / development)."""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, predicate):
+        subscription = Subscription(self, predicate)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has already shut down
+                self.unsubscribe(subscription)
+
+
+class PostgresBroker(InMemoryBroker):
+    """Shares events between every worker through PostgreSQL LISTEN/NOTIFY.
+
+    Publishing issues pg_notify on the regular Django connection. Each process
+    runs one listener thread on a dedicated connection and hands whatever it
+    receives (including its own notifications) to the local subscribers.
+    """
+
+    channel = 'ugc_ticket_events'
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, event):
+        payload = encode_event(event)
+        size = len(payload.encode('utf-8'))
+        if size > MAX_PAYLOAD_BYTES:
+            raise ValueError(f"{event['type']} event is {size} bytes, over the NOTIFY payload limit")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def subscribe(self, predicate):
+        self._ensure_listener()
+        return super().subscribe(predicate)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen_forever, name='ugc-event-listener', daemon=True)
+                self._listener.start()
+
+    def _listen_forever(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        params = connections['default'].get_connection_params()
+        while True:
+            try:
+                conn = psycopg2.connect(**params)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.dispatch(json.loads(notify.payload))
+            except Exception:
+                logger.exception("Ticket event listener lost its connection; reconnecting")
+                time.sleep(5)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, 'TICKET_EVENTS_BACKEND', 'tickets.events.InMemoryBroker')
+            _broker = import_string(backend)()
+        return _broker
+
+
+def build_event(event_type, ticket_id, previous_department=None):
+    """Reads the ticket as committed and wraps it as a dashboard event; None if it is gone."""
+    from .models import Ticket
+
+    ticket = Ticket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return None
+    return ticket_event(event_type, ticket, previous_department)
+
+
+def ticket_event(event_type, ticket, previous_department=None):
+    from .serializers import serialize_dashboard_row
+
+    row = serialize_dashboard_row(ticket)
+    for key in ('message', 'reply_message'):
+        if row[key]:
+            row[key] = preview(row[key])
+
+    return {
+        'type': event_type,
+        'ticket_id': ticket.id,
+        'department': ticket.department,
+        'previous_department': previous_department or ticket.department,
+        'ticket': row,
+    }
+
+
+def build_batch_events(changes):
+    """Wraps many ticket events into as few 'tickets_bulk_updated' events as fit a NOTIFY payload.
+
+    changes maps ticket id -> (event_type, previous_department). Each batch
+    lists every department it touches, so one subscription check decides
+    whether a dashboard needs it.
+    """
+    from .models import Ticket
+
+    batches, events, size = [], [], 0
+    for ticket in Ticket.objects.filter(id__in=list(changes)).order_by('updated_at', 'id'):
+        event_type, previous_department = changes[ticket.id]
+        event = ticket_event(event_type, ticket, previous_department)
+        event_size = event_bytes(event)
+        if events and size + event_size > MAX_BATCH_BYTES:
+            batches.append(events)
+            events, size = [], 0
+        events.append(event)
+        size += event_size
+    if events:
+        batches.append(events)
+
+    return [
+        {
+            'type': BATCH_EVENT_TYPE,
+            'departments': sorted({e['department'] for e in events} | {e['previous_department'] for e in events}),
+            'events': events,
+        }
+        for events in batches
+    ]
+
+
+def publish_ticket_event(event_type, ticket_id, previous_department=None):
+    """Publishes once the surrounding transaction commits, so listeners never see rolled-back writes."""
+    def send():
+        try:
+            event = build_event(event_type, ticket_id, previous_department)
+            if event is not None:
+                get_broker().publish(event)
+        except Exception:
+            logger.exception("Could not publish %s event for ticket %s", event_type, ticket_id)
+
+    transaction.on_commit(send)
+
+
+def publish_ticket_batch(changes):
+    """Publishes the events for many tickets at commit, batched; see build_batch_events."""
+    def send():
+        try:
+            broker = get_broker()
+            for event in build_batch_events(changes):
+                broker.publish(event)
+        except Exception:
+            logger.exception("Could not publish events for %d bulk-updated tickets", len(changes))
+
+    transaction.on_commit(send)
+
+
+def publish_tickets_deleted(ids_by_department):
+    """Tells dashboards at commit to drop these tickets; ids_by_department maps department -> ticket ids."""
+    def send():
+        try:
+            broker = get_broker()
+            for department, ids in sorted(ids_by_department.items()):
+                for start in range(0, len(ids), MAX_DELETED_IDS):
+                    broker.publish({
+                        'type': DELETED_EVENT_TYPE,
+                        'department': department,
+                        'previous_department': department,
+                        'ticket_ids': ids[start:start + MAX_DELETED_IDS],
+                    })
+        except Exception:
+            logger.exception("Could not publish deletion of tickets in %s", ', '.join(ids_by_department))
+
+    transaction.on_commit(send)
+
+
+def department_predicate(department):
+    """Event filter for one department's dashboard; None receives every department."""
+    if department is None:
+        return lambda event: True
+
+    def matches(event):
+        if event['type'] == BATCH_EVENT_TYPE:
+            return department in event['departments']
+        return department in (event['department'], event['previous_department'])
+    return matches
+
+
+def ticket_predicate(ticket_id):
+    """Event filter for one ticket, including its entry in a bulk batch."""
+    def matches(event):
+        if event['type'] == BATCH_EVENT_TYPE:
+            return any(e['ticket_id'] == ticket_id for e in event['events'])
+        if event['type'] == DELETED_EVENT_TYPE:
+            return ticket_id in event['ticket_ids']
+        return event['ticket_id'] == ticket_id
+    return matches
+
+
+async def long_poll(ticket_id, fetch, wait, ready=bool):
+    """Awaits fetch(); while ready(result) is false, holds for up to `wait` seconds for activity on the ticket.
+
+    The subscription is opened before the first fetch, so a message committed
+    in between still wakes the request. After an event (or the timeout) the
+    result is fetched once more and returned whatever it holds.
+    """
+    if not wait:
+        return await fetch()
+    subscription = get_broker().subscribe(ticket_predicate(ticket_id))
+    try:
+        result = await fetch()
+        if ready(result):
+            return result
+        started = time.perf_counter()
+        event = await subscription.get(timeout=wait)
+        metrics.record_idle(time.perf_counter() - started)
+        if event is None:
+            return result
+        # Events are sent once the write commits on the primary; a replica may not have it yet
+        routers.pin_primary()
+        return await fetch()
+    finally:
+        subscription.close()
+
+
+def scoped_event(event, department):
+    """The event as one department's dashboard may see it: a batch keeps only that department's tickets."""
+    if department is None or event['type'] != BATCH_EVENT_TYPE:
+        return event
+    matches = department_predicate(department)
+    return {**event, 'departments': [department], 'events': [e for e in event['events'] if matches(e)]}
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import StudentMaster, StaffMaster
+
+
+class IdentityIndex:
+    """Upper-cased ID -> pk map of the active records of one master list.
+
+    Loaded in full on first use and again once the TTL lapses; in between it
+    is kept current by the save/delete signals of this process, and dropped
+    after a bulk import. Known IDs validate without touching the database.
+    An unknown ID is confirmed with one indexed query before it is rejected,
+    since another worker may have added the record since the last load.
+    """
+
+    def __init__(self, model, field, finder):
+        self.model = model
+        self.field = field
+        # Manager method doing the indexed case-insensitive lookup
+        self.finder = finder
+        self._ids = None
+        self._keys_by_pk = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'IDENTITY_CACHE_TTL', 300)
+
+    def load(self):
+        rows = self.model.objects.filter(is_active=True).values_list(self.field, 'pk')
+        ids, keys_by_pk = {}, {}
+        for value, pk in rows.iterator(chunk_size=5000):
+            key = value.upper()
+            ids[key] = pk
+            keys_by_pk[pk] = key
+        with self._lock:
+            self._ids, self._keys_by_pk = ids, keys_by_pk
+            self._loaded_at = time.monotonic()
+        return ids
+
+    def lookup(self, value):
+        """pk of the active record with this ID (case-insensitive), or None."""
+        key = (value or '').strip().upper()
+        if not key:
+            return None
+        ids = self._ids
+        if ids is None or time.monotonic() - self._loaded_at > self.ttl:
+            ids = self.load()
+        pk = ids.get(key)
+        if pk is None:
+            pk = self._confirm(key)
+        return pk
+
+    async def alookup(self, value):
+        """lookup() for async views: a known ID is answered without leaving the event loop."""
+        key = (value or '').strip().upper()
+        if not key:
+            return None
+        ids = self._ids
+        if ids is not None and key in ids and time.monotonic() - self._loaded_at <= self.ttl:
+            return ids[key]
+        return await sync_to_async(self.lookup)(value)
+
+    def _confirm(self, key):
+        finder = getattr(self.model.objects, self.finder)
+        pk = finder(key).filter(is_active=True).values_list('pk', flat=True).first()
+        if pk is not None:
+            self._store(pk, key)
+        return pk
+
+    def _store(self, pk, key):
+        with self._lock:
+            if self._ids is None:
+                return
+            old_key = self._keys_by_pk.pop(pk, None)
+            if old_key is not None:
+                self._ids.pop(old_key, None)
+            if key is not None:
+                self._ids[key] = pk
+                self._keys_by_pk[pk] = key
+
+    def refresh(self, instance):
+        """Applies one saved record: (re)indexes it when active, drops it otherwise."""
+        key = getattr(instance, self.field).upper() if instance.is_active else None
+        self._store(instance.pk, key)
+
+    def discard(self, pk):
+        self._store(pk, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._ids, self._keys_by_pk = None, {}
+
+
+students = IdentityIndex(StudentMaster, 'index_number', 'by_index_number')
+staff = IdentityIndex(StaffMaster, 'staff_id', 'by_staff_id')
+
+INDEXES = {StudentMaster: students, StaffMaster: staff}
+
+
+def validate_student(index_number):
+    return students.lookup(index_number)
+
+
+def validate_staff(staff_id):
+    return staff.lookup(staff_id)
+
+
+async def avalidate_student(index_number):
+    return await students.alookup(index_number)
+
+
+async def avalidate_staff(staff_id):
+    return await staff.alookup(staff_id)
@@ -0,0 +1,214 @@
+import csv
+import io
+import re
+from dataclasses import dataclass, field
+from itertools import chain, islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import identity
+from .models import StudentMaster, StaffMaster
+
+# Per master list: model, natural key, and the columns a file may provide
+MASTER_LISTS = {
+    'students': {
+        'model': StudentMaster,
+        'key': 'index_number',
+        'columns': ('index_number', 'full_name', 'email', 'course'),
+        'required': ('index_number', 'full_name'),
+    },
+    'staff': {
+        'model': StaffMaster,
+        'key': 'staff_id',
+        'columns': ('staff_id', 'full_name', 'email'),
+        'required': ('staff_id', 'full_name', 'email'),
+    },
+}
+
+MAX_REPORTED_ERRORS = 50
+
+
+class MasterListFormatError(ValueError):
+    """The file cannot be imported at all (e.g. a required column is missing); nothing was written."""
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    deactivated: int = 0
+    skipped: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"Row {line}: {message}")
+
+    def summary(self):
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, "
+            f"{self.deactivated} deactivated, {self.skipped} skipped"
+        )
+
+
+def normalize_header(name):
+    """'Index Number' / 'INDEX-NUMBER' -> 'index_number'."""
+    return re.sub(r'[^a-z0-9]+', '_', str(name or '').strip().lower()).strip('_')
+
+
+def padded_row(headers, values):
+    """The row as a dict with every header present, so a short row still shows which columns the file has."""
+    values = list(values)
+    return dict(zip(headers, values + [None] * (len(headers) - len(values))))
+
+
+def iter_csv(stream):
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    headers = [normalize_header(h) for h in next(reader, [])]
+    for values in reader:
+        yield padded_row(headers, values)
+
+
+def iter_xlsx(stream):
+    from openpyxl import load_workbook
+
+    # read_only streams rows from the archive instead of building the whole sheet
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [normalize_header(h) for h in next(rows, ())]
+        for values in rows:
+            yield padded_row(headers, values)
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    """Streams the rows of a CSV or XLSX file as dicts keyed by normalized header."""
+    if filename.lower().endswith(('.xlsx', '.xlsm')):
+        return iter_xlsx(stream)
+    return iter_csv(stream)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def cell_text(value):
+    """A cell as stripped text; XLSX stores numeric IDs as floats, so 12345.0 becomes '12345'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def check_columns(config, row):
+    missing = [column for column in config['required'] if column not in row]
+    if missing:
+        raise MasterListFormatError(f"The file has no {', '.join(missing)} column; nothing was imported.")
+
+
+def clean_row(config, raw):
+    """Returns (values, error) for one input row; values come back with the error too, so its key is known."""
+    values = {column: cell_text(raw.get(column)) or None for column in config['columns']}
+    missing = [column for column in config['required'] if not values[column]]
+    if missing:
+        return values, f"missing {', '.join(missing)}"
+    return values, None
+
+
+def _upsert(model, key, objects, update_fields):
+    model.objects.bulk_create(
+        objects,
+        update_conflicts=True,
+        unique_fields=[key],
+        update_fields=update_fields,
+    )
+
+
+def import_master_list(kind, rows, batch_size=2000, deactivate_missing=True):
+    """Upserts a master list in batches and deactivates records absent from the file.
+
+    Memory is bounded by batch_size: rows are consumed lazily, each batch is
+    one INSERT ... ON CONFLICT DO UPDATE in its own transaction, and rows the
+    import did not touch are found afterwards through last_imported_at rather
+    than by holding every key in memory. Records whose row was rejected are
+    not deactivated, and nothing is when no row could be stored. Raises
+    MasterListFormatError before any write when a required column is missing.
+    """
+    config = MASTER_LISTS[kind]
+    model, key = config['model'], config['key']
+    update_fields = [c for c in config['columns'] if c != key] + ['is_active', 'last_imported_at']
+    started = timezone.now()
+    result = ImportResult()
+    rejected_keys = set()
+    stored_total = 0
+
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return result
+    check_columns(config, first)
+
+    # Line 1 is the header row
+    numbered = enumerate(chain([first], rows), start=2)
+    for chunk in chunked(numbered, batch_size):
+        batch = {}
+        for line, raw in chunk:
+            values, error = clean_row(config, raw)
+            if error:
+                result.add_error(line, error)
+                if values[key]:
+                    rejected_keys.add(values[key])
+                continue
+            # A key repeated within the batch: the last occurrence wins
+            batch[values[key]] = (line, model(**values, is_active=True, last_imported_at=started))
+
+        if not batch:
+            continue
+
+        existing = set(
+            model.objects.filter(**{f"{key}__in": list(batch)}).values_list(key, flat=True)
+        )
+        batch_rejected = set()
+        try:
+            with transaction.atomic():
+                _upsert(model, key, [obj for _, obj in batch.values()], update_fields)
+        except IntegrityError:
+            # Usually an email already owned by another record; isolate the offending rows
+            for value, (line, obj) in batch.items():
+                try:
+                    with transaction.atomic():
+                        _upsert(model, key, [obj], update_fields)
+                except IntegrityError as e:
+                    existing.discard(value)
+                    batch_rejected.add(value)
+                    result.add_error(line, f"{value}: {e}")
+
+        rejected_keys |= batch_rejected
+        stored = len(batch) - len(batch_rejected)
+        stored_total += stored
+        result.updated += len(existing)
+        result.inserted += stored - len(existing)
+
+    # A file whose every row was rejected says nothing about who is missing
+    if deactivate_missing and stored_total:
+        result.deactivated = (
+            model.objects.filter(is_active=True)
+            .exclude(last_imported_at=started)
+            .exclude(**{f"{key}__in": rejected_keys})
+            .update(is_active=False)
+        )
+
+    # bulk_create and update() send no signals; the next validation reloads the list
+    identity.INDEXES[model].invalidate()
+    return result
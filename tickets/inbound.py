@@ -0,0 +1,220 @@
+import email
+import hashlib
+import mailbox
+import os
+import re
+from collections import Counter, namedtuple
+from email import policy
+from email.utils import parseaddr
+from html import unescape
+from itertools import islice
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from . import reporting
+from .events import publish_ticket_batch
+from .models import InboundEmail, Ticket, TicketMessage
+from .search import get_search_backend
+from .tracking import invalidate_tracking
+
+# The reference submit_reply puts in the subject of every response ("UGC Response: UGC-00000123")
+REFERENCE_PATTERN = re.compile(r'\bUGC-(\d{8})\b', re.IGNORECASE)
+
+# Where the quoted original starts in a reply; everything from the first match down is dropped
+ATTRIBUTION_PATTERN = re.compile(r'^On\b.{0,300}\bwrote:$', re.IGNORECASE)
+QUOTE_SEPARATOR_PATTERNS = [
+    re.compile(r'^-{2,}\s*Original Message\s*-{2,}$', re.IGNORECASE),
+    re.compile(r'^_{10,}$'),
+    re.compile(r'^From:\s.+$', re.IGNORECASE),
+]
+SIGNATURE_SEPARATOR = '-- '
+
+InboundReply = namedtuple('InboundReply', 'key message_key message_id sender subject ticket_id text')
+
+
+def spool_path():
+    return getattr(settings, 'INBOUND_EMAIL_SPOOL', '')
+
+
+# --- READING THE SPOOL ---
+
+def open_spool(path):
+    """A Maildir for a directory (as written by fetchmail, getmail or a local Dovecot), an mbox otherwise."""
+    if os.path.isdir(path):
+        return mailbox.Maildir(path, factory=None, create=False)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No mail spool at {path}")
+    return mailbox.mbox(path, factory=None, create=False)
+
+
+def iter_spool(spool):
+    """(key, raw bytes) for every message, read one at a time; only the key list is held in memory."""
+    for key in spool.iterkeys():
+        try:
+            yield key, spool.get_bytes(key)
+        except KeyError:
+            # Removed by another reader since the listing
+            continue
+
+
+# --- PARSING ---
+
+def strip_quoted(text):
+    """The new part of a reply: quoted lines, the quoted original and the signature are dropped."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    kept = []
+    for index, line in enumerate(lines):
+        if line == SIGNATURE_SEPARATOR or line.rstrip() == '--':
+            break
+        stripped = line.strip()
+        # "On <date>, <name> wrote:" is often wrapped over two lines
+        wrapped = stripped + ' ' + lines[index + 1].strip() if index + 1 < len(lines) else stripped
+        if ATTRIBUTION_PATTERN.match(stripped) or ATTRIBUTION_PATTERN.match(wrapped):
+            break
+        if any(pattern.match(stripped) for pattern in QUOTE_SEPARATOR_PATTERNS):
+            break
+        if stripped.startswith('>'):
+            continue
+        kept.append(line.rstrip())
+    return '\n'.join(kept).strip()
+
+
+def message_text(message):
+    """The plain-text body, or the HTML body reduced to text; '' when neither can be decoded."""
+    part = message.get_body(preferencelist=('plain', 'html'))
+    if part is None:
+        return ''
+    try:
+        content = part.get_content()
+    except (LookupError, UnicodeError):
+        # Unknown or lying charset
+        content = (part.get_payload(decode=True) or b'').decode('utf-8', 'replace')
+    if part.get_content_subtype() == 'html':
+        content = unescape(strip_tags(re.sub(r'(?i)<br\s*/?>|</p>|</div>', '\n', content)))
+    return content
+
+
+def parse_reply(key, raw):
+    """An InboundReply for one raw message; ticket_id is None when the subject carries no reference."""
+    message = email.message_from_bytes(raw, policy=policy.default)
+    message_id = str(message.get('Message-ID') or '').strip()
+    subject = str(message.get('Subject') or '').strip()
+    match = REFERENCE_PATTERN.search(subject)
+    return InboundReply(
+        key=key,
+        # Message-IDs have no length limit; a message without one is identified by its content
+        message_key=hashlib.sha256(message_id.encode() if message_id else raw).hexdigest(),
+        message_id=message_id[:255],
+        sender=parseaddr(str(message.get('From') or ''))[1].lower()[:254],
+        subject=subject[:255],
+        ticket_id=int(match.group(1)) if match else None,
+        text=strip_quoted(message_text(message)) if match else '',
+    )
+
+
+# --- INGESTION ---
+
+def ingest_batch(replies):
+    """Adds a batch of parsed replies to their threads in one transaction; returns a Counter of outcomes.
+
+    Every message is logged in InboundEmail under its Message-ID, so one
+    already seen (in an earlier run or earlier in the batch) is skipped. The
+    tickets are locked and read once; the accepted replies go in with one
+    bulk INSERT, followed by one thread-summary refresh and one UPDATE that
+    reopens resolved tickets, as TicketMessage.save would per reply. A reply
+    is only accepted from the address the ticket was opened with.
+    """
+    outcomes = Counter()
+    with transaction.atomic():
+        seen = set(InboundEmail.objects.filter(
+            message_key__in=[reply.message_key for reply in replies],
+        ).values_list('message_key', flat=True))
+        fresh = []
+        for reply in replies:
+            if reply.message_key in seen:
+                outcomes['DUPLICATE'] += 1
+                continue
+            seen.add(reply.message_key)
+            fresh.append(reply)
+
+        ticket_ids = {reply.ticket_id for reply in fresh if reply.ticket_id}
+        tickets = {
+            row['id']: row for row in Ticket.objects.select_for_update().filter(id__in=ticket_ids)
+            .order_by('id').values('id', 'name', 'email', 'department', 'status')
+        }
+
+        log, messages, replies_per_ticket = [], [], Counter()
+        for reply in fresh:
+            ticket = tickets.get(reply.ticket_id)
+            if reply.ticket_id is None:
+                outcome = 'NO_REFERENCE'
+            elif ticket is None:
+                outcome = 'UNKNOWN_TICKET'
+            elif reply.sender != ticket['email'].lower():
+                outcome = 'SENDER_MISMATCH'
+            elif not reply.text:
+                outcome = 'EMPTY'
+            else:
+                outcome = 'ACCEPTED'
+                messages.append(TicketMessage(
+                    ticket_id=ticket['id'], sender_name=ticket['name'], message=reply.text, is_staff=False,
+                ))
+                replies_per_ticket[ticket['id']] += 1
+            outcomes[outcome] += 1
+            log.append(InboundEmail(
+                message_key=reply.message_key, message_id=reply.message_id, sender=reply.sender,
+                subject=reply.subject, ticket_id=reply.ticket_id, outcome=outcome,
+            ))
+
+        # No ignore_conflicts: a concurrent run that logged the same message rolls this batch back instead of doubling it
+        InboundEmail.objects.bulk_create(log)
+        if messages:
+            TicketMessage.objects.bulk_create(messages)
+            ids = sorted(replies_per_ticket)
+            now = timezone.now()
+            Ticket.objects.filter(id__in=ids).refresh_thread_summary()
+            Ticket.objects.filter(id__in=ids).update(
+                updated_at=now,
+                status=Case(When(status='Resolved', then=Value('Open')), default=F('status')),
+                resolved_at=Case(
+                    When(status='Resolved', then=Value(None)), default=F('resolved_at'),
+                    output_field=models.DateTimeField(),
+                ),
+            )
+            reporting.user_replies_created(
+                [(tickets[i]['department'], tickets[i]['status'], replies_per_ticket[i]) for i in ids], when=now,
+            )
+            publish_ticket_batch({i: ('new_reply', tickets[i]['department']) for i in ids})
+            transaction.on_commit(lambda: invalidate_tracking(*ids))
+            transaction.on_commit(lambda: get_search_backend().index_tickets(ids))
+    return outcomes
+
+
+def ingest_spool(path=None, batch_size=500, limit=None, delete=False):
+    """Ingests a Maildir or mbox spool in batches; yields a Counter of outcomes per batch.
+
+    Messages are parsed outside the transaction and only one batch is held
+    in memory, so a spool of any size is read with a bounded footprint.
+    delete removes each batch from a Maildir once it has committed; an mbox
+    is left as it is and relies on the Message-ID log on the next run.
+    """
+    spool = open_spool(path or spool_path())
+    if delete and not isinstance(spool, mailbox.Maildir):
+        raise ValueError("Only messages in a Maildir can be deleted after ingestion")
+
+    messages = iter_spool(spool)
+    if limit is not None:
+        messages = islice(messages, limit)
+    while True:
+        replies = [parse_reply(key, raw) for key, raw in islice(messages, batch_size)]
+        if not replies:
+            return
+        outcomes = ingest_batch(replies)
+        if delete:
+            for reply in replies:
+                spool.discard(reply.key)
+        yield outcomes
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.archive import archivable, archive_after_days, archive_resolved
+
+
+class Command(BaseCommand):
+    help = "Moves resolved tickets older than --days, with their threads, into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Minimum days since resolution (default: ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Tickets moved per transaction.")
+        parser.add_argument('--limit', type=int, help="Stop after archiving this many tickets.")
+        parser.add_argument('--compress', action='store_true', help="Store each thread as compressed JSON instead of rows.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the tickets that would be archived.")
+
+    def handle(self, *args, **options):
+        days = archive_after_days() if options['days'] is None else options['days']
+        if options['dry_run']:
+            count = archivable(timezone.now() - timedelta(days=days)).count()
+            self.stdout.write(f"{count} resolved tickets older than {days} days would be archived.")
+            return
+
+        tickets = messages = 0
+        batches = archive_resolved(days, batch_size=options['batch_size'], compress=options['compress'], limit=options['limit'])
+        for batch_tickets, batch_messages in batches:
+            tickets += batch_tickets
+            messages += batch_messages
+            self.stdout.write(f"  ... {tickets} tickets archived")
+        self.stdout.write(self.style.SUCCESS(f"Archived {tickets} tickets and {messages} messages."))
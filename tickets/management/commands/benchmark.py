@@ -0,0 +1,136 @@
+import json
+import os
+import random
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from tickets import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a throwaway database and load-tests the public and staff endpoints, "
+        "reporting latency percentiles, throughput and queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        defaults = benchmark.Volumes()
+        parser.add_argument('--students', type=int, default=defaults.students)
+        parser.add_argument('--staff', type=int, default=defaults.staff)
+        parser.add_argument('--tickets', type=int, default=defaults.tickets)
+        parser.add_argument('--messages-per-ticket', type=int, default=defaults.messages_per_ticket)
+        parser.add_argument('--requests', type=int, default=500, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests sent before each scenario.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Client threads sending requests.")
+        parser.add_argument(
+            '--scenario', action='append', choices=benchmark.SCENARIOS, dest='scenarios',
+            help="Scenario to run; repeat for several (default: all).",
+        )
+        parser.add_argument(
+            '--mode', choices=['client', 'wsgi', 'asgi'], default='client',
+            help="client: in-process test client; wsgi/asgi: a local threaded server driven over HTTP.",
+        )
+        parser.add_argument('--seed', type=int, default=2026, help="Random seed, so runs draw the same requests.")
+        parser.add_argument('--output', '-o', help="Write the JSON report to this file as well as standard output.")
+        parser.add_argument('--compare', help="A previous JSON report to compare against.")
+        parser.add_argument('--threshold', type=float, default=10.0, help="Percent change in p95 or RPS treated as a regression.")
+        parser.add_argument('--fail-on-regression', action='store_true', help="Exit non-zero when --compare finds a regression.")
+        parser.add_argument('--keepdb', action='store_true', help="Keep the benchmark database afterwards.")
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read baseline report: {e}")
+
+        volumes = benchmark.Volumes(
+            students=options['students'],
+            staff=options['staff'],
+            tickets=options['tickets'],
+            messages_per_ticket=options['messages_per_ticket'],
+        )
+        scenarios = options['scenarios'] or list(benchmark.SCENARIOS)
+        rng = random.Random(options['seed'])
+
+        # Never touch the configured database: everything runs against a test database.
+        # SQLite's default in-memory test database cannot be shared by server threads, so use a file;
+        # expect 'database is locked' errors from concurrent writers there, and prefer PostgreSQL.
+        if connection.vendor == 'sqlite':
+            handle, path = tempfile.mkstemp(prefix='ugc-benchmark-', suffix='.sqlite3')
+            os.close(handle)
+            connection.settings_dict['TEST']['NAME'] = path
+        setup_test_environment(debug=False)
+        # Every benchmark request comes from the loopback address; replicas would not see the test database;
+        # a fresh checkout has no collectstatic manifest for the pages to resolve {% static %} against
+        unthrottled = override_settings(
+            SUBMISSION_IP_BURST=10**9, REPLICA_DATABASES=[], STORAGES=benchmark.PLAIN_STATIC_STORAGES,
+        )
+        unthrottled.enable()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+
+        counter = benchmark.QueryCounter()
+        stop_server = None
+        try:
+            self.stderr.write(f"Seeding {volumes} ...")
+            data = benchmark.seed(volumes, rng)
+            calls = benchmark.scenario_calls(data, rng)
+
+            if options['mode'] == 'client':
+                transport = benchmark.TestClientTransport(data['officer'])
+            else:
+                start = benchmark.start_wsgi_server if options['mode'] == 'wsgi' else benchmark.start_asgi_server
+                base_url, stop_server = start()
+                transport = benchmark.HTTPTransport(base_url, data['officer'])
+
+            connection.close()
+            counter.install()
+            results = {}
+            for name in scenarios:
+                self.stderr.write(f"  {name} ...")
+                result = benchmark.run_scenario(
+                    transport, calls[name], options['requests'], options['concurrency'], counter, warmup=options['warmup'],
+                )
+                results[name] = result.as_dict()
+        finally:
+            counter.uninstall()
+            if stop_server:
+                stop_server()
+            connection.close()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            unthrottled.disable()
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'revision': benchmark.git_revision(),
+                'timestamp': timezone.now().isoformat(timespec='seconds'),
+                'database': connection.vendor,
+                'mode': options['mode'],
+                'async_public_views': settings.ASYNC_PUBLIC_VIEWS,
+                'concurrency': options['concurrency'],
+                'requests_per_scenario': options['requests'],
+                'volumes': vars(volumes),
+            },
+            'scenarios': results,
+        }
+        output = json.dumps(report, indent=2)
+        self.stdout.write(output)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+
+        if baseline:
+            lines, regressed = benchmark.compare(report, baseline, options['threshold'])
+            self.stderr.write(f"Compared with {baseline.get('meta', {}).get('revision') or options['compare']}:")
+            for line in lines:
+                self.stderr.write(f"  {line}")
+            if regressed and options['fail_on_regression']:
+                raise CommandError("Performance regression beyond the threshold.")
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.exports import CHUNK_SIZE, EXPORT_FORMATS, export_queryset, stream_export
+
+
+class Command(BaseCommand):
+    help = "Streams tickets to CSV or JSON Lines without loading the whole range into memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--department', help="Only tickets routed to this department.")
+        parser.add_argument('--status', help="Only tickets with this status.")
+        parser.add_argument('--from', dest='date_from', help="First creation date, YYYY-MM-DD.")
+        parser.add_argument('--to', dest='date_to', help="Last creation date (inclusive), YYYY-MM-DD.")
+        parser.add_argument('--threads', action='store_true', help="Include every ticket's full conversation.")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Tickets fetched per round trip.")
+        parser.add_argument('--output', '-o', help="File to write (default: standard output).")
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                department=options['department'],
+                status=options['status'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        chunks = stream_export(options['format'], queryset, threads=options['threads'], chunk_size=options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(f"Export written to {options['output']}.")
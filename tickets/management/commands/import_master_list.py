@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.importers import MASTER_LISTS, MasterListFormatError, import_master_list, iter_rows
+
+
+class Command(BaseCommand):
+    help = "Streams a CSV/XLSX master list into StudentMaster or StaffMaster."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(MASTER_LISTS), help="Which master list the file holds.")
+        parser.add_argument('path', help="CSV or XLSX file with a header row.")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows upserted per statement.")
+        parser.add_argument('--keep-missing', action='store_true', help="Do not deactivate records absent from the file.")
+
+    def handle(self, *args, **options):
+        try:
+            stream = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(f"Cannot open {options['path']}: {e}")
+
+        with stream:
+            try:
+                result = import_master_list(
+                    options['kind'],
+                    iter_rows(stream, options['path']),
+                    batch_size=options['batch_size'],
+                    deactivate_missing=not options['keep_missing'],
+                )
+            except MasterListFormatError as e:
+                raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(f"{options['kind'].title()} import finished: {result.summary()}."))
@@ -0,0 +1,33 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.inbound import ingest_spool, spool_path
+
+
+class Command(BaseCommand):
+    help = "Adds emailed replies from a Maildir or mbox spool to their tickets' threads, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="Maildir directory or mbox file (default: INBOUND_EMAIL_SPOOL).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Messages ingested per transaction.")
+        parser.add_argument('--limit', type=int, help="Stop after reading this many messages.")
+        parser.add_argument('--delete', action='store_true', help="Remove ingested messages from a Maildir spool.")
+
+    def handle(self, *args, **options):
+        path = options['path'] or spool_path()
+        if not path:
+            raise CommandError("No spool given and INBOUND_EMAIL_SPOOL is not set.")
+
+        totals = Counter()
+        try:
+            for outcomes in ingest_spool(path, batch_size=options['batch_size'], limit=options['limit'], delete=options['delete']):
+                totals.update(outcomes)
+                self.stdout.write(f"  ... {totals.total()} messages read, {totals['ACCEPTED']} replies added")
+        except (FileNotFoundError, ValueError) as e:
+            raise CommandError(e)
+
+        skipped = ', '.join(f"{n} {outcome.lower().replace('_', ' ')}" for outcome, n in sorted(totals.items()) if outcome != 'ACCEPTED')
+        self.stdout.write(self.style.SUCCESS(
+            f"Added {totals['ACCEPTED']} replies from {totals.total()} messages" + (f" (skipped: {skipped})." if skipped else ".")
+        ))
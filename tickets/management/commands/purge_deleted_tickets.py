@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.purge import purge_deleted, purgeable, restore_days
+
+
+class Command(BaseCommand):
+    help = "Permanently removes tickets deleted more than --days ago, with their threads, in bounded batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Minimum days since deletion (default: TICKET_RESTORE_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Tickets removed per transaction.")
+        parser.add_argument('--limit', type=int, help="Stop after purging this many tickets.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the tickets that would be purged.")
+
+    def handle(self, *args, **options):
+        days = restore_days() if options['days'] is None else options['days']
+        if options['dry_run']:
+            count = purgeable(timezone.now() - timedelta(days=days)).count()
+            self.stdout.write(f"{count} tickets deleted more than {days} days ago would be purged.")
+            return
+
+        tickets = messages = 0
+        for batch_tickets, batch_messages in purge_deleted(days, batch_size=options['batch_size'], limit=options['limit']):
+            tickets += batch_tickets
+            messages += batch_messages
+            self.stdout.write(f"  ... {tickets} tickets purged")
+        self.stdout.write(self.style.SUCCESS(f"Purged {tickets} tickets and {messages} messages."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tickets.reporting import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recomputes the department reporting rollups from tickets and their threads."
+
+    def handle(self, *args, **options):
+        rows = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} department-day rollups."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from tickets.models import Ticket
+from tickets.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Backfills or repairs the full-text search index over tickets and their threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Tickets indexed per transaction.")
+        parser.add_argument('--ticket', type=int, action='append', dest='ticket_ids', help="Only reindex these ticket ids.")
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        if options['ticket_ids']:
+            indexed = backend.index_tickets(options['ticket_ids'])
+            self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} tickets."))
+            return
+
+        bounds = Ticket.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write("No tickets to index.")
+            return
+
+        batch_size = options['batch_size']
+        indexed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            with transaction.atomic():
+                indexed += backend.index_tickets(list(range(start, start + batch_size)))
+            self.stdout.write(f"  ... {indexed} tickets indexed (through id {start + batch_size - 1})")
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} tickets."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from tickets.models import Ticket
+
+
+class Command(BaseCommand):
+    help = "Backfills or repairs the denormalized thread summary columns on Ticket."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help="Tickets updated per transaction.")
+        parser.add_argument('--ticket', type=int, action='append', dest='ticket_ids', help="Only repair these ticket ids.")
+
+    def handle(self, *args, **options):
+        if options['ticket_ids']:
+            updated = Ticket.objects.filter(id__in=options['ticket_ids']).refresh_thread_summary()
+            self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} tickets."))
+            return
+
+        bounds = Ticket.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write("No tickets to refresh.")
+            return
+
+        batch_size = options['batch_size']
+        updated = 0
+        # Walk primary-key ranges so every batch is a short, index-bounded UPDATE
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            with transaction.atomic():
+                updated += Ticket.objects.filter(id__gte=start, id__lt=start + batch_size).refresh_thread_summary()
+            self.stdout.write(f"  ... {updated} tickets refreshed (through id {start + batch_size - 1})")
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} tickets."))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.outbox import deliver_batch, queue_depth
+
+
+class Command(BaseCommand):
+    help = "Delivers queued outbound emails in batches over pooled SMTP connections."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Emails sent per SMTP connection (default OUTBOX_BATCH_SIZE).")
+        parser.add_argument('--max-attempts', type=int, help="Attempts before an email is marked FAILED (default OUTBOX_MAX_ATTEMPTS).")
+        parser.add_argument('--loop', action='store_true', help="Keep polling the queue instead of exiting once it is drained.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls when the queue is idle.")
+        parser.add_argument('--stats', action='store_true', help="Print the queue depth and exit.")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            for status, total in queue_depth().items():
+                self.stdout.write(f"{status:<8} {total}")
+            return
+
+        total_sent = total_failed = 0
+        try:
+            while True:
+                sent, failed = deliver_batch(options['batch_size'], options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                if sent or failed:
+                    self.stdout.write(f"Batch: {sent} sent, {failed} failed")
+                    continue
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_sent} sent, {total_failed} failed."))
@@ -0,0 +1,228 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# The method label is client-controlled; anything else is counted as 'other'
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+# The request being measured on this thread or task; asgiref copies it into sync_to_async threads
+_current = ContextVar('ugc_request_stats', default=None)
+
+
+def slow_request_seconds():
+    return getattr(settings, 'METRICS_SLOW_REQUEST_SECONDS', 1.0)
+
+
+def n_plus_one_threshold():
+    return getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 5)
+
+
+def sql_sample_size():
+    return getattr(settings, 'METRICS_SQL_SAMPLE_SIZE', 5)
+
+
+# --- PER-REQUEST COLLECTION ---
+
+class RequestStats:
+    """Query count, DB time and repeated statements for one request.
+
+    Only counters and the few slowest statements are kept, so the cost per
+    query is a dict update and, rarely, a heap replacement.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.idle_seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.templates = Counter()
+        self.executions = Counter()
+        self.slowest = []
+
+    def record(self, sql, params, many, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        self.templates[sql] += 1
+        if not many:
+            try:
+                self.executions[sql, tuple(params or ())] += 1
+            except TypeError:
+                pass
+        entry = (seconds, self.queries, sql)
+        if len(self.slowest) < sql_sample_size():
+            heapq.heappush(self.slowest, entry)
+        elif self.slowest and seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def duplicates(self):
+        """Statements re-run with identical parameters (extra executions only)."""
+        return sum(n - 1 for n in self.executions.values() if n > 1)
+
+    def n_plus_one(self):
+        """Statement shapes executed with at least the threshold number of different parameter sets."""
+        threshold = n_plus_one_threshold()
+        variants = Counter(sql for sql, _ in self.executions)
+        return [sql for sql, n in variants.items() if n >= threshold]
+
+
+def measure_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, params, many, time.perf_counter() - started)
+
+
+def _attach(sender=None, connection=None, **kwargs):
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(measure_query)
+
+
+def install():
+    """Wraps every database connection, present and future, with measure_query."""
+    connection_created.connect(_attach, dispatch_uid='tickets.metrics.attach')
+    for connection in connections.all(initialized_only=True):
+        _attach(connection=connection)
+
+
+def begin_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_idle(seconds):
+    """Leaves time the current request spent parked (a long-poll wait) out of its duration."""
+    stats = _current.get()
+    if stats is not None:
+        stats.idle_seconds += seconds
+
+
+# --- AGGREGATION ---
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Process-wide metrics; each worker process exposes its own.
+
+    Label sets are bounded: views are URL names, never raw paths, and
+    methods outside HTTP_METHODS are recorded as 'other'.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter()
+            self.duplicate_queries = Counter()
+            self.n_plus_one = Counter()
+            self.slow_requests = Counter()
+            self.durations = {}
+            self.query_counts = {}
+            self.db_durations = {}
+
+    def observe(self, view, method, status, stats, seconds):
+        method = method if method in HTTP_METHODS else 'other'
+        duplicates = stats.duplicates()
+        repeated = stats.n_plus_one()
+        with self.lock:
+            self.requests[view, method, status] += 1
+            self.durations.setdefault(view, Histogram(DURATION_BUCKETS)).observe(seconds)
+            self.query_counts.setdefault(view, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+            self.db_durations.setdefault(view, Histogram(DURATION_BUCKETS)).observe(stats.db_seconds)
+            if duplicates:
+                self.duplicate_queries[view] += duplicates
+            if repeated:
+                self.n_plus_one[view] += 1
+            if seconds >= slow_request_seconds():
+                self.slow_requests[view] += 1
+
+        if seconds >= slow_request_seconds():
+            log_slow_request(view, method, status, stats, seconds, repeated)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def counter(name, help_text, values, labels):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                lines.append(f"{name}{{{format_labels(zip(labels, key))}}} {value}")
+
+        def histogram(name, help_text, histograms):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for view, h in sorted(histograms.items()):
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ['+Inf'], h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{{{format_labels([('view', view), ('le', bound)])}}} {cumulative}")
+                lines.append(f"{name}_sum{{{format_labels([('view', view)])}}} {h.sum:g}")
+                lines.append(f"{name}_count{{{format_labels([('view', view)])}}} {h.count}")
+
+        with self.lock:
+            counter('ugc_http_requests_total', "Requests served, by view, method and status.",
+                    self.requests, ('view', 'method', 'status'))
+            histogram('ugc_http_request_duration_seconds', "Wall time spent producing the response.", self.durations)
+            histogram('ugc_db_queries_per_request', "SQL statements executed per request.", self.query_counts)
+            histogram('ugc_db_time_per_request_seconds', "Time spent in the database per request.", self.db_durations)
+            counter('ugc_db_duplicate_queries_total', "Statements re-executed with identical parameters in one request.",
+                    self.duplicate_queries, ('view',))
+            counter('ugc_db_n_plus_one_requests_total', "Requests repeating one statement shape with different parameters.",
+                    self.n_plus_one, ('view',))
+            counter('ugc_slow_requests_total', "Requests slower than METRICS_SLOW_REQUEST_SECONDS.",
+                    self.slow_requests, ('view',))
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(pairs):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in pairs)
+
+
+def log_slow_request(view, method, status, stats, seconds, repeated):
+    slowest = sorted(stats.slowest, reverse=True)
+    logger.warning(
+        "Slow request: %s %s -> %s in %.0f ms (%d queries, %.0f ms in DB, %d duplicates)%s%s",
+        method, view, status, seconds * 1000, stats.queries, stats.db_seconds * 1000, stats.duplicates(),
+        ''.join(f"\n  N+1 x{stats.templates[sql]}: {sql}" for sql in repeated),
+        ''.join(f"\n  {elapsed * 1000:.1f} ms: {sql}" for elapsed, _, sql in slowest),
+    )
+
+
+registry = Registry()
@@ -0,0 +1,154 @@
+import time
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import auth_context, metrics, routers
+
+
+class QueryMetricsMiddleware:
+    """Records wall time, SQL count and DB time per view into tickets.metrics.
+
+    Queries are attributed through a context variable rather than a
+    per-request execute_wrapper, so sync views run by the ASGI handler in a
+    worker thread are measured as well. Streaming responses are timed until
+    the response object is returned, not until the stream ends, and time a
+    long-poll spends waiting is not counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        metrics.install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token = metrics.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.observe(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = metrics.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.observe(request, response, stats)
+        return response
+
+    def observe(self, request, response, stats):
+        match = request.resolver_match
+        view = (match.view_name if match else None) or 'unresolved'
+        elapsed = time.perf_counter() - stats.started - stats.idle_seconds
+        metrics.registry.observe(view, request.method, response.status_code, stats, elapsed)
+
+
+class ReplicaRoutingMiddleware:
+    """Scopes routers.PrimaryReplicaRouter to the request.
+
+    Unsafe methods, and requests carrying the pin cookie, read the primary.
+    A request that wrote sets that cookie for REPLICA_STICKY_SECONDS, so the
+    same browser reads its own writes (a reply, then track_query) while the
+    replicas catch up. Streaming responses read after the request has been
+    handed back, so their views fix the database themselves.
+    """
+
+    sync_capable = True
+    async_capable = True
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state, token = routers.begin_request(self.reads_primary(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.remember_write(state, response)
+
+    async def __acall__(self, request):
+        state, token = routers.begin_request(self.reads_primary(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.remember_write(state, response)
+
+    def reads_primary(self, request):
+        return request.method not in self.SAFE_METHODS or routers.PIN_COOKIE in request.COOKIES
+
+    def remember_write(self, state, response):
+        if state.wrote and routers.replica_databases():
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=routers.sticky_seconds(), httponly=True, samesite='Lax')
+        return response
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """AuthenticationMiddleware that loads request.user through tickets.auth_context.
+
+    The user and their staff profile come from one cache entry, dropped when
+    either is saved, instead of a query for each per request. Refuses to
+    start with per-process caches when WEB_CONCURRENCY allows several workers.
+    """
+
+    def __init__(self, get_response):
+        auth_context.check_shared_caches()
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: auth_context.get_user(request))
+        request.auser = partial(auth_context.auser, request)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware that can also run in Django's async middleware chain.
+
+    WhiteNoise's own middleware is sync-only, which makes Django run every
+    request under ASGI (and every async view) through a worker thread. Static
+    files are found in WhiteNoise's in-memory table, so looking them up on
+    the event loop does not block; everything else is awaited unchanged.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
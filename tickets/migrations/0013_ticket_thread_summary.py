@@ -0,0 +1,68 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, Max, Min, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def backfill_thread_summary(apps, schema_editor):
+    """Fills the new columns for existing tickets; mirrors TicketQuerySet.refresh_thread_summary as of this migration."""
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketMessage = apps.get_model('tickets', 'TicketMessage')
+    db = schema_editor.connection.alias
+
+    thread = TicketMessage.objects.using(db).filter(ticket=OuterRef('pk'))
+    latest = thread.order_by('-created_at', '-id')
+    latest_staff = thread.filter(is_staff=True).order_by('-created_at', '-id')
+    message_count = thread.order_by().values('ticket').annotate(total=Count('id')).values('total')
+    summary = {
+        'last_message': Subquery(latest.values('id')[:1]),
+        'last_reply_by': Subquery(latest.annotate(
+            reply_by=Case(When(is_staff=True, then=Value('STAFF')), default=Value('USER'))
+        ).values('reply_by')[:1]),
+        'reply_message': Subquery(latest.values('message')[:1]),
+        'last_staff_name': Subquery(latest_staff.values('sender_name')[:1]),
+        'message_count': Coalesce(Subquery(message_count), 0),
+        'last_activity_at': Subquery(latest.values('created_at')[:1]),
+    }
+
+    bounds = Ticket.objects.using(db).aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return
+    # Primary-key ranges keep each UPDATE short on large tables
+    for start in range(bounds['low'], bounds['high'] + 1, BACKFILL_BATCH_SIZE):
+        Ticket.objects.using(db).filter(id__gte=start, id__lt=start + BACKFILL_BATCH_SIZE).update(**summary)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_ticketmessage_parent_alter_staffprofile_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tickets.ticketmessage'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='last_staff_name',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_thread_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 6.0.1 on 2026-10-18 10:04
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0013_ticket_thread_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='staffmaster',
+            index=models.Index(django.db.models.functions.text.Upper('staff_id'), name='staff_id_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentmaster',
+            index=models.Index(django.db.models.functions.text.Upper('index_number'), name='student_index_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['department', '-updated_at', '-id'], name='ticket_dept_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['department', 'status', '-updated_at', '-id'], name='ticket_dept_status_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['-updated_at', '-id'], name='ticket_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketmessage',
+            index=models.Index(fields=['ticket', 'created_at'], name='ticketmsg_ticket_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketmessage',
+            index=models.Index(fields=['ticket', 'is_staff', 'created_at'], name='ticketmsg_ticket_staff_idx'),
+        ),
+    ]
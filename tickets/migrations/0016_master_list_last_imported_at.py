@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='staffmaster',
+            name='last_imported_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentmaster',
+            name='last_imported_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0017_ticket_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='first_response_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='DepartmentDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('opened', models.PositiveIntegerField(default=0)),
+                ('resolved', models.PositiveIntegerField(default=0)),
+                ('reopened', models.PositiveIntegerField(default=0)),
+                ('transferred_in', models.PositiveIntegerField(default=0)),
+                ('transferred_out', models.PositiveIntegerField(default=0)),
+                ('first_responses', models.PositiveIntegerField(default=0)),
+                ('first_response_seconds', models.BigIntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+                ('user_replies', models.PositiveIntegerField(default=0)),
+                ('staff_replies', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Department Daily Stats',
+                'verbose_name_plural': 'Department Daily Stats',
+                'constraints': [models.UniqueConstraint(fields=('department', 'day'), name='deptdaily_dept_day_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResolutionTimeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('bucket', models.PositiveSmallIntegerField()),
+                ('tickets', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('department', 'day', 'bucket'), name='resbucket_dept_day_bucket_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0019_ticket_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('user_type', models.CharField(choices=[('STUDENT', 'Student'), ('STAFF', 'Staff'), ('VISITOR', 'Visitor')], default='VISITOR', max_length=10)),
+                ('student_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('staff_id', models.CharField(blank=True, max_length=50, null=True)),
+                ('subject', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('department', models.CharField(choices=[('I.T.', 'I.T.'), ('Finance', 'Finance'), ('HR', 'HR'), ('Admission', 'Admission'), ('Student Support Service', 'Student Support Service')], max_length=50)),
+                ('status', models.CharField(max_length=20)),
+                ('message_count', models.PositiveIntegerField(default=0)),
+                ('first_response_at', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('thread_data', models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Archived Ticket',
+                'verbose_name_plural': 'Archived Tickets',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicketMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.BigIntegerField(blank=True, null=True)),
+                ('sender_name', models.CharField(max_length=100)),
+                ('message', models.TextField()),
+                ('is_staff', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['status', 'resolved_at'], name='ticket_status_resolved_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedticketmessage',
+            name='ticket',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='tickets.archivedticket'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedticketmessage',
+            index=models.Index(fields=['ticket', 'created_at'], name='archivedmsg_ticket_created_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0022_ticket_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message_key', models.CharField(max_length=64, unique=True)),
+                ('message_id', models.CharField(blank=True, max_length=255)),
+                ('sender', models.CharField(blank=True, max_length=254)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('ticket_id', models.BigIntegerField(blank=True, null=True)),
+                ('outcome', models.CharField(choices=[('ACCEPTED', 'Added to the thread'), ('NO_REFERENCE', 'No ticket reference in the subject'), ('UNKNOWN_TICKET', 'No live ticket with that reference'), ('SENDER_MISMATCH', 'Not sent from the ticket email'), ('EMPTY', 'Nothing left after removing quoted text')], max_length=20)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Inbound Email',
+                'verbose_name_plural': 'Inbound Email Log',
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+def create_stamp(apps, schema_editor):
+    apps.get_model('tickets', 'AuthContextStamp').objects.using(schema_editor.connection.alias).get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0023_inbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthContextStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_stamp, migrations.RunPython.noop),
+    ]
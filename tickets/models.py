@@ -1,7 +1,23 @@
-from django.db import models
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Upper
 from django.contrib.auth.models import User 
-from django.core.mail import send_mail 
 from django.conf import settings 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+class StudentMasterQuerySet(models.QuerySet):
+    def by_index_number(self, index_number):
+        """Case-insensitive match that can use the Upper(index_number) index, unlike iexact."""
+        return self.alias(index_upper=Upper('index_number')).filter(index_upper=index_number.upper())
+
 
 class StudentMaster(models.Model):
     index_number = models.CharField(max_length=50, unique=True, help_text="e.g. UGC-STU-2026-001")
@@ -10,6 +26,10 @@ class StudentMaster(models.Model):
     course = models.CharField(max_length=100, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Stamped by import_master_list; rows the latest import did not touch get deactivated
+    last_imported_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = StudentMasterQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.index_number} - {self.full_name}"
@@ -17,6 +37,15 @@ class StudentMaster(models.Model):
     class Meta:
         verbose_name = "Master Student List"
         verbose_name_plural = "Master Student List"
+        indexes = [
+            models.Index(Upper('index_number'), name='student_index_upper_idx'),
+        ]
+
+
+class StaffMasterQuerySet(models.QuerySet):
+    def by_staff_id(self, staff_id):
+        """Case-insensitive match that can use the Upper(staff_id) index, unlike iexact."""
+        return self.alias(staff_id_upper=Upper('staff_id')).filter(staff_id_upper=staff_id.upper())
 
 
 class StaffMaster(models.Model):
@@ -24,6 +53,9 @@ class StaffMaster(models.Model):
     full_name = models.CharField(max_length=150)
     email = models.EmailField(unique=True) 
     is_active = models.BooleanField(default=True)
+    last_imported_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = StaffMasterQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.staff_id} - {self.full_name}"
@@ -31,10 +63,47 @@ class StaffMaster(models.Model):
     class Meta:
         verbose_name = "Master Staff List"
         verbose_name_plural = "Master Staff List"
+        indexes = [
+            models.Index(Upper('staff_id'), name='staff_id_upper_idx'),
+        ]
 
 
 # --- THE TICKET SYSTEM ---
 
+class TicketQuerySet(models.QuerySet):
+    def refresh_thread_summary(self):
+        """Recomputes the denormalized thread summary of every ticket in the queryset with one UPDATE."""
+        thread = TicketMessage.objects.filter(ticket=OuterRef('pk'))
+        latest = thread.order_by('-created_at', '-id')
+        latest_staff = thread.filter(is_staff=True).order_by('-created_at', '-id')
+        first_staff = thread.filter(is_staff=True).order_by('created_at', 'id')
+        message_count = thread.order_by().values('ticket').annotate(total=Count('id')).values('total')
+
+        return self.update(
+            last_message=Subquery(latest.values('id')[:1]),
+            last_reply_by=Subquery(latest.annotate(
+                reply_by=Case(When(is_staff=True, then=Value('STAFF')), default=Value('USER'))
+            ).values('reply_by')[:1]),
+            reply_message=Subquery(latest.values('message')[:1]),
+            last_staff_name=Subquery(latest_staff.values('sender_name')[:1]),
+            message_count=Coalesce(Subquery(message_count), 0),
+            last_activity_at=Subquery(latest.values('created_at')[:1]),
+            first_response_at=Subquery(first_staff.values('created_at')[:1]),
+        )
+
+    def recent_duplicates(self, content_hash, minutes):
+        """Tickets with this content hash submitted in the last `minutes`, newest first."""
+        since = timezone.now() - timedelta(minutes=minutes)
+        return self.filter(content_hash=content_hash, created_at__gte=since).order_by('-created_at')
+
+
+class TicketManager(models.Manager.from_queryset(TicketQuerySet)):
+    """Live tickets only; soft-deleted ones are reached through Ticket.all_objects."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Ticket(models.Model):
     DEPARTMENT_CHOICES = [
         ('I.T.', 'I.T.'),
@@ -70,9 +139,71 @@ class Ticket(models.Model):
     last_reply_by = models.CharField(max_length=20, choices=[('STAFF', 'Staff'), ('USER', 'User')], null=True, blank=True)
     
     reply_message = models.TextField(null=True, blank=True) 
+
+    # Thread summary, maintained by TicketMessage writes (see rebuild_thread_summary to repair)
+    last_message = models.ForeignKey('TicketMessage', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', editable=False)
+    last_staff_name = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    message_count = models.PositiveIntegerField(default=0, editable=False)
+    last_activity_at = models.DateTimeField(null=True, blank=True, editable=False)
+    first_response_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Fingerprint of the submitter's email, subject and message, for spotting resubmissions
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+
+    # Set when the status moves to Resolved, cleared when the ticket is reopened
+    resolved_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # Set by a soft delete; the row is hard-deleted by purge_deleted_tickets once TICKET_RESTORE_DAYS have passed
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TicketManager()
+    all_objects = TicketQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Staff dashboard feed: department scope, newest first, keyset on (updated_at, id)
+            models.Index(fields=['department', '-updated_at', '-id'], name='ticket_dept_updated_idx'),
+            models.Index(fields=['department', 'status', '-updated_at', '-id'], name='ticket_dept_status_upd_idx'),
+            # University-wide (Super Command) feed
+            models.Index(fields=['-updated_at', '-id'], name='ticket_updated_idx'),
+            # Duplicate-submission window lookups
+            models.Index(fields=['content_hash', '-created_at'], name='ticket_content_hash_idx'),
+            # Finding resolved tickets old enough to archive
+            models.Index(fields=['status', 'resolved_at'], name='ticket_status_resolved_idx'),
+            # Finding soft-deleted tickets to purge
+            models.Index(fields=['deleted_at'], name='ticket_deleted_idx', condition=Q(deleted_at__isnull=False)),
+        ]
+
+    # Owned by TicketMessage writes; a full save() of a possibly stale instance must not overwrite them
+    THREAD_SUMMARY_FIELDS = (
+        'last_reply_by', 'reply_message', 'last_message', 'last_staff_name', 'message_count', 'last_activity_at',
+        'first_response_at',
+    )
+
+    # Fields whose loaded value is remembered so saves can tell what changed
+    TRACKED_FIELDS = ('status', 'department')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values) if name in cls.TRACKED_FIELDS
+        }
+        return instance
+
+    def loaded_value(self, field_name):
+        """Value of a tracked field as last read from the database (None for unsaved tickets)."""
+        return getattr(self, '_loaded_values', {}).get(field_name)
+
+    @staticmethod
+    def compute_content_hash(email, subject, message):
+        """Ignores case and whitespace differences, so a retyped or re-sent form still matches."""
+        normalized = '\x1f'.join(' '.join((part or '').split()).lower() for part in (email, subject, message))
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
     @property
     def formatted_id(self):
         if self.id is None: return "UGC-00000000"
@@ -80,27 +211,47 @@ class Ticket(models.Model):
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
-        super().save(*args, **kwargs)
-
-        if is_new:
-            # Automatically link the first message to the thread
-            TicketMessage.objects.create(
-                ticket=self,
-                sender_name=self.name,
-                message=self.message,
-                is_staff=False
-            )
-            
-            try:
+        if self.status == 'Resolved':
+            if self.resolved_at is None or self.loaded_value('status') != 'Resolved':
+                self.resolved_at = timezone.now()
+        else:
+            self.resolved_at = None
+
+        update_fields = kwargs.get('update_fields')
+        if not self._state.adding and update_fields is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.THREAD_SUMMARY_FIELDS
+            ]
+        elif update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'resolved_at']
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # post_save receivers have compared against the loaded values; the instance now matches the row
+            self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+
+            if is_new:
+                # Automatically link the first message to the thread
+                opening = TicketMessage(
+                    ticket=self,
+                    sender_name=self.name,
+                    message=self.message,
+                    is_staff=False
+                )
+                opening.opens_ticket = True
+                opening.save()
+
+                # Queued in the same transaction; the send_queued_emails worker delivers it
                 ugc_depts = getattr(settings, 'UGC_DEPARTMENTS', {})
                 central_email = getattr(settings, 'UNIVERSITY_CENTRAL_EMAIL', settings.DEFAULT_FROM_EMAIL)
                 dept_email = ugc_depts.get(self.department, central_email)
-                
-                email_subject = f"NEW ENQUIRY ALERT: [{self.department}] - {self.formatted_id}"
-                email_body = f"A new ticket has been submitted to {self.department}.\nSubject: {self.subject}"
-                send_mail(email_subject, email_body, settings.DEFAULT_FROM_EMAIL, [dept_email], fail_silently=True)
-            except Exception as e:
-                print(f"Notification Error: {e}")
+
+                OutboundEmail.queue(
+                    f"NEW ENQUIRY ALERT: [{self.department}] - {self.formatted_id}",
+                    f"A new ticket has been submitted to {self.department}.\nSubject: {self.subject}",
+                    [dept_email],
+                )
 
     def __str__(self):
         return f"{self.formatted_id} - {self.name}"
@@ -121,19 +272,49 @@ class TicketMessage(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Thread reads and "latest message" lookups
+            models.Index(fields=['ticket', 'created_at'], name='ticketmsg_ticket_created_idx'),
+            # "Latest staff reply" lookups
+            models.Index(fields=['ticket', 'is_staff', 'created_at'], name='ticketmsg_ticket_staff_idx'),
+            # Incremental polling: messages after a known id
+            models.Index(fields=['ticket', 'id'], name='ticketmsg_ticket_id_idx'),
+        ]
+
+    # Set by Ticket.save on the message it creates from the ticket itself; receivers leave that one to the ticket
+    opens_ticket = False
 
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        # Using update() prevents the save() recursion loop while ensuring metadata updates
-        Ticket.objects.filter(id=self.ticket.id).update(
-            last_reply_by='STAFF' if self.is_staff else 'USER',
-            reply_message=self.message,
-            updated_at=models.functions.Now()
-        )
-        
-        if not self.is_staff and self.ticket.status == 'Resolved':
-            Ticket.objects.filter(id=self.ticket.id).update(status='Open')
+        is_new = self._state.adding
+        # No savepoint: a failure here already aborts the caller's transaction
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+            if is_new:
+                # One UPDATE keeps the thread summary current and reopens a resolved ticket when
+                # the user writes back; the status is decided from the row, never from self.ticket.
+                summary = {
+                    'last_message': self,
+                    'last_reply_by': 'STAFF' if self.is_staff else 'USER',
+                    'reply_message': self.message,
+                    'message_count': F('message_count') + 1,
+                    'last_activity_at': self.created_at,
+                    # App clock rather than Now() so updated_at stays comparable with auto_now values (dashboard keyset cursor).
+                    'updated_at': timezone.now(),
+                }
+                if self.is_staff:
+                    summary['last_staff_name'] = self.sender_name
+                    summary['first_response_at'] = Coalesce(F('first_response_at'), Value(self.created_at))
+                else:
+                    summary['status'] = Case(When(status='Resolved', then=Value('Open')), default=F('status'))
+                    summary['resolved_at'] = Case(
+                        When(status='Resolved', then=Value(None)), default=F('resolved_at'),
+                        output_field=models.DateTimeField(),
+                    )
+                Ticket.objects.filter(id=self.ticket_id).update(**summary)
+            else:
+                # An edited message may be the one the summary points at
+                Ticket.objects.filter(id=self.ticket_id).refresh_thread_summary()
 
     def __str__(self):
         return f"Msg on {self.ticket.formatted_id} by {self.sender_name}"
@@ -150,4 +331,247 @@ class StaffProfile(models.Model):
     staff_email = models.EmailField()
 
     def __str__(self):
-        return f"{self.user.username} ({self.department})"
\ No newline at end of file
+        return f"{self.user.username} ({self.department})"
+
+
+class AuthContextStamp(models.Model):
+    """One row whose version moves whenever a user or staff profile changes.
+
+    Cached auth contexts carry the version they were loaded at; every
+    signed-in request reads this row, so a deactivation or role change made
+    on another worker is seen on the next request even where that worker's
+    cache invalidation does not reach.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+
+# --- OUTBOUND EMAIL QUEUE ---
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When a PENDING email is due; for a SENDING one, when its worker's lease runs out
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Email Queue"
+        indexes = [
+            # The worker only ever asks for due PENDING rows, oldest first
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    @classmethod
+    def queue(cls, subject, body, recipients):
+        """Adds an email to the outbox; commits or rolls back with the caller's transaction."""
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        return cls.objects.create(subject=subject, body=body, recipients=list(recipients))
+
+    @classmethod
+    async def aqueue(cls, subject, body, recipients):
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        return await cls.objects.acreate(subject=subject, body=body, recipients=list(recipients))
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
+# --- INBOUND EMAIL REPLIES ---
+
+class InboundEmail(models.Model):
+    """One email read by `ingest_email_replies`, whatever became of it, so a re-read spool is skipped."""
+    OUTCOME_CHOICES = [
+        ('ACCEPTED', 'Added to the thread'),
+        ('NO_REFERENCE', 'No ticket reference in the subject'),
+        ('UNKNOWN_TICKET', 'No live ticket with that reference'),
+        ('SENDER_MISMATCH', 'Not sent from the ticket email'),
+        ('EMPTY', 'Nothing left after removing quoted text'),
+    ]
+
+    # sha256 of the Message-ID (of the raw message when it has none); Message-IDs may exceed any column
+    message_key = models.CharField(max_length=64, unique=True)
+    message_id = models.CharField(max_length=255, blank=True)
+    sender = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255, blank=True)
+    # A plain id rather than a foreign key: archiving and purging tickets leave this log alone
+    ticket_id = models.BigIntegerField(null=True, blank=True)
+    outcome = models.CharField(max_length=20, choices=OUTCOME_CHOICES)
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Inbound Email"
+        verbose_name_plural = "Inbound Email Log"
+
+    def __str__(self):
+        return f"{self.message_id or self.message_key} ({self.outcome})"
+
+
+# --- FULL-TEXT SEARCH ---
+
+class TicketSearchDocument(models.Model):
+    """Searchable text of one ticket: its subject and every message in its thread.
+
+    'vector' is the PostgreSQL tsvector (GIN-indexed there); other databases
+    leave it empty and are served by the SearchPosting inverted index instead.
+    """
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Search document for UGC-{self.ticket_id:08d}"
+
+
+class SearchPosting(models.Model):
+    """One term of one document, weighted by where and how often it occurs (non-PostgreSQL fallback)."""
+    document = models.ForeignKey(TicketSearchDocument, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'document'], name='searchposting_term_doc_uniq'),
+        ]
+
+
+# --- REPORTING ROLLUPS ---
+
+class DepartmentDailyStats(models.Model):
+    """Per-department, per-day activity counters, bumped as tickets and messages are written."""
+    department = models.CharField(max_length=50)
+    day = models.DateField()
+    opened = models.PositiveIntegerField(default=0)
+    resolved = models.PositiveIntegerField(default=0)
+    reopened = models.PositiveIntegerField(default=0)
+    transferred_in = models.PositiveIntegerField(default=0)
+    transferred_out = models.PositiveIntegerField(default=0)
+    first_responses = models.PositiveIntegerField(default=0)
+    first_response_seconds = models.BigIntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+    user_replies = models.PositiveIntegerField(default=0)
+    staff_replies = models.PositiveIntegerField(default=0)
+
+    KEY_FIELDS = ('department', 'day')
+    COUNTER_FIELDS = (
+        'opened', 'resolved', 'reopened', 'transferred_in', 'transferred_out', 'first_responses',
+        'first_response_seconds', 'resolution_seconds', 'user_replies', 'staff_replies',
+    )
+
+    class Meta:
+        verbose_name = "Department Daily Stats"
+        verbose_name_plural = "Department Daily Stats"
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'day'], name='deptdaily_dept_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.department} on {self.day}"
+
+
+class ResolutionTimeBucket(models.Model):
+    """Histogram of resolution times per department and day, for medians without scanning tickets."""
+    department = models.CharField(max_length=50)
+    day = models.DateField()
+    bucket = models.PositiveSmallIntegerField()
+    tickets = models.PositiveIntegerField(default=0)
+
+    KEY_FIELDS = ('department', 'day', 'bucket')
+    COUNTER_FIELDS = ('tickets',)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'day', 'bucket'], name='resbucket_dept_day_bucket_uniq'),
+        ]
+
+
+# --- ARCHIVE ---
+
+class ArchivedTicket(models.Model):
+    """A resolved ticket moved out of the live tables by `archive_tickets`, under its original id.
+
+    Its thread is kept either as ArchivedTicketMessage rows or, when archived
+    with --compress, as zlib-compressed JSON in thread_data.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    email = models.EmailField()
+    phone = models.CharField(max_length=20, null=True, blank=True)
+    user_type = models.CharField(max_length=10, choices=Ticket.USER_TYPE_CHOICES, default='VISITOR')
+    student_id = models.CharField(max_length=50, null=True, blank=True)
+    staff_id = models.CharField(max_length=50, null=True, blank=True)
+    subject = models.CharField(max_length=200)
+    message = models.TextField()
+    department = models.CharField(max_length=50, choices=Ticket.DEPARTMENT_CHOICES)
+    status = models.CharField(max_length=20)
+    message_count = models.PositiveIntegerField(default=0)
+    first_response_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    thread_data = models.BinaryField(null=True, blank=True, editable=False)
+
+    # Ticket columns copied as they are
+    COPIED_FIELDS = (
+        'id', 'name', 'email', 'phone', 'user_type', 'student_id', 'staff_id', 'subject', 'message',
+        'department', 'status', 'message_count', 'first_response_at', 'resolved_at', 'created_at', 'updated_at',
+    )
+
+    class Meta:
+        verbose_name = "Archived Ticket"
+        verbose_name_plural = "Archived Tickets"
+
+    @property
+    def formatted_id(self):
+        return f"UGC-{self.id:08d}"
+
+    @staticmethod
+    def compress_thread(rows):
+        return zlib.compress(json.dumps(rows, cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+
+    def thread_rows(self):
+        """The thread as THREAD_COLUMNS dicts, oldest first, from whichever form it was archived in."""
+        if self.thread_data is None:
+            return list(self.messages.order_by('created_at', 'id').values(*ArchivedTicketMessage.THREAD_COLUMNS))
+        rows = json.loads(zlib.decompress(bytes(self.thread_data)))
+        for row in rows:
+            row['created_at'] = parse_datetime(row['created_at'])
+        return rows
+
+    def __str__(self):
+        return f"{self.formatted_id} - {self.name} (archived)"
+
+
+class ArchivedTicketMessage(models.Model):
+    # Original ids, so parent_id still links replies within the thread
+    id = models.BigIntegerField(primary_key=True)
+    ticket = models.ForeignKey(ArchivedTicket, on_delete=models.CASCADE, related_name='messages')
+    parent_id = models.BigIntegerField(null=True, blank=True)
+    sender_name = models.CharField(max_length=100)
+    message = models.TextField()
+    is_staff = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    THREAD_COLUMNS = ('id', 'parent_id', 'sender_name', 'message', 'is_staff', 'created_at')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ticket', 'created_at'], name='archivedmsg_ticket_created_idx'),
+        ]
@@ -0,0 +1,114 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2x base, 4x base ... capped at OUTBOX_RETRY_MAX_SECONDS."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 30)
+    ceiling = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * (2 ** max(attempts - 1, 0)), ceiling))
+
+
+def queue_depth():
+    """Row counts per status, plus how many pending emails are already due."""
+    depth = {status: 0 for status, _ in OutboundEmail.STATUS_CHOICES}
+    for row in OutboundEmail.objects.values('status').annotate(total=Count('id')).order_by():
+        depth[row['status']] = row['total']
+    depth['DUE'] = OutboundEmail.objects.filter(status='PENDING', next_attempt_at__lte=timezone.now()).count()
+    return depth
+
+
+def lease_duration():
+    """How long a claimed email stays with its worker before another may take it over."""
+    return timedelta(seconds=getattr(settings, 'OUTBOX_LEASE_SECONDS', 300))
+
+
+def _failure_fields(attempts, error, max_attempts, now):
+    fields = {'last_error': str(error)[:2000]}
+    if attempts >= max_attempts:
+        fields['status'] = 'FAILED'
+    else:
+        fields.update(status='PENDING', next_attempt_at=now + retry_delay(attempts))
+    return fields
+
+
+def claim_batch(batch_size, max_attempts, now):
+    """Marks up to batch_size due emails SENDING under a lease, in one short transaction, and returns them.
+
+    The claim counts as an attempt, so an email whose worker died while
+    sending it is retried once the lease runs out and, after max_attempts
+    such claims, given up on instead of being sent forever.
+    """
+    with transaction.atomic():
+        OutboundEmail.objects.filter(status='SENDING', next_attempt_at__lte=now, attempts__gte=max_attempts).update(
+            status='FAILED', last_error="The worker sending this email stopped before recording the result.",
+        )
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=('PENDING', 'SENDING'), next_attempt_at__lte=now)
+            .order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        OutboundEmail.objects.filter(id__in=ids).update(
+            status='SENDING', attempts=F('attempts') + 1, next_attempt_at=now + lease_duration(),
+        )
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('id'))
+
+
+def deliver_batch(batch_size=None, max_attempts=None):
+    """Sends one batch of due emails over a single SMTP connection.
+
+    The batch is claimed with SKIP LOCKED in its own short transaction, so
+    several workers can drain the queue side by side and no row lock or
+    transaction stays open during SMTP round-trips. Each result is recorded
+    as soon as its email is sent: if the worker dies mid-batch, the emails
+    already delivered stay SENT and only the rest are retried when their
+    lease (OUTBOX_LEASE_SECONDS) runs out. Returns a (sent, failed) tuple.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 50)
+    max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+    now = timezone.now()
+    sent = failed = 0
+
+    batch = claim_batch(batch_size, max_attempts, now)
+    if not batch:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: the whole batch backs off together
+        for email in batch:
+            for field, value in _failure_fields(email.attempts, e, max_attempts, now).items():
+                setattr(email, field, value)
+        OutboundEmail.objects.bulk_update(batch, ['last_error', 'status', 'next_attempt_at'])
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            message = EmailMessage(
+                email.subject, email.body, settings.DEFAULT_FROM_EMAIL, email.recipients, connection=connection
+            )
+            try:
+                connection.send_messages([message])
+            except Exception as e:
+                fields = _failure_fields(email.attempts, e, max_attempts, now)
+                failed += 1
+            else:
+                fields = {'status': 'SENT', 'sent_at': timezone.now(), 'last_error': ''}
+                sent += 1
+            # Only while the claim is still ours: a lease that ran out may have passed the email to another worker
+            OutboundEmail.objects.filter(id=email.id, status='SENDING', next_attempt_at=email.next_attempt_at).update(**fields)
+    finally:
+        connection.close()
+
+    return sent, failed
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Ticket, TicketMessage, TicketSearchDocument, SearchPosting
+
+
+def restore_days():
+    return getattr(settings, 'TICKET_RESTORE_DAYS', 30)
+
+
+def restore_cutoff():
+    """Tickets deleted before this moment are past the restore window."""
+    return timezone.now() - timedelta(days=restore_days())
+
+
+def restorable():
+    """Soft-deleted tickets still inside the restore window."""
+    return Ticket.all_objects.filter(deleted_at__gte=restore_cutoff())
+
+
+def purgeable(cutoff):
+    return Ticket.all_objects.filter(deleted_at__lt=cutoff)
+
+
+def delete_tickets(ticket_ids):
+    """Removes these tickets with their threads and search entries; returns the number of messages deleted.
+
+    Plain DELETE statements keyed on the ticket ids replace the ORM
+    collector, which would load every message, issue the parent SET NULL
+    updates one by one and queue per-message signal work. No signals are
+    sent; call inside the caller's transaction, with the rows locked.
+    """
+    placeholders = ', '.join(['%s'] * len(ticket_ids))
+    table = {model: connection.ops.quote_name(model._meta.db_table) for model in (
+        Ticket, TicketMessage, TicketSearchDocument, SearchPosting,
+    )}
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table[SearchPosting]} WHERE document_id IN ({placeholders})", ticket_ids)
+        cursor.execute(f"DELETE FROM {table[TicketSearchDocument]} WHERE ticket_id IN ({placeholders})", ticket_ids)
+        # Replies are threaded within one ticket; a stray link from another ticket is cut, as SET_NULL would
+        cursor.execute(
+            f"UPDATE {table[TicketMessage]} SET parent_id = NULL "
+            f"WHERE parent_id IN (SELECT id FROM {table[TicketMessage]} WHERE ticket_id IN ({placeholders})) "
+            f"AND ticket_id NOT IN ({placeholders})",
+            ticket_ids + ticket_ids,
+        )
+        cursor.execute(f"UPDATE {table[Ticket]} SET last_message_id = NULL WHERE id IN ({placeholders})", ticket_ids)
+        cursor.execute(f"DELETE FROM {table[TicketMessage]} WHERE ticket_id IN ({placeholders})", ticket_ids)
+        messages = cursor.rowcount
+        cursor.execute(f"DELETE FROM {table[Ticket]} WHERE id IN ({placeholders})", ticket_ids)
+    return messages
+
+
+def purge_batch(ticket_ids, cutoff):
+    """Hard-deletes these soft-deleted tickets, their threads and search entries in one transaction.
+
+    The rows are locked and re-checked first, so a ticket restored since it
+    was picked is kept. Returns (tickets, messages) deleted.
+    """
+    with transaction.atomic():
+        ids = list(purgeable(cutoff).select_for_update().filter(id__in=ticket_ids).values_list('id', flat=True))
+        if not ids:
+            return 0, 0
+        messages = delete_tickets(ids)
+    return len(ids), messages
+
+
+def purge_deleted(older_than_days=None, batch_size=500, limit=None):
+    """Purges tickets soft-deleted longer ago than the restore window in batches; yields (tickets, messages) per batch."""
+    days = restore_days() if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    purged = 0
+    while limit is None or purged < limit:
+        size = batch_size if limit is None else min(batch_size, limit - purged)
+        ids = list(purgeable(cutoff).order_by('id').values_list('id', flat=True)[:size])
+        if not ids:
+            return
+        tickets, messages = purge_batch(ids, cutoff)
+        purged += tickets
+        yield tickets, messages
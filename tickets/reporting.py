@@ -0,0 +1,310 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery, Sum, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Ticket, TicketMessage, ArchivedTicket, ArchivedTicketMessage, DepartmentDailyStats, ResolutionTimeBucket
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Upper bounds (seconds) of the resolution-time histogram buckets; the last bucket is open-ended
+RESOLUTION_BUCKETS = (HOUR, 4 * HOUR, 8 * HOUR, DAY, 2 * DAY, 3 * DAY, 7 * DAY, 14 * DAY, 30 * DAY)
+
+OPEN_STATUSES = ('Open', 'In-Progress')
+REPORT_WINDOWS = (7, 30, 90, 365)
+
+
+def resolution_bucket(seconds):
+    return bisect_left(RESOLUTION_BUCKETS, seconds)
+
+
+def _bump(model, keys, deltas):
+    """Adds deltas to one rollup row, creating it if needed, in a single INSERT ... ON CONFLICT."""
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    values = {**dict(zip(model.KEY_FIELDS, keys)), **{name: 0 for name in model.COUNTER_FIELDS}, **deltas}
+    columns = {name: quote(model._meta.get_field(name).column) for name in values}
+    sql = (
+        f"INSERT INTO {table} ({', '.join(columns.values())}) VALUES ({', '.join(['%s'] * len(values))}) "
+        f"ON CONFLICT ({', '.join(columns[name] for name in model.KEY_FIELDS)}) DO UPDATE SET "
+        + ', '.join(f"{columns[name]} = {table}.{columns[name]} + EXCLUDED.{columns[name]}" for name in deltas)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+
+
+def bump_daily(department, when, **deltas):
+    _bump(DepartmentDailyStats, (department, timezone.localdate(when)), deltas)
+
+
+# --- INCREMENTAL UPDATES (called from signals, inside the writing transaction) ---
+
+def ticket_saved(ticket, created):
+    now = timezone.now()
+    if created:
+        bump_daily(ticket.department, ticket.created_at, opened=1)
+        previous_status, previous_department = None, ticket.department
+    else:
+        previous_status, previous_department = ticket.loaded_value('status'), ticket.loaded_value('department')
+
+    if previous_department and previous_department != ticket.department and ticket.status in OPEN_STATUSES:
+        bump_daily(previous_department, now, transferred_out=1)
+        bump_daily(ticket.department, now, transferred_in=1)
+
+    if ticket.status == 'Resolved' and previous_status != 'Resolved':
+        ticket_resolved(ticket.department, ticket.created_at, ticket.resolved_at or now)
+    elif previous_status == 'Resolved' and ticket.status != 'Resolved':
+        bump_daily(ticket.department, now, reopened=1)
+
+
+def ticket_resolved(department, created_at, resolved_at):
+    seconds = max(int((resolved_at - created_at).total_seconds()), 0)
+    bump_daily(department, resolved_at, resolved=1, resolution_seconds=seconds)
+    _bump(ResolutionTimeBucket, (department, timezone.localdate(resolved_at), resolution_bucket(seconds)), {'tickets': 1})
+
+
+def tickets_bulk_updated(rows, status=None, department=None, when=None):
+    """Counts a bulk status/department change with one upsert per department and bucket touched.
+
+    rows are the tickets' values as locked before the UPDATE (status,
+    department, created_at, resolved_at); the same transitions are counted as
+    ticket_saved counts for a single save.
+    """
+    now = when or timezone.now()
+    daily = defaultdict(Counter)
+    buckets = Counter()
+    for row in rows:
+        new_status = status or row['status']
+        new_department = department or row['department']
+        if new_department != row['department'] and new_status in OPEN_STATUSES:
+            daily[row['department']]['transferred_out'] += 1
+            daily[new_department]['transferred_in'] += 1
+        if new_status == 'Resolved' and row['status'] != 'Resolved':
+            seconds = max(int((now - row['created_at']).total_seconds()), 0)
+            daily[new_department]['resolved'] += 1
+            daily[new_department]['resolution_seconds'] += seconds
+            buckets[new_department, resolution_bucket(seconds)] += 1
+        elif row['status'] == 'Resolved' and new_status != 'Resolved':
+            daily[new_department]['reopened'] += 1
+
+    for dept, deltas in daily.items():
+        bump_daily(dept, now, **deltas)
+    for (dept, bucket), tickets in buckets.items():
+        _bump(ResolutionTimeBucket, (dept, timezone.localdate(now), bucket), {'tickets': tickets})
+
+
+def message_created(message):
+    """Counts a new reply; message.ticket is expected to be the row as locked by services.post_reply."""
+    if message.opens_ticket:
+        # The opening message is the ticket itself, counted as opened
+        return
+    ticket = message.ticket
+    if message.is_staff:
+        deltas = {'staff_replies': 1}
+        # TicketMessage.save fills first_response_at only while it is empty
+        if ticket.first_response_at is None:
+            deltas['first_responses'] = 1
+            deltas['first_response_seconds'] = max(int((message.created_at - ticket.created_at).total_seconds()), 0)
+            ticket.first_response_at = message.created_at
+    else:
+        deltas = {'user_replies': 1}
+        # ...and reopens a resolved ticket when the user writes back
+        if ticket.status == 'Resolved':
+            deltas['reopened'] = 1
+    bump_daily(ticket.department, message.created_at, **deltas)
+
+
+def user_replies_created(rows, when=None):
+    """Counts replies added in bulk (email ingestion) with one upsert per department.
+
+    rows are (department, status before the replies, number of replies) per
+    ticket; a resolved ticket is reopened once however many replies it got.
+    """
+    now = when or timezone.now()
+    daily = defaultdict(Counter)
+    for department, status, replies in rows:
+        daily[department]['user_replies'] += replies
+        if status == 'Resolved':
+            daily[department]['reopened'] += 1
+    for dept, deltas in daily.items():
+        bump_daily(dept, now, **deltas)
+
+
+# --- REBUILD ---
+
+def rebuild_rollups():
+    """Recomputes both rollup tables from tickets and messages; returns the number of daily rows.
+
+    Reopen and transfer counts cannot be recovered from current state and
+    restart from zero, as do reply counts of threads archived compressed.
+    """
+    first_staff = (
+        TicketMessage.objects.filter(ticket=OuterRef('pk'), is_staff=True).order_by('created_at', 'id').values('created_at')[:1]
+    )
+
+    with transaction.atomic():
+        Ticket.objects.filter(first_response_at__isnull=True).update(first_response_at=Subquery(first_staff))
+        # The best available estimate for tickets resolved before resolved_at existed
+        Ticket.objects.filter(status='Resolved', resolved_at__isnull=True).update(resolved_at=F('updated_at'))
+
+        daily = defaultdict(Counter)
+        buckets = Counter()
+
+        # Archived tickets count towards history exactly like live ones
+        for model in (Ticket, ArchivedTicket):
+            for row in model.objects.values('department', day=TruncDate('created_at')).annotate(n=Count('id')).order_by():
+                daily[row['department'], row['day']]['opened'] += row['n']
+
+            resolved = model.objects.filter(resolved_at__isnull=False).values_list('department', 'created_at', 'resolved_at')
+            for department, created_at, resolved_at in resolved.iterator(chunk_size=5000):
+                seconds = max(int((resolved_at - created_at).total_seconds()), 0)
+                day = timezone.localdate(resolved_at)
+                daily[department, day]['resolved'] += 1
+                daily[department, day]['resolution_seconds'] += seconds
+                buckets[department, day, resolution_bucket(seconds)] += 1
+
+            responded = model.objects.filter(first_response_at__isnull=False).values_list('department', 'created_at', 'first_response_at')
+            for department, created_at, first_response_at in responded.iterator(chunk_size=5000):
+                day = timezone.localdate(first_response_at)
+                daily[department, day]['first_responses'] += 1
+                daily[department, day]['first_response_seconds'] += max(int((first_response_at - created_at).total_seconds()), 0)
+
+        for model in (TicketMessage, ArchivedTicketMessage):
+            opening = model.objects.filter(ticket=OuterRef('ticket')).order_by('created_at', 'id').values('id')[:1]
+            replies = (
+                model.objects.exclude(id=Subquery(opening))
+                .values('is_staff', department=F('ticket__department'), day=TruncDate('created_at'))
+                .annotate(n=Count('id'))
+                .order_by()
+            )
+            for row in replies:
+                daily[row['department'], row['day']]['staff_replies' if row['is_staff'] else 'user_replies'] += row['n']
+
+        DepartmentDailyStats.objects.all().delete()
+        ResolutionTimeBucket.objects.all().delete()
+        DepartmentDailyStats.objects.bulk_create(
+            [DepartmentDailyStats(department=d, day=day, **counts) for (d, day), counts in daily.items()],
+            batch_size=2000,
+        )
+        ResolutionTimeBucket.objects.bulk_create(
+            [ResolutionTimeBucket(department=d, day=day, bucket=b, tickets=n) for (d, day, b), n in buckets.items()],
+            batch_size=2000,
+        )
+    return len(daily)
+
+
+# --- REPORT ---
+
+def median_from_histogram(counts):
+    """Median resolution time in seconds, interpolated inside the bucket that holds it."""
+    total = sum(counts.values())
+    if not total:
+        return None
+    half, seen = total / 2, 0
+    for bucket in range(len(RESOLUTION_BUCKETS) + 1):
+        n = counts.get(bucket, 0)
+        if n and seen + n >= half:
+            lower = RESOLUTION_BUCKETS[bucket - 1] if bucket else 0
+            if bucket == len(RESOLUTION_BUCKETS):
+                return lower
+            return lower + (RESOLUTION_BUCKETS[bucket] - lower) * (half - seen) / n
+        seen += n
+    return None
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "—"
+    if seconds < HOUR:
+        return f"{round(seconds / 60)}m"
+    if seconds < DAY:
+        return f"{seconds / HOUR:.1f}h"
+    return f"{seconds / DAY:.1f}d"
+
+
+def net_backlog_change(counts):
+    return (
+        counts['opened'] + counts['reopened'] + counts['transferred_in']
+        - counts['resolved'] - counts['transferred_out']
+    )
+
+
+def build_report(departments, days=30):
+    """Report over the last `days` days for the given departments, read only from the rollups.
+
+    Work is bounded by departments x days; the current backlog is an index
+    count over open tickets, so neither depends on how much history exists.
+    """
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    counters = DepartmentDailyStats.COUNTER_FIELDS
+
+    stats = DepartmentDailyStats.objects.filter(department__in=departments, day__gte=start)
+    per_department = {
+        row['department']: row
+        for row in stats.values('department').annotate(**{name: Sum(name) for name in counters}).order_by()
+    }
+    per_day = {
+        row['day']: row
+        for row in stats.values('day').annotate(**{name: Sum(name) for name in counters}).order_by()
+    }
+
+    histograms = defaultdict(dict)
+    combined = Counter()
+    bucket_rows = (
+        ResolutionTimeBucket.objects.filter(department__in=departments, day__gte=start)
+        .values('department', 'bucket').annotate(n=Sum('tickets')).order_by()
+    )
+    for row in bucket_rows:
+        histograms[row['department']][row['bucket']] = row['n']
+        combined[row['bucket']] += row['n']
+
+    backlog = dict(
+        Ticket.objects.filter(department__in=departments, status__in=OPEN_STATUSES)
+        .values('department').annotate(n=Count('id')).order_by().values_list('department', 'n')
+    )
+
+    empty = {name: 0 for name in counters}
+
+    def summarize(counts, histogram):
+        return {
+            'opened': counts['opened'],
+            'resolved': counts['resolved'],
+            'user_replies': counts['user_replies'],
+            'staff_replies': counts['staff_replies'],
+            'avg_first_response': format_duration(
+                counts['first_response_seconds'] / counts['first_responses'] if counts['first_responses'] else None
+            ),
+            'median_resolution': format_duration(median_from_histogram(histogram)),
+        }
+
+    rows = []
+    for department in departments:
+        counts = {**empty, **{k: v or 0 for k, v in per_department.get(department, {}).items() if k in counters}}
+        rows.append({'department': department, 'backlog': backlog.get(department, 0), **summarize(counts, histograms[department])})
+
+    # Walk back from today's live backlog to the backlog at the end of each earlier day
+    daily, end_backlog = [], sum(backlog.values())
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        counts = {**empty, **{k: v or 0 for k, v in per_day.get(day, {}).items() if k in counters}}
+        daily.append({'day': day, 'backlog': end_backlog, **summarize(counts, {})})
+        end_backlog -= net_backlog_change(counts)
+
+    totals = {**empty}
+    for row in per_department.values():
+        for name in counters:
+            totals[name] += row[name] or 0
+
+    return {
+        'start': start,
+        'end': today,
+        'departments': rows,
+        'daily': daily,
+        'totals': {'backlog': sum(backlog.values()), **summarize(totals, combined)},
+    }
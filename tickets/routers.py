@@ -0,0 +1,79 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set on the response of a request that wrote; while the browser sends it back, its reads stay on the primary
+PIN_COOKIE = 'ugc_primary'
+
+# Routing for the request being served on this thread or task; None outside requests
+_current = ContextVar('ugc_db_routing', default=None)
+
+
+def replica_databases():
+    return list(getattr(settings, 'REPLICA_DATABASES', ()))
+
+
+def sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+class RoutingState:
+    """The replica one request reads from, and whether it has to read the primary instead."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.replica = None
+
+
+def begin_request(pinned=False):
+    state = RoutingState(pinned)
+    return state, _current.set(state)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def pin_primary():
+    """Sends the rest of the current request's reads to the primary."""
+    state = _current.get()
+    if state is not None:
+        state.pinned = True
+
+
+class PrimaryReplicaRouter:
+    """Reads made while serving a request go to one of REPLICA_DATABASES; everything else uses default.
+
+    A request keeps to one randomly chosen replica, so the rows it reads (a
+    ticket and its thread, a cache version and the payload built for it)
+    come from the same point in replication. Reads inside a transaction,
+    after the request's first write, or in a request pinned by
+    ReplicaRoutingMiddleware go to the primary. Management commands and
+    workers run outside requests and always use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _current.get()
+        replicas = replica_databases()
+        if state is None or state.pinned or not replicas or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.replica is None:
+            state.replica = random.choice(replicas)
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _current.get()
+        if state is not None:
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema through replication
+        return False if db in replica_databases() else None
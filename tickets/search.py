@@ -0,0 +1,207 @@
+import math
+import re
+import threading
+from collections import Counter
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Q, Sum, TextField, Value, When
+from django.db.models.functions import Concat
+from django.utils.module_loading import import_string
+
+from .models import Ticket, TicketMessage, TicketSearchDocument, SearchPosting
+
+SEARCH_CONFIG = 'english'
+MAX_TERM_LENGTH = 64
+
+# Same proportions as PostgreSQL's default ts_rank weights for A (subject) and B (thread)
+TITLE_WEIGHT = 10
+BODY_WEIGHT = 4
+
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its my of on or our "
+    "please so that the their this to was we were with you your".split()
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PHRASE_PATTERN = re.compile(r'"([^"]+)"')
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_PATTERN.findall((text or '').lower())
+        if token not in STOP_WORDS
+    ]
+
+
+def parse_query(query):
+    """Splits a search box string into (terms, quoted phrases); every term must match."""
+    phrases = [p.strip() for p in PHRASE_PATTERN.findall(query) if p.strip()]
+    terms = list(dict.fromkeys(tokenize(query)))
+    return terms, phrases
+
+
+def build_documents(ticket_ids):
+    """Unsaved documents for the given tickets, built with two queries."""
+    tickets = Ticket.objects.filter(id__in=ticket_ids).values_list('id', 'subject', 'message')
+    messages = (
+        TicketMessage.objects.filter(ticket_id__in=ticket_ids)
+        .order_by('ticket_id', 'created_at', 'id')
+        .values_list('ticket_id', 'message')
+    )
+    threads = {ticket_id: [m for _, m in group] for ticket_id, group in groupby(messages, key=lambda row: row[0])}
+    # The opening message repeats Ticket.message, so the thread alone covers it when present
+    return [
+        TicketSearchDocument(ticket_id=ticket_id, title=subject, body='\n'.join(threads.get(ticket_id) or [message]))
+        for ticket_id, subject, message in tickets
+    ]
+
+
+def snippet(body, terms, width=160):
+    """A window of the body around the first matching term."""
+    lowered = body.lower()
+    positions = [lowered.find(term) for term in terms]
+    start = min((p for p in positions if p >= 0), default=0)
+    start = max(start - width // 4, 0)
+    text = body[start:start + width].replace('\n', ' ')
+    return ('...' if start else '') + text + ('...' if start + width < len(body) else '')
+
+
+class SearchBackend:
+    """Keeps TicketSearchDocument rows current and answers ranked queries."""
+
+    def index_tickets(self, ticket_ids):
+        documents = build_documents(ticket_ids)
+        TicketSearchDocument.objects.bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['ticket'],
+            update_fields=['title', 'body', 'indexed_at'],
+        )
+        self.index_documents(documents)
+        return len(documents)
+
+    def index_documents(self, documents):
+        raise NotImplementedError
+
+    def append_message(self, ticket_id, text):
+        """Adds a new reply to an indexed ticket."""
+        self.index_tickets([ticket_id])
+
+    def search(self, query, department=None, status=None, offset=0, limit=20):
+        """[(ticket_id, rank), ...] best first, for tickets matching every term of the query."""
+        raise NotImplementedError
+
+    def scope(self, queryset, prefix, department, status):
+        # Deleted tickets keep their documents until they are purged
+        queryset = queryset.filter(**{f"{prefix}ticket__deleted_at__isnull": True})
+        if department:
+            queryset = queryset.filter(**{f"{prefix}ticket__department": department})
+        if status:
+            queryset = queryset.filter(**{f"{prefix}ticket__status": status})
+        return queryset
+
+
+class PostgresSearchBackend(SearchBackend):
+    """tsvector per ticket, matched through a GIN index and ranked with ts_rank."""
+
+    def vector(self, body=F('body')):
+        return (
+            SearchVector('title', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(body, weight='B', config=SEARCH_CONFIG)
+        )
+
+    def index_documents(self, documents):
+        TicketSearchDocument.objects.filter(pk__in=[d.ticket_id for d in documents]).update(vector=self.vector())
+
+    def append_message(self, ticket_id, text):
+        # The vector is rebuilt from the stored text by the database; the thread is not read back
+        body = Concat(F('body'), Value('\n'), Value(text), output_field=TextField())
+        updated = TicketSearchDocument.objects.filter(pk=ticket_id).update(body=body, vector=self.vector(body))
+        if not updated:
+            self.index_tickets([ticket_id])
+
+    def search(self, query, department=None, status=None, offset=0, limit=20):
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        queryset = self.scope(TicketSearchDocument.objects.filter(vector=search_query), '', department, status)
+        queryset = (
+            queryset.annotate(rank=SearchRank(F('vector'), search_query))
+            .order_by('-rank', '-ticket_id')
+            .values_list('ticket_id', 'rank')
+        )
+        return list(queryset[offset:offset + limit])
+
+
+class InvertedIndexSearchBackend(SearchBackend):
+    """Term postings in an ordinary table, ranked by weighted tf-idf; for SQLite and tests."""
+
+    def postings(self, document):
+        weights = Counter()
+        for term in tokenize(document.title):
+            weights[term] += TITLE_WEIGHT
+        for term in tokenize(document.body):
+            weights[term] += BODY_WEIGHT
+        return [SearchPosting(document_id=document.ticket_id, term=term, weight=w) for term, w in weights.items()]
+
+    def index_documents(self, documents):
+        SearchPosting.objects.filter(document_id__in=[d.ticket_id for d in documents]).delete()
+        SearchPosting.objects.bulk_create(
+            [posting for document in documents for posting in self.postings(document)],
+            batch_size=2000,
+        )
+
+    def search(self, query, department=None, status=None, offset=0, limit=20):
+        terms, phrases = parse_query(query)
+        if not terms:
+            return []
+
+        total = TicketSearchDocument.objects.count()
+        frequencies = dict(
+            SearchPosting.objects.filter(term__in=terms).values('term').annotate(n=Count('id')).values_list('term', 'n')
+        )
+        if len(frequencies) < len(terms):
+            return []
+
+        postings = self.scope(SearchPosting.objects.filter(term__in=terms), 'document__', department, status)
+        for phrase in phrases:
+            postings = postings.filter(Q(document__title__icontains=phrase) | Q(document__body__icontains=phrase))
+
+        idf = {term: math.log(1 + total / frequencies[term]) for term in terms}
+        score = Sum(
+            Case(*[When(term=term, then=F('weight') * Value(weight)) for term, weight in idf.items()],
+                 output_field=FloatField())
+        )
+        ranked = (
+            postings.values('document_id')
+            .annotate(matched=Count('term'), rank=score)
+            .filter(matched=len(terms))
+            .order_by('-rank', '-document_id')
+            .values_list('document_id', 'rank')
+        )
+        return list(ranked[offset:offset + limit])
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            default = (
+                'tickets.search.PostgresSearchBackend' if connection.vendor == 'postgresql'
+                else 'tickets.search.InvertedIndexSearchBackend'
+            )
+            _backend = import_string(getattr(settings, 'TICKET_SEARCH_BACKEND', None) or default)()
+        return _backend
+
+
+def search_tickets(query, department=None, status=None, offset=0, limit=20):
+    """Ranked page of (document, rank) pairs, each document with its ticket loaded."""
+    hits = get_search_backend().search(query, department=department, status=status, offset=offset, limit=limit)
+    documents = TicketSearchDocument.objects.select_related('ticket').in_bulk([ticket_id for ticket_id, _ in hits])
+    return [(documents[ticket_id], rank) for ticket_id, rank in hits if ticket_id in documents]
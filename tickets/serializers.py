@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.formats import date_format
+
+# A cached row is only reused while its updated_at matches, so this just bounds how long idle rows linger
+ROW_CACHE_SECONDS = 60 * 60
+
+
+def serialize_dashboard_row(ticket):
+    return {
+        'id': ticket.id,
+        'ref_id': ticket.formatted_id,
+        'subject': ticket.subject,
+        'message': ticket.message,
+        'department': ticket.department,
+        'name': ticket.name,
+        'email': ticket.email,
+        'user_type': ticket.user_type,
+        'student_id': ticket.student_id,
+        'staff_id': ticket.staff_id,
+        'status': ticket.status,
+        'last_reply_by': ticket.last_reply_by,
+        'reply_message': ticket.reply_message,
+        'last_staff_name': ticket.last_staff_name,
+        'updated_at': ticket.updated_at.isoformat(),
+        'updated_display': date_format(timezone.localtime(ticket.updated_at), 'M d, H:i'),
+    }
+
+
+def row_cache():
+    return caches[getattr(settings, 'DASHBOARD_ROW_CACHE_ALIAS', 'default')]
+
+
+def row_key(ticket_id):
+    return f"dashboard-row:{ticket_id}"
+
+
+def serialize_dashboard_rows(page):
+    """Dashboard rows for tickets of which only id and updated_at need to be loaded.
+
+    Rows are cached per ticket together with the updated_at they were built
+    from; a row whose ticket has moved on since is rebuilt from one query for
+    all the misses. Changes that leave updated_at alone (a thread summary
+    refresh) drop the entry through invalidate_dashboard_rows.
+    """
+    cache = row_cache()
+    cached = cache.get_many([row_key(t.id) for t in page])
+    rows, missing = {}, []
+    for ticket in page:
+        entry = cached.get(row_key(ticket.id))
+        if entry is not None and entry[0] == ticket.updated_at:
+            rows[ticket.id] = entry[1]
+        else:
+            missing.append(ticket.id)
+
+    if missing:
+        from .models import Ticket
+
+        fresh = {}
+        for ticket in Ticket.objects.filter(id__in=missing):
+            rows[ticket.id] = serialize_dashboard_row(ticket)
+            fresh[row_key(ticket.id)] = (ticket.updated_at, rows[ticket.id])
+        cache.set_many(fresh, ROW_CACHE_SECONDS)
+
+    # A ticket deleted between the two reads is left out
+    return [rows[t.id] for t in page if t.id in rows]
+
+
+def invalidate_dashboard_rows(*ticket_ids):
+    row_cache().delete_many([row_key(ticket_id) for ticket_id in ticket_ids])
@@ -0,0 +1,147 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from . import reporting
+from .events import publish_ticket_batch, publish_tickets_deleted
+from .models import Ticket, TicketMessage, OutboundEmail
+from .purge import restorable
+from .tracking import invalidate_tracking
+
+TICKET_STATUSES = ('Open', 'In-Progress', 'Resolved')
+
+
+def post_reply(ticket_id, sender_name, text, is_staff, parent_id=None):
+    """Adds a reply to a ticket's thread and returns (ticket, message).
+
+    The ticket row is read once, locked, so concurrent replies to the same
+    ticket apply one after another; then come the INSERT and the single
+    summary/status UPDATE issued by TicketMessage.save. The ticket is never
+    saved as a whole, so nothing a concurrent writer changed is overwritten.
+    sender_name=None signs the reply with the name on the ticket. Raises
+    Ticket.DoesNotExist for an unknown ticket.
+    """
+    with transaction.atomic(savepoint=False):
+        ticket = Ticket.objects.select_for_update().get(id=ticket_id)
+        if parent_id:
+            # A parent from another ticket's thread is ignored rather than cross-linked
+            parent_id = TicketMessage.objects.filter(id=parent_id, ticket_id=ticket_id).values_list('id', flat=True).first()
+
+        message = TicketMessage(
+            ticket=ticket,
+            sender_name=sender_name or ticket.name,
+            message=text,
+            is_staff=is_staff,
+            parent_id=parent_id or None,
+        )
+        message.save()
+    return ticket, message
+
+
+def bulk_update_tickets(tickets, status=None, department=None):
+    """Sets the status and/or department of every ticket in the queryset; returns the ids changed.
+
+    The rows are locked and read once, then changed by a single UPDATE, so
+    the thread summary and other columns are never rewritten. Rollups,
+    tracking invalidation, dashboard events and the transfer alerts that
+    Ticket.save would trigger per ticket are issued once for the whole batch.
+    Tickets already in the requested state are left untouched.
+    """
+    if status is None and department is None:
+        return []
+
+    with transaction.atomic():
+        rows = [
+            row for row in tickets.select_for_update().order_by('id').values('id', 'status', 'department', 'created_at', 'resolved_at')
+            if (status and row['status'] != status) or (department and row['department'] != department)
+        ]
+        if not rows:
+            return []
+        ids = [row['id'] for row in rows]
+        now = timezone.now()
+
+        values = {'updated_at': now}
+        if status:
+            values['status'] = status
+            # SET expressions see the row as it was: a ticket already resolved keeps its resolution time
+            values['resolved_at'] = (
+                Case(
+                    When(status='Resolved', resolved_at__isnull=False, then=F('resolved_at')),
+                    default=Value(now), output_field=models.DateTimeField(),
+                )
+                if status == 'Resolved' else None
+            )
+        if department:
+            values['department'] = department
+        Ticket.objects.filter(id__in=ids).update(**values)
+
+        reporting.tickets_bulk_updated(rows, status=status, department=department, when=now)
+        if department:
+            queue_transfer_alert(department, [row for row in rows if row['department'] != department])
+
+        publish_ticket_batch({
+            row['id']: ('status_changed' if status and row['status'] != status else 'ticket_updated', row['department'])
+            for row in rows
+        })
+        transaction.on_commit(lambda: invalidate_tracking(*ids))
+    return ids
+
+
+def soft_delete_tickets(tickets):
+    """Marks every live ticket in the queryset deleted; returns the ids deleted.
+
+    One UPDATE sets deleted_at and nothing else, so the rows, threads and
+    search entries stay in place for restore_tickets until the
+    purge_deleted_tickets command removes them.
+    """
+    with transaction.atomic():
+        rows = list(tickets.select_for_update().order_by('id').values_list('id', 'department'))
+        if not rows:
+            return []
+        ids = [ticket_id for ticket_id, _ in rows]
+        Ticket.objects.filter(id__in=ids).update(deleted_at=timezone.now())
+
+        by_department = defaultdict(list)
+        for ticket_id, department in rows:
+            by_department[department].append(ticket_id)
+        publish_tickets_deleted(by_department)
+        transaction.on_commit(lambda: invalidate_tracking(*ids))
+    return ids
+
+
+def restore_tickets(ticket_ids):
+    """Brings back tickets deleted within the restore window; returns the ids restored."""
+    with transaction.atomic():
+        rows = list(restorable().select_for_update().filter(id__in=ticket_ids).order_by('id').values_list('id', 'department'))
+        if not rows:
+            return []
+        ids = [ticket_id for ticket_id, _ in rows]
+        Ticket.all_objects.filter(id__in=ids).update(deleted_at=None)
+
+        publish_ticket_batch({ticket_id: ('ticket_updated', department) for ticket_id, department in rows})
+        transaction.on_commit(lambda: invalidate_tracking(*ids))
+    return ids
+
+
+def queue_transfer_alert(department, moved):
+    """One alert to the receiving department listing every ticket moved to it."""
+    if not moved:
+        return
+    moved_ids = {row['id'] for row in moved}
+    tickets = Ticket.objects.filter(id__in=moved_ids).order_by('id').only('id', 'subject')
+    ugc_depts = getattr(settings, 'UGC_DEPARTMENTS', {})
+    central_email = getattr(settings, 'UNIVERSITY_CENTRAL_EMAIL', settings.DEFAULT_FROM_EMAIL)
+    from_departments = defaultdict(int)
+    for row in moved:
+        from_departments[row['department']] += 1
+
+    OutboundEmail.queue(
+        f"TRANSFER ALERT: [{department}] - {len(moved_ids)} ticket(s) assigned",
+        f"{len(moved_ids)} ticket(s) have been transferred to {department} "
+        f"(from {', '.join(f'{dept}: {n}' for dept, n in sorted(from_departments.items()))}).\n\n"
+        + '\n'.join(f"{t.formatted_id} - {t.subject}" for t in tickets),
+        [ugc_depts.get(department, central_email)],
+    )
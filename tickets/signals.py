@@ -0,0 +1,137 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import identity, reporting
+from .auth_context import bump_stamp, invalidate_auth_context
+from .events import publish_ticket_event
+from .models import Ticket, TicketMessage, StudentMaster, StaffMaster, StaffProfile
+from .search import get_search_backend
+from .serializers import invalidate_dashboard_rows
+from .tracking import invalidate_tracking
+
+
+def _deleting_ticket(origin):
+    """True when a message is being removed as part of its ticket's own deletion."""
+    if isinstance(origin, Ticket):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Ticket
+
+
+@receiver(post_delete, sender=TicketMessage)
+def refresh_summary_on_message_delete(sender, instance, origin=None, **kwargs):
+    # Runs inside the deletion's transaction, so the summary never points at a removed message
+    if _deleting_ticket(origin):
+        return
+    Ticket.objects.filter(id=instance.ticket_id).refresh_thread_summary()
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=TicketMessage)
+@receiver(post_delete, sender=TicketMessage)
+def invalidate_tracking_cache(sender, instance, **kwargs):
+    # Deferred to commit so the follow-up summary/status updates are visible to the next reader
+    ticket_id = instance.id if sender is Ticket else instance.ticket_id
+    transaction.on_commit(lambda: invalidate_tracking(ticket_id))
+
+
+@receiver(post_save, sender=TicketMessage)
+@receiver(post_delete, sender=TicketMessage)
+def invalidate_dashboard_row(sender, instance, created=False, **kwargs):
+    # New messages move updated_at, which retires the cached row by itself; edits and deletions do not
+    if not created:
+        ticket_id = instance.ticket_id
+        transaction.on_commit(lambda: invalidate_dashboard_rows(ticket_id))
+
+
+# --- DASHBOARD EVENTS ---
+
+@receiver(post_save, sender=Ticket)
+def publish_ticket_saved(sender, instance, created, **kwargs):
+    if created:
+        publish_ticket_event('new_ticket', instance.id)
+        return
+    previous_status = instance.loaded_value('status')
+    event_type = 'status_changed' if previous_status and previous_status != instance.status else 'ticket_updated'
+    publish_ticket_event(event_type, instance.id, previous_department=instance.loaded_value('department'))
+
+
+@receiver(post_save, sender=TicketMessage)
+def publish_message_saved(sender, instance, created, **kwargs):
+    # The opening message is announced by new_ticket
+    if created and not instance.opens_ticket:
+        publish_ticket_event('new_reply', instance.ticket_id)
+
+
+# --- FULL-TEXT SEARCH INDEX ---
+
+@receiver(post_save, sender=Ticket)
+def index_ticket_saved(sender, instance, **kwargs):
+    ticket_id = instance.id
+    transaction.on_commit(lambda: get_search_backend().index_tickets([ticket_id]))
+
+
+@receiver(post_save, sender=TicketMessage)
+def index_message_saved(sender, instance, created, **kwargs):
+    ticket_id, text = instance.ticket_id, instance.message
+    if not created:
+        transaction.on_commit(lambda: get_search_backend().index_tickets([ticket_id]))
+    elif not instance.opens_ticket:
+        # The opening message is indexed with its ticket
+        transaction.on_commit(lambda: get_search_backend().append_message(ticket_id, text))
+
+
+@receiver(post_delete, sender=TicketMessage)
+def index_message_deleted(sender, instance, origin=None, **kwargs):
+    if _deleting_ticket(origin):
+        return
+    ticket_id = instance.ticket_id
+    transaction.on_commit(lambda: get_search_backend().index_tickets([ticket_id]))
+
+
+# --- REPORTING ROLLUPS ---
+
+@receiver(post_save, sender=Ticket)
+def update_rollups_on_ticket_save(sender, instance, created, **kwargs):
+    # Same transaction as the write, so the counters roll back with it
+    reporting.ticket_saved(instance, created)
+
+
+@receiver(post_save, sender=TicketMessage)
+def update_rollups_on_message_save(sender, instance, created, **kwargs):
+    if created:
+        reporting.message_created(instance)
+
+
+# --- IDENTITY VALIDATION CACHE ---
+
+@receiver(post_save, sender=StudentMaster)
+@receiver(post_save, sender=StaffMaster)
+def refresh_identity_on_save(sender, instance, **kwargs):
+    index = identity.INDEXES[sender]
+    transaction.on_commit(lambda: index.refresh(instance))
+
+
+@receiver(post_delete, sender=StudentMaster)
+@receiver(post_delete, sender=StaffMaster)
+def refresh_identity_on_delete(sender, instance, **kwargs):
+    index, pk = identity.INDEXES[sender], instance.pk
+    transaction.on_commit(lambda: index.discard(pk))
+
+
+# --- AUTH CONTEXT CACHE ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=StaffProfile)
+@receiver(post_delete, sender=StaffProfile)
+def invalidate_auth_context_on_change(sender, instance, update_fields=None, **kwargs):
+    # Dropped now and again at commit, so a request racing the transaction cannot keep the old row cached
+    user_id = instance.pk if sender is User else instance.user_id
+    invalidate_auth_context(user_id)
+    transaction.on_commit(lambda: invalidate_auth_context(user_id))
+    # The stamp reaches workers this cache does not; a login only moves last_login and leaves it alone
+    if set(update_fields or ()) != {'last_login'}:
+        bump_stamp()
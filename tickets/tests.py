@@ -1,3 +1,1778 @@
-from django.test import TestCase
+import json
+import random
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from . import identity
+from .benchmark import PLAIN_STATIC_STORAGES
+from .importers import import_master_list
+from .exports import export_queryset, stream_export
+from .models import Ticket, TicketMessage, StudentMaster, StaffMaster, StaffProfile
+from .views import dashboard_queryset, encode_cursor
+
+
+# --- QUERY PLAN REGRESSION SUITE ---
+
+class QueryPlanTests(TestCase):
+    """Seeds a synthetic dataset and checks via EXPLAIN that every hot query is served by an index."""
+
+    TICKETS = 6000
+    MESSAGES_PER_TICKET = 4
+    STUDENTS = 8000
+    STAFF = 1500
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(2026)
+        departments = [value for value, _ in Ticket.DEPARTMENT_CHOICES]
+        statuses = ['Open', 'In-Progress', 'Resolved']
+        now = timezone.now()
+
+        StudentMaster.objects.bulk_create(
+            [StudentMaster(index_number=f"UGC-STU-{i:06d}", full_name=f"Student {i}") for i in range(cls.STUDENTS)],
+            batch_size=2000,
+        )
+        StaffMaster.objects.bulk_create(
+            [StaffMaster(staff_id=f"UGC-STF-{i:05d}", full_name=f"Staff {i}", email=f"staff{i}@ugc.edu.gh") for i in range(cls.STAFF)],
+            batch_size=2000,
+        )
+        tickets = Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    name=f"Sender {i}", email=f"sender{i}@example.com", subject=f"Subject {i}", message="Synthetic",
+                    department=rng.choice(departments), status=rng.choice(statuses),
+                )
+                for i in range(cls.TICKETS)
+            ],
+            batch_size=2000,
+        )
+        # auto_now stamps every row identically; spread them out so ordering is realistic
+        for offset, ticket in enumerate(tickets):
+            ticket.updated_at = now - timedelta(minutes=offset)
+        Ticket.objects.bulk_update(tickets, ['updated_at'], batch_size=2000)
+
+        TicketMessage.objects.bulk_create(
+            [
+                TicketMessage(ticket=ticket, sender_name="Synthetic", message="Reply", is_staff=bool(n % 2))
+                for ticket in tickets
+                for n in range(cls.MESSAGES_PER_TICKET)
+            ],
+            batch_size=4000,
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        cls.sample_ticket = tickets[len(tickets) // 2]
+
+    def assertUsesIndex(self, queryset, *index_names):
+        """Passes when the plan is driven by any of the given indexes."""
+        plan = queryset.explain()
+        self.assertTrue(
+            any(name in plan for name in index_names),
+            f"Expected the plan to use one of {', '.join(index_names)}:\n{plan}",
+        )
+
+    def department_scope(self):
+        return {'department': 'Finance', 'display_dept': 'Finance', 'role': 'Officer', 'is_super': False}
+
+    def super_scope(self):
+        return {'department': None, 'display_dept': 'University-Wide', 'role': 'Admin', 'is_super': True}
+
+    def test_department_dashboard_page(self):
+        queryset = dashboard_queryset(self.department_scope(), {})
+        self.assertUsesIndex(queryset[:51], 'ticket_dept_updated_idx')
+
+    def test_department_dashboard_next_page(self):
+        last = dashboard_queryset(self.department_scope(), {})[49]
+        queryset = dashboard_queryset(self.department_scope(), {'cursor': encode_cursor(last)})
+        self.assertUsesIndex(queryset[:51], 'ticket_dept_updated_idx')
+
+    def test_department_dashboard_status_filter(self):
+        queryset = dashboard_queryset(self.department_scope(), {'status': 'Open'})
+        self.assertUsesIndex(queryset[:51], 'ticket_dept_status_upd_idx')
+
+    def test_university_wide_dashboard_page(self):
+        queryset = dashboard_queryset(self.super_scope(), {})
+        self.assertUsesIndex(queryset[:51], 'ticket_updated_idx')
+
+    def test_conversation_thread(self):
+        queryset = self.sample_ticket.messages.all().order_by('created_at')
+        self.assertUsesIndex(queryset, 'ticketmsg_ticket_created_idx')
+
+    def test_thread_poll_since_cursor(self):
+        from .threads import thread_rows_since
+
+        last = self.sample_ticket.messages.order_by('id').values_list('id', flat=True)[1]
+        self.assertUsesIndex(thread_rows_since(self.sample_ticket.id, last), 'ticketmsg_ticket_id_idx')
+
+    def test_latest_staff_reply(self):
+        queryset = TicketMessage.objects.filter(ticket=self.sample_ticket, is_staff=True).order_by('-created_at')
+        # Short threads may be cheaper to walk through the (ticket, created_at) index; both avoid a scan
+        self.assertUsesIndex(queryset[:1], 'ticketmsg_ticket_staff_idx', 'ticketmsg_ticket_created_idx')
+
+    def test_student_validation(self):
+        queryset = StudentMaster.objects.by_index_number('ugc-stu-004321').filter(is_active=True)
+        self.assertUsesIndex(queryset, 'student_index_upper_idx')
+        self.assertTrue(queryset.exists())
+
+    def test_staff_validation(self):
+        queryset = StaffMaster.objects.by_staff_id('ugc-stf-00042').filter(is_active=True)
+        self.assertUsesIndex(queryset, 'staff_id_upper_idx')
+        self.assertTrue(queryset.exists())
+
+
+# --- DASHBOARD FEED ---
+
+class DashboardFeedTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ugc.edu.gh', 'pass'))
+        self.tickets = Ticket.objects.bulk_create([
+            Ticket(
+                name=f"Sender {i}", email=f"sender{i}@example.com", subject=f"Subject {i}", message="Hello",
+                department='Finance' if i % 2 else 'HR',
+            )
+            for i in range(9)
+        ])
+        # Three pairs share a timestamp, so the id tie-break decides where a page ends
+        now = timezone.now()
+        for i, ticket in enumerate(self.tickets):
+            ticket.updated_at = now - timedelta(minutes=i // 2)
+        Ticket.objects.bulk_update(self.tickets, ['updated_at'])
+
+    def feed(self, **params):
+        response = self.client.get('/api/dashboard/tickets/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, **params):
+        ids, cursor = [], None
+        while True:
+            page = self.feed(**params, **({'cursor': cursor} if cursor else {}))
+            ids.extend(row['id'] for row in page['tickets'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+
+    def test_cursor_walks_every_ticket_once(self):
+        expected = [t.id for t in sorted(self.tickets, key=lambda t: (t.updated_at, t.id), reverse=True)]
+        for limit in (1, 2, 3, 4):
+            self.assertEqual(self.walk(limit=limit), expected)
+
+    def test_last_page_has_no_cursor(self):
+        self.assertIsNotNone(self.feed(limit=8)['next_cursor'])
+        page = self.feed(limit=9)
+        self.assertEqual(len(page['tickets']), 9)
+        self.assertIsNone(page['next_cursor'])
+
+    def test_malformed_cursor_is_rejected(self):
+        from django.utils.http import urlsafe_base64_encode
+
+        for cursor in ('not-a-cursor', urlsafe_base64_encode(b'2026-01-01|abc'), urlsafe_base64_encode(b'no separator')):
+            response = self.client.get('/api/dashboard/tickets/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertEqual(response.json()['status'], 'error')
+
+    def test_limit_is_clamped(self):
+        from .views import DASHBOARD_MAX_PAGE_SIZE, DASHBOARD_PAGE_SIZE
+
+        Ticket.objects.bulk_create([
+            Ticket(name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance')
+            for _ in range(DASHBOARD_MAX_PAGE_SIZE)
+        ])
+        self.assertEqual(len(self.feed(limit=0)['tickets']), 1)
+        self.assertEqual(len(self.feed(limit=-5)['tickets']), 1)
+        self.assertEqual(len(self.feed(limit=10000)['tickets']), DASHBOARD_MAX_PAGE_SIZE)
+        self.assertEqual(len(self.feed(limit='all')['tickets']), DASHBOARD_PAGE_SIZE)
+
+    def test_department_staff_cannot_filter_into_another_department(self):
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+        finance = {t.id for t in self.tickets if t.department == 'Finance'}
+        self.assertEqual(set(self.walk(department='HR', limit=2)), finance)
+        self.assertEqual({row['department'] for row in self.feed(department='HR')['tickets']}, {'Finance'})
+
+    def test_super_command_can_filter_by_department(self):
+        hr = {t.id for t in self.tickets if t.department == 'HR'}
+        self.assertEqual(set(self.walk(department='HR', limit=2)), hr)
+
+    def test_search_by_reference_and_text(self):
+        ticket = self.tickets[4]
+        for term in (ticket.formatted_id, ticket.formatted_id.lower(), str(ticket.id)):
+            self.assertIn(ticket.id, [row['id'] for row in self.feed(q=term)['tickets']], term)
+        self.assertEqual([row['id'] for row in self.feed(q=ticket.formatted_id)['tickets']], [ticket.id])
+        self.assertEqual([row['id'] for row in self.feed(q='sender4@example')['tickets']], [ticket.id])
+        self.assertEqual(self.feed(q='nobody-matches-this')['tickets'], [])
+
+
+# --- THREAD SERIALIZATION ---
+
+class ThreadSerializationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('thread_admin', 'admin@ugc.edu.gh', 'pass')
+        self.client.force_login(self.user)
+
+    def make_thread(self, replies):
+        ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Original")
+        parent = ticket.messages.get()
+        for n in range(replies):
+            parent = TicketMessage.objects.create(
+                ticket=ticket, sender_name="Officer" if n % 2 == 0 else "Ama",
+                message=f"Reply {n}", is_staff=n % 2 == 0, parent=parent,
+            )
+        return ticket
+
+    def count_queries(self, url):
+        # Warm, so the first call does not also pay for loading the auth context
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_get_messages_query_count_is_constant(self):
+        short, long = self.make_thread(2), self.make_thread(40)
+        self.assertEqual(
+            self.count_queries(f"/get-messages/{short.id}/"),
+            self.count_queries(f"/get-messages/{long.id}/"),
+        )
+
+    def test_track_query_query_count_is_constant(self):
+        short, long = self.make_thread(2), self.make_thread(40)
+        self.assertEqual(
+            self.count_queries(f"/track-query/?ref={short.formatted_id}"),
+            self.count_queries(f"/track-query/?ref={long.formatted_id}"),
+        )
+
+    def test_flat_thread_keeps_parent_ids(self):
+        ticket = self.make_thread(3)
+        messages = self.client.get(f"/get-messages/{ticket.id}/").json()['messages']
+        self.assertEqual(len(messages), 4)
+        self.assertIsNone(messages[0]['parent_id'])
+        self.assertEqual([m['parent_id'] for m in messages[1:]], [m['id'] for m in messages[:-1]])
+
+    def test_tree_format_nests_replies(self):
+        ticket = self.make_thread(3)
+        thread = self.client.get(f"/track-query/?ref={ticket.formatted_id}&format=tree").json()['thread']
+        self.assertEqual(len(thread), 1)
+        depth, node = 1, thread[0]
+        while node['replies']:
+            node, depth = node['replies'][0], depth + 1
+        self.assertEqual(depth, 4)
+
+
+class ThreadSummaryTests(TestCase):
+    def setUp(self):
+        from .services import post_reply
+
+        self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        _, self.staff_reply = post_reply(self.ticket.id, "Officer", "Paid?", is_staff=True)
+        _, self.user_reply = post_reply(self.ticket.id, None, "Yes, twice", is_staff=False)
+
+    def summary(self):
+        return Ticket.objects.values(
+            'last_message', 'last_reply_by', 'reply_message', 'last_staff_name', 'message_count',
+        ).get(id=self.ticket.id)
+
+    def test_replies_move_the_summary(self):
+        self.assertEqual(self.summary(), {
+            'last_message': self.user_reply.id, 'last_reply_by': 'USER', 'reply_message': "Yes, twice",
+            'last_staff_name': "Officer", 'message_count': 3,
+        })
+
+    def test_editing_the_latest_message_refreshes_it(self):
+        self.user_reply.message = "Yes, twice in March"
+        self.user_reply.save()
+        self.assertEqual(self.summary()['reply_message'], "Yes, twice in March")
+
+    def test_deleting_the_latest_message_falls_back_to_the_previous(self):
+        self.user_reply.delete()
+        self.assertEqual(self.summary(), {
+            'last_message': self.staff_reply.id, 'last_reply_by': 'STAFF', 'reply_message': "Paid?",
+            'last_staff_name': "Officer", 'message_count': 2,
+        })
+        self.staff_reply.delete()
+        self.assertEqual(self.summary()['last_staff_name'], None)
+        self.assertEqual(self.summary()['message_count'], 1)
+
+
+class ThreadSummaryMigrationTests(TransactionTestCase):
+    before = [('tickets', '0012_ticketmessage_parent_alter_staffprofile_role')]
+    after = [('tickets', '0013_ticket_thread_summary')]
+
+    def tearDown(self):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_existing_threads_are_backfilled(self):
+        apps = self.migrate(self.before)
+        LegacyTicket, LegacyMessage = apps.get_model('tickets', 'Ticket'), apps.get_model('tickets', 'TicketMessage')
+        ticket = LegacyTicket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        LegacyMessage.objects.create(ticket=ticket, sender_name="Ama", message="Balance")
+        LegacyMessage.objects.create(ticket=ticket, sender_name="Officer", message="Paid?", is_staff=True)
+        latest = LegacyMessage.objects.create(ticket=ticket, sender_name="Ama", message="Yes")
+        empty = LegacyTicket.objects.create(name="Kofi", email="kofi@example.com", subject="Keys", message="Lost")
+
+        apps = self.migrate(self.after)
+        rows = apps.get_model('tickets', 'Ticket').objects.in_bulk([ticket.id, empty.id])
+        backfilled = rows[ticket.id]
+        self.assertEqual(
+            (backfilled.last_message_id, backfilled.last_reply_by, backfilled.reply_message, backfilled.last_staff_name, backfilled.message_count),
+            (latest.id, 'USER', "Yes", "Officer", 3),
+        )
+        self.assertEqual(backfilled.last_activity_at, latest.created_at)
+        self.assertEqual((rows[empty.id].message_count, rows[empty.id].last_message_id), (0, None))
+
+# --- IDENTITY VALIDATION CACHE ---
+
+class IdentityCacheTests(TestCase):
+    def setUp(self):
+        identity.students.invalidate()
+        self.student = StudentMaster.objects.create(index_number="UGC-STU-000001", full_name="Ama Mensah")
+        identity.students.load()
+
+    def test_known_id_validates_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(identity.validate_student(" ugc-stu-000001 "), self.student.pk)
+
+    def test_unknown_id_is_confirmed_once(self):
+        with self.assertNumQueries(1):
+            self.assertIsNone(identity.validate_student("UGC-STU-999999"))
+
+    def test_saves_refresh_the_map(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            added = StudentMaster.objects.create(index_number="UGC-STU-000002", full_name="Kofi Boateng")
+            self.student.is_active = False
+            self.student.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(identity.validate_student("ugc-stu-000002"), added.pk)
+        with self.assertNumQueries(1):
+            self.assertIsNone(identity.validate_student("UGC-STU-000001"))
+
+    def test_renamed_id_replaces_the_old_key(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.student.index_number = "UGC-STU-000009"
+            self.student.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(identity.validate_student("UGC-STU-000009"), self.student.pk)
+        self.assertIsNone(identity.validate_student("UGC-STU-000001"))
+
+    def test_bulk_import_invalidates_the_map(self):
+        import_master_list('students', [{'index_number': 'UGC-STU-000003', 'full_name': 'Esi Owusu'}])
+        self.assertIsNotNone(identity.validate_student("UGC-STU-000003"))
+        self.assertIsNone(identity.validate_student("UGC-STU-000001"))
+
+    def test_submission_links_validated_student(self):
+        response = self.client.post('/api/save-ticket/', {
+            'name': 'Ama', 'email': 'ama@example.com', 'user_type': 'student', 'student_id': 'ugc-stu-000001',
+            'department': 'Finance', 'subject': 'Fees', 'message': 'Balance query',
+        })
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(Ticket.objects.get().validated_student, self.student)
+
+
+# --- MASTER LIST IMPORT ---
+
+class MasterListImportTests(TestCase):
+    def setUp(self):
+        for n in range(1, 4):
+            StudentMaster.objects.create(index_number=f"S{n}", full_name=f"Student {n}")
+
+    def csv(self, text):
+        from .importers import iter_rows
+        return iter_rows(StringIO(text), 'students.csv')
+
+    def active(self):
+        return set(StudentMaster.objects.filter(is_active=True).values_list('index_number', flat=True))
+
+    def test_counts_inserted_updated_and_deactivated(self):
+        result = import_master_list('students', self.csv("Index Number,Full Name\nS1,Ama\nS2,Kofi\nS4,Esi\n"))
+        self.assertEqual((result.inserted, result.updated, result.deactivated, result.skipped), (1, 2, 1, 0))
+        self.assertEqual(self.active(), {'S1', 'S2', 'S4'})
+        self.assertEqual(StudentMaster.objects.get(index_number='S1').full_name, "Ama")
+
+    def test_missing_column_fails_before_any_write(self):
+        from .importers import MasterListFormatError
+
+        with self.assertRaises(MasterListFormatError):
+            import_master_list('students', self.csv("Student ID,Name\nS1,Ama\nS9,Kofi\n"))
+        self.assertEqual(self.active(), {'S1', 'S2', 'S3'})
+        self.assertFalse(StudentMaster.objects.filter(index_number='S9').exists())
+
+    def test_rejected_rows_are_not_deactivated(self):
+        result = import_master_list('students', self.csv("index_number,full_name\nS1,\nS2,Kofi\n"))
+        self.assertEqual((result.updated, result.deactivated, result.skipped), (1, 1, 1))
+        self.assertEqual(self.active(), {'S1', 'S2'})
+
+    def test_nothing_is_deactivated_when_no_row_was_stored(self):
+        result = import_master_list('students', self.csv("index_number,full_name\nS1,\n,Kofi\n"))
+        self.assertEqual(result.summary(), "0 inserted, 0 updated, 0 deactivated, 2 skipped")
+        self.assertEqual(self.active(), {'S1', 'S2', 'S3'})
+
+    def test_xlsx_numeric_ids_keep_their_digits(self):
+        from io import BytesIO
+        from openpyxl import Workbook
+        from .importers import iter_rows
+
+        workbook = Workbook()
+        workbook.active.append(['Index Number', 'Full Name'])
+        workbook.active.append([12345, 'Ama'])
+        upload = BytesIO()
+        workbook.save(upload)
+        upload.seek(0)
+        import_master_list('students', iter_rows(upload, 'students.xlsx'), deactivate_missing=False)
+        # Sheets written by other tools hand numeric cells back as floats
+        import_master_list('students', [{'index_number': 67890.0, 'full_name': 'Kofi'}], deactivate_missing=False)
+        self.assertEqual(StudentMaster.objects.filter(index_number__in=['12345', '67890']).count(), 2)
+
+
+# --- OUTBOUND EMAIL QUEUE ---
+
+class RefusingEmailBackend(BaseEmailBackend):
+    """An SMTP server that cannot be reached."""
+
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+class FlakyEmailBackend(BaseEmailBackend):
+    """Delivers to mail.outbox unless a subject names the failure to simulate."""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if message.subject == "bounce":
+                raise OSError("550 Mailbox unavailable")
+            if message.subject == "crash":
+                raise KeyboardInterrupt
+            mail.outbox.append(message)
+        return len(messages)
+
+
+class OutboxTests(TestCase):
+    def queue(self, *subjects):
+        from .models import OutboundEmail
+        return [OutboundEmail.queue(subject, "Body", "ama@example.com") for subject in subjects]
+
+    def rows(self):
+        from .models import OutboundEmail
+        return list(OutboundEmail.objects.order_by('id').values_list('subject', 'status', 'attempts'))
+
+    def due_now(self):
+        from .models import OutboundEmail
+        OutboundEmail.objects.exclude(status='SENT').update(next_attempt_at=timezone.now())
+
+    @override_settings(OUTBOX_RETRY_BASE_SECONDS=30, OUTBOX_RETRY_MAX_SECONDS=100)
+    def test_retry_delay_doubles_up_to_the_ceiling(self):
+        from .outbox import retry_delay
+        self.assertEqual([retry_delay(n).total_seconds() for n in range(1, 5)], [30, 60, 100, 100])
+
+    def test_sends_due_emails_and_records_each(self):
+        from .outbox import deliver_batch
+
+        self.queue("one", "two")
+        self.assertEqual(deliver_batch(), (2, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ["one", "two"])
+        self.assertEqual(self.rows(), [("one", 'SENT', 1), ("two", 'SENT', 1)])
+        self.assertEqual(deliver_batch(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='tickets.tests.FlakyEmailBackend')
+    def test_failures_back_off_then_fail_after_max_attempts(self):
+        from .models import OutboundEmail
+        from .outbox import deliver_batch, retry_delay
+
+        bounce, = self.queue("bounce")
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 1))
+        bounce.refresh_from_db()
+        self.assertEqual((bounce.status, bounce.attempts, bounce.last_error), ('PENDING', 1, "550 Mailbox unavailable"))
+        self.assertAlmostEqual((bounce.next_attempt_at - timezone.now()).total_seconds(), retry_delay(1).total_seconds(), delta=5)
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0))
+
+        self.due_now()
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 1))
+        self.assertEqual(OutboundEmail.objects.get().status, 'FAILED')
+
+    @override_settings(EMAIL_BACKEND='tickets.tests.RefusingEmailBackend')
+    def test_unreachable_server_backs_off_the_whole_batch(self):
+        from .outbox import deliver_batch
+
+        self.queue("one", "two")
+        self.assertEqual(deliver_batch(), (0, 2))
+        self.assertEqual(self.rows(), [("one", 'PENDING', 1), ("two", 'PENDING', 1)])
+        self.assertEqual(deliver_batch(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='tickets.tests.FlakyEmailBackend')
+    def test_worker_dying_mid_batch_resends_only_the_unsent(self):
+        from .models import OutboundEmail
+        from .outbox import deliver_batch
+
+        self.queue("one", "crash", "three")
+        with self.assertRaises(KeyboardInterrupt):
+            deliver_batch()
+        self.assertEqual(self.rows(), [("one", 'SENT', 1), ("crash", 'SENDING', 1), ("three", 'SENDING', 1)])
+        # Leased to the dead worker until the lease runs out
+        self.assertEqual(deliver_batch(), (0, 0))
+
+        OutboundEmail.objects.filter(subject="crash").update(subject="two")
+        OutboundEmail.objects.filter(status='SENDING').update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(), (2, 0))
+        self.assertEqual([m.subject for m in mail.outbox], ["one", "two", "three"])
+
+    def test_email_whose_worker_keeps_dying_is_given_up(self):
+        from .models import OutboundEmail
+        from .outbox import deliver_batch
+
+        self.queue("poison")
+        OutboundEmail.objects.update(status='SENDING', attempts=2, next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(max_attempts=2), (0, 0))
+        self.assertEqual(self.rows(), [("poison", 'FAILED', 2)])
+
+    def test_queue_depth_counts_due_pending_emails(self):
+        from .models import OutboundEmail
+        from .outbox import queue_depth
+
+        later, due, sent = self.queue("later", "due", "sent")
+        OutboundEmail.objects.filter(id=later.id).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+        OutboundEmail.objects.filter(id=sent.id).update(status='SENT')
+        self.assertEqual(queue_depth(), {'PENDING': 2, 'SENDING': 0, 'SENT': 1, 'FAILED': 0, 'DUE': 1})
+
+# --- DASHBOARD EVENTS ---
+
+class TicketEventTests(TestCase):
+    def event(self, department, previous=None, ticket_id=1):
+        return {'type': 'ticket_updated', 'ticket_id': ticket_id, 'department': department,
+                'previous_department': previous or department, 'ticket': {}}
+
+    async def test_in_memory_broker_fans_out_to_matching_subscribers(self):
+        import asyncio
+        from .events import InMemoryBroker, department_predicate
+
+        broker = InMemoryBroker()
+        finance, everyone, hr = (broker.subscribe(department_predicate(d)) for d in ('Finance', None, 'HR'))
+        # Publishers run on other threads (sync views, on-commit hooks)
+        await asyncio.to_thread(broker.publish, self.event('Finance'))
+        self.assertEqual((await finance.get(timeout=1))['department'], 'Finance')
+        self.assertEqual((await everyone.get(timeout=1))['department'], 'Finance')
+        self.assertIsNone(await hr.get(timeout=0.05))
+
+        hr.close()
+        await asyncio.to_thread(broker.publish, self.event('HR'))
+        self.assertIsNone(await hr.get(timeout=0.05))
+        self.assertEqual((await everyone.get(timeout=1))['department'], 'HR')
+
+    def test_transfers_reach_both_departments_and_batches_are_scoped(self):
+        from .events import BATCH_EVENT_TYPE, department_predicate, scoped_event
+
+        transfer = self.event('HR', previous='Finance')
+        self.assertTrue(department_predicate('Finance')(transfer))
+        self.assertTrue(department_predicate('HR')(transfer))
+        self.assertFalse(department_predicate('IT')(transfer))
+
+        batch = {'type': BATCH_EVENT_TYPE, 'departments': ['Finance', 'HR'],
+                 'events': [self.event('Finance', ticket_id=1), self.event('HR', ticket_id=2)]}
+        self.assertFalse(department_predicate('IT')(batch))
+        self.assertEqual([e['ticket_id'] for e in scoped_event(batch, 'HR')['events']], [2])
+        self.assertEqual(scoped_event(batch, 'HR')['departments'], ['HR'])
+        self.assertIs(scoped_event(batch, None), batch)
+
+    def test_events_are_published_only_when_the_write_commits(self):
+        from django.db import transaction
+        from .events import get_broker
+
+        published = []
+        broker = get_broker()
+        original, broker.publish = broker.publish, published.append
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    Ticket.objects.create(name="Kofi", email="kofi@example.com", subject="Leave", message="Days?")
+                    raise RuntimeError
+            self.assertEqual(published, [])
+
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+            self.assertEqual(published, [])
+            for callback in callbacks:
+                callback()
+        finally:
+            broker.publish = original
+        self.assertEqual([(e['type'], e['ticket_id']) for e in published], [('new_ticket', ticket.id)])
+
+    def test_non_ascii_text_is_trimmed_by_encoded_size(self):
+        from .events import MAX_PAYLOAD_BYTES, PREVIEW_BYTES, build_event, event_bytes
+
+        ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="é" * 3000)
+        Ticket.objects.filter(id=ticket.id).update(reply_message="漢字" * 2000)
+        event = build_event('ticket_updated', ticket.id)
+        self.assertLessEqual(event_bytes(event), MAX_PAYLOAD_BYTES)
+        message = event['ticket']['message']
+        self.assertTrue(message.endswith('...'))
+        self.assertEqual(set(message[:-3]), {'é'})
+        self.assertLessEqual(len(event['ticket']['reply_message'][:-3].encode('utf-8')), PREVIEW_BYTES)
+
+    def test_reply_through_the_original_instance_is_not_taken_for_the_opening_message(self):
+        from .events import get_broker
+        from .models import DepartmentDailyStats, TicketSearchDocument
+
+        published = []
+        broker = get_broker()
+        original, broker.publish = broker.publish, published.append
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket = Ticket.objects.create(
+                    name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance',
+                )
+            # The in-memory instance still reads message_count == 0
+            with self.captureOnCommitCallbacks(execute=True):
+                ticket.messages.create(sender_name="Officer", message="Receipt attached", is_staff=True)
+        finally:
+            broker.publish = original
+
+        self.assertEqual([(e['type'], e['ticket_id']) for e in published], [('new_ticket', ticket.id), ('new_reply', ticket.id)])
+        self.assertIn("Receipt attached", TicketSearchDocument.objects.get(ticket=ticket).body)
+        stats = DepartmentDailyStats.objects.get(department='Finance')
+        self.assertEqual((stats.opened, stats.staff_replies, stats.first_responses), (1, 1, 1))
+
+
+# --- STREAMING EXPORT ---
+
+class TicketExportTests(TestCase):
+    def setUp(self):
+        for n in range(5):
+            ticket = Ticket.objects.create(
+                name=f"Sender {n}", email=f"s{n}@example.com", subject=f"Subject {n}", message="Body",
+                department='Finance' if n % 2 == 0 else 'HR',
+            )
+            TicketMessage.objects.create(ticket=ticket, sender_name="Officer", message="Noted", is_staff=True)
+
+    def export_lines(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_csv_export_is_scoped_to_staff_department(self):
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+        lines = self.export_lines(self.client.get('/api/export/tickets/?department=HR'))
+        self.assertTrue(lines[0].startswith('ref_id,name,email'))
+        self.assertEqual(len(lines), 1 + 3)
+        self.assertTrue(all(',Finance,' in line for line in lines[1:]))
+
+    def test_jsonl_export_includes_threads(self):
+        self.client.force_login(User.objects.create_superuser('exporter', 'x@ugc.edu.gh', 'pass'))
+        lines = self.export_lines(self.client.get('/api/export/tickets/?format=jsonl&threads=1'))
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual([len(row['thread']) for row in rows], [2] * 5)
+        self.assertEqual(rows[0]['ref_id'], Ticket.objects.order_by('id').first().formatted_id)
+
+    def test_invalid_date_is_rejected(self):
+        self.client.force_login(User.objects.create_superuser('exporter', 'x@ugc.edu.gh', 'pass'))
+        response = self.client.get('/api/export/tickets/?from=2026-13-40')
+        self.assertEqual(response.status_code, 400)
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        chunks = stream_export('csv', export_queryset(), threads=True, chunk_size=2)
+        # One cursor over the tickets plus one message query per batch of two
+        with self.assertNumQueries(1 + 3):
+            self.assertEqual(len(list(chunks)), 1 + 3)
+
+
+# --- FULL-TEXT SEARCH ---
+
+class TicketSearchTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('searcher', 'search@ugc.edu.gh', 'pass'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.refund = Ticket.objects.create(
+                name="Ama", email="ama@example.com", subject="Hostel refund", message="I paid twice", department='Finance',
+            )
+            self.transcript = Ticket.objects.create(
+                name="Kofi", email="kofi@example.com", subject="Transcript request", message="Need my transcript",
+                department='Admission',
+            )
+            self.reply = TicketMessage.objects.create(
+                ticket=self.transcript, sender_name="Officer", is_staff=True,
+                message="The hostel refund office will courier the sealed transcript",
+            )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_finds_phrases_from_replies(self):
+        results = self.search('"sealed transcript" courier')['results']
+        self.assertEqual([r['id'] for r in results], [self.transcript.id])
+        self.assertIn('courier', results[0]['snippet'])
+
+    def test_subject_matches_rank_first(self):
+        results = self.search('hostel refund')['results']
+        self.assertEqual([r['id'] for r in results], [self.refund.id, self.transcript.id])
+
+    def test_department_staff_only_search_their_department(self):
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+        results = self.search('hostel refund', department='Admission')['results']
+        self.assertEqual([r['id'] for r in results], [self.refund.id])
+
+    def test_deleted_reply_leaves_the_index(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reply.delete()
+        self.assertEqual(self.search('courier')['results'], [])
+
+    def test_rebuild_command_indexes_existing_tickets(self):
+        from django.core.management import call_command
+        from .models import TicketSearchDocument
+
+        TicketSearchDocument.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(TicketSearchDocument.objects.count(), 2)
+        self.assertEqual(len(self.search('transcript')['results']), 1)
+
+
+# --- REPORTING ROLLUPS ---
+
+class DepartmentReportTests(TestCase):
+    def setUp(self):
+        self.ticket = Ticket.objects.create(
+            name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance',
+        )
+
+    def stats(self):
+        from .models import DepartmentDailyStats
+        return DepartmentDailyStats.objects.get(department='Finance', day=timezone.localdate())
+
+    def reply(self, is_staff):
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        TicketMessage.objects.create(ticket=ticket, sender_name="Officer" if is_staff else "Ama", message="...", is_staff=is_staff)
+
+    def resolve(self):
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        ticket.status = 'Resolved'
+        ticket.save()
+
+    def test_writes_update_the_daily_rollup(self):
+        self.reply(is_staff=True)
+        self.reply(is_staff=True)
+        self.reply(is_staff=False)
+        self.resolve()
+        stats = self.stats()
+        self.assertEqual((stats.opened, stats.resolved), (1, 1))
+        self.assertEqual((stats.staff_replies, stats.user_replies), (2, 1))
+        self.assertEqual(stats.first_responses, 1)
+        self.assertIsNotNone(Ticket.objects.get(id=self.ticket.id).resolved_at)
+
+    def test_user_reply_reopens_and_is_counted(self):
+        self.resolve()
+        self.reply(is_staff=False)
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        self.assertEqual(ticket.status, 'Open')
+        self.assertIsNone(ticket.resolved_at)
+        self.assertEqual(self.stats().reopened, 1)
+
+    def test_rebuild_matches_incremental_counts(self):
+        from .models import DepartmentDailyStats
+        from .reporting import rebuild_rollups
+
+        self.reply(is_staff=True)
+        self.reply(is_staff=False)
+        self.resolve()
+        fields = ['opened', 'resolved', 'first_responses', 'staff_replies', 'user_replies']
+        before = DepartmentDailyStats.objects.values(*fields).get()
+        rebuild_rollups()
+        self.assertEqual(DepartmentDailyStats.objects.values(*fields).get(), before)
+
+    def test_report_query_count_does_not_grow_with_history(self):
+        from .reporting import build_report
+
+        departments = [value for value, _ in Ticket.DEPARTMENT_CHOICES]
+        with CaptureQueriesContext(connection) as small:
+            build_report(departments, days=30)
+        for n in range(20):
+            Ticket.objects.create(name="X", email="x@example.com", subject="S", message="M", department='Finance')
+        with CaptureQueriesContext(connection) as large:
+            report = build_report(departments, days=30)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(report['totals']['opened'], 21)
+        self.assertEqual(report['daily'][0]['backlog'], 21)
+
+    def test_reports_page_renders_for_department_staff(self):
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+        response = self.client.get('/dashboard/reports/?days=7')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['department'] for row in response.context['report']['departments']], ['Finance'])
+
+
+# --- REPLY WRITE PATH ---
+
+class ReplyServiceTests(TestCase):
+    def setUp(self):
+        self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+
+    def test_staff_reply_query_count(self):
+        from .services import post_reply
+
+        # Lock/read the ticket, insert the message, bump the daily rollup, update the ticket
+        with self.assertNumQueries(4):
+            ticket, message = post_reply(self.ticket.id, "Officer", "Noted", is_staff=True)
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        self.assertEqual((ticket.message_count, ticket.last_reply_by, ticket.last_staff_name), (2, 'STAFF', "Officer"))
+        self.assertEqual(ticket.first_response_at, message.created_at)
+
+    def test_user_reply_reopens_resolved_ticket_in_the_same_update(self):
+        from .services import post_reply
+
+        Ticket.objects.filter(id=self.ticket.id).update(status='Resolved', resolved_at=timezone.now())
+        with self.assertNumQueries(4):
+            post_reply(self.ticket.id, None, "Still unresolved", is_staff=False)
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        self.assertEqual((ticket.status, ticket.resolved_at, ticket.last_reply_by), ('Open', None, 'USER'))
+        self.assertEqual(ticket.messages.last().sender_name, "Ama")
+
+    def test_reply_does_not_overwrite_concurrent_status_change(self):
+        stale = Ticket.objects.get(id=self.ticket.id)
+        Ticket.objects.filter(id=self.ticket.id).update(status='In-Progress')
+        TicketMessage.objects.create(ticket=stale, sender_name="Officer", message="On it", is_staff=True)
+        self.assertEqual(Ticket.objects.get(id=self.ticket.id).status, 'In-Progress')
+
+    def test_submit_reply_view_query_count(self):
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+        url = f"/submit-reply/{self.ticket.id}/"
+        # The auth context stamp, user and staff profile until the context is cached, the four reply statements
+        # and the queued email, plus the SAVEPOINT/RELEASE pair the view's atomic block becomes inside the test transaction
+        with self.assertNumQueries(1 + 2 + 4 + 1 + 2):
+            response = self.client.post(url, json.dumps({'message': "Noted"}), content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        with self.assertNumQueries(1 + 4 + 1 + 2):
+            self.client.post(url, json.dumps({'message': "Noted again"}), content_type='application/json')
+
+    def test_parent_from_another_thread_is_ignored(self):
+        from .services import post_reply
+
+        other = Ticket.objects.create(name="Kofi", email="kofi@example.com", subject="Other", message="Other")
+        _, message = post_reply(self.ticket.id, "Officer", "Noted", is_staff=True, parent_id=other.messages.get().id)
+        self.assertIsNone(message.parent_id)
+
+
+# --- BENCHMARK REPORTS ---
+
+class BenchmarkReportTests(TestCase):
+    def test_percentiles_and_rates(self):
+        from collections import Counter
+        from .benchmark import ScenarioResult, percentile
+
+        self.assertEqual(percentile(list(range(1, 101)), 0.95), 95)
+        self.assertIsNone(percentile([], 0.5))
+        result = ScenarioResult(
+            requests=4, errors=Counter({500: 1}), seconds=2.0, latencies=[0.004, 0.001, 0.003, 0.002], queries=10,
+        ).as_dict()
+        self.assertEqual((result['rps'], result['p50_ms'], result['p99_ms']), (2.0, 2.0, 4.0))
+        self.assertEqual((result['errors'], result['error_statuses'], result['queries_per_request']), (1, {'500': 1}, 2.5))
+
+    def test_compare_flags_slower_p95_or_lower_throughput(self):
+        from .benchmark import compare
+
+        baseline = {'scenarios': {'track_query': {'p95_ms': 10.0, 'rps': 100.0}, 'get_messages': {'p95_ms': 10.0, 'rps': 100.0}}}
+        steady = {'scenarios': {'track_query': {'p95_ms': 10.5, 'rps': 98.0}}}
+        self.assertFalse(compare(steady, baseline, threshold=10)[1])
+        slower = {'scenarios': {'track_query': {'p95_ms': 10.0, 'rps': 100.0}, 'get_messages': {'p95_ms': 10.0, 'rps': 80.0}}}
+        lines, regressed = compare(slower, baseline, threshold=10)
+        self.assertTrue(regressed)
+        self.assertIn("REGRESSION", lines[1])
+
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def test_html_scenarios_run_without_collectstatic(self):
+        import subprocess
+        import sys
+        from django.conf import settings
+
+        # A separate process: the command creates and drops its own database, and must see the real STORAGES
+        completed = subprocess.run(
+            [
+                sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark',
+                '--scenario', 'public_pages', '--scenario', 'staff_dashboard',
+                '--students', '20', '--staff', '5', '--tickets', '20', '--requests', '4', '--warmup', '1', '--concurrency', '1',
+            ],
+            capture_output=True, text=True, timeout=300,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        scenarios = json.loads(completed.stdout)['scenarios']
+        self.assertEqual({name: result['errors'] for name, result in scenarios.items()}, {'public_pages': 0, 'staff_dashboard': 0})
+
+# --- REQUEST METRICS ---
+
+class QueryMetricsTests(TestCase):
+    def setUp(self):
+        from .metrics import registry
+        registry.reset()
+        self.registry = registry
+
+    def test_requests_are_recorded_per_view(self):
+        ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        self.client.get(f"/track-query/?ref={ticket.formatted_id}")
+        self.client.get("/no-such-page/")
+        self.assertEqual(self.registry.requests['track_query', 'GET', 200], 1)
+        self.assertEqual(self.registry.requests['unresolved', 'GET', 404], 1)
+        self.assertGreater(self.registry.query_counts['track_query'].sum, 0)
+
+    def test_repeated_statements_are_flagged(self):
+        from .metrics import RequestStats
+
+        stats = RequestStats()
+        for ticket_id in range(6):
+            stats.record('SELECT * FROM ticket WHERE id = %s', (ticket_id,), False, 0.001)
+        stats.record('SELECT * FROM ticket WHERE id = %s', (1,), False, 0.001)
+        self.assertEqual(stats.duplicates(), 1)
+        self.assertEqual(stats.n_plus_one(), ['SELECT * FROM ticket WHERE id = %s'])
+        self.assertEqual(len(stats.slowest), 5)
+
+        # The same statement re-run with the same parameters is a duplicate, not an N+1
+        stats = RequestStats()
+        for _ in range(6):
+            stats.record('SELECT * FROM ticket WHERE id = %s', (1,), False, 0.001)
+        self.assertEqual((stats.duplicates(), stats.n_plus_one()), (5, []))
+
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic('BREW', "/no-such-page/")
+        self.client.generic('PROPFIND', "/no-such-page/")
+        self.assertEqual(self.registry.requests['unresolved', 'other', 404], 2)
+        self.assertEqual({method for _, method, _ in self.registry.requests}, {'other'})
+
+    def test_endpoint_requires_token(self):
+        from django.test import override_settings
+
+        self.client.get("/track-query/?ref=UGC-1")
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            self.assertEqual(self.client.get("/metrics/").status_code, 403)
+            response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scrape-secret")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('ugc_http_requests_total{view="track_query",method="GET",status="404"} 1', body)
+        self.assertIn('ugc_db_queries_per_request_bucket{view="track_query",le="+Inf"} 1', body)
+
+
+# --- ASYNC PUBLIC VIEWS ---
+
+class AsyncPublicViewTests(TestCase):
+    def setUp(self):
+        from django.test import AsyncRequestFactory
+        from .throttling import throttle_cache
+        self.factory = AsyncRequestFactory()
+        throttle_cache().clear()
+        identity.students.invalidate()
+        StudentMaster.objects.create(index_number="UGC-STU-2026-001", full_name="Ama Mensah")
+
+    async def test_track_query_matches_sync_view(self):
+        from .views import atrack_query, track_query
+        from asgiref.sync import sync_to_async
+
+        ticket = await Ticket.objects.acreate(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        url = f"/track-query/?ref={ticket.formatted_id}"
+        expected = await sync_to_async(track_query)(RequestFactory().get(url))
+        response = await atrack_query(self.factory.get(url))
+        self.assertEqual(json.loads(response.content), json.loads(expected.content))
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+        revalidated = await atrack_query(self.factory.get(url, headers={'If-None-Match': response['ETag']}))
+        self.assertEqual(revalidated.status_code, 304)
+        missing = await atrack_query(self.factory.get("/track-query/?ref=UGC-0099999"))
+        self.assertEqual((missing.status_code, json.loads(missing.content)['error']), (404, 'Reference UGC-0099999 not found.'))
+
+    async def test_submit_ticket_creates_thread_and_queues_emails(self):
+        from .models import OutboundEmail
+        from .views import asubmit_ticket
+
+        payload = {
+            'name': "Ama", 'email': "ama@example.com", 'user_type': 'student', 'student_id': "ugc-stu-2026-001",
+            'department': 'Finance', 'subject': "Fees", 'message': "Balance",
+        }
+        response = await asubmit_ticket(self.factory.post('/api/save-ticket/', payload, content_type='application/json'))
+        self.assertEqual(response.status_code, 200)
+        ticket = await Ticket.objects.select_related('validated_student').aget(name="Ama")
+        self.assertEqual((ticket.user_type, ticket.validated_student.full_name), ('STUDENT', "Ama Mensah"))
+        self.assertEqual(await TicketMessage.objects.filter(ticket=ticket).acount(), 1)
+        self.assertEqual(await OutboundEmail.objects.acount(), 2)
+
+        payload['student_id'] = "UGC-STU-0000-000"
+        response = await asubmit_ticket(self.factory.post('/api/save-ticket/', payload, content_type='application/json'))
+        self.assertEqual((response.status_code, json.loads(response.content)['message']), (400, 'Invalid Student ID'))
+
+    async def test_submit_views_agree_on_every_identity_outcome(self):
+        from asgiref.sync import sync_to_async
+        from .throttling import throttle_cache
+        from .views import asubmit_ticket, submit_ticket
+
+        await StaffMaster.objects.acreate(staff_id="UGC-STF-00042", full_name="Kofi Boateng", email="kofi@ugc.edu.gh")
+        identity.staff.invalidate()
+        cases = [
+            ({'user_type': 'student', 'student_id': "UGC-STU-2026-001"}, 200, 'STUDENT'),
+            ({'user_type': 'student', 'student_id': "UGC-STU-0000-000"}, 400, 'Invalid Student ID'),
+            ({'user_type': 'staff', 'staff_id': "ugc-stf-00042"}, 200, 'STAFF'),
+            ({'user_type': 'staff', 'staff_id': "UGC-STF-99999"}, 400, 'Invalid Staff ID'),
+            ({'user_type': 'visitor', 'student_id': "UGC-STU-2026-001"}, 200, 'VISITOR'),
+        ]
+        for n, (claim, status, outcome) in enumerate(cases):
+            for view in (sync_to_async(submit_ticket), asubmit_ticket):
+                await sync_to_async(throttle_cache().clear)()
+                payload = {
+                    'name': "Ama", 'email': f"ama{n}@example.com", 'department': 'Finance',
+                    'subject': f"Fees {n} {view.__name__}", 'message': "Balance", **claim,
+                }
+                request = self.factory.post('/api/save-ticket/', payload, content_type='application/json')
+                response = await view(request)
+                body = json.loads(response.content)
+                self.assertEqual(response.status_code, status, (claim, body))
+                if status == 200:
+                    ticket = await Ticket.objects.aget(subject=payload['subject'])
+                    self.assertEqual(ticket.user_type, outcome)
+                else:
+                    self.assertEqual(body['message'], outcome)
+
+
+# --- SUBMISSION THROTTLING & DEDUPLICATION ---
+
+class SubmissionThrottleTests(TestCase):
+    def setUp(self):
+        from .throttling import throttle_cache
+        throttle_cache().clear()
+        self.payload = {
+            'name': "Kofi", 'email': "kofi@example.com", 'user_type': 'visitor',
+            'department': 'HR', 'subject': "Leave", 'message': "How many days do I have?",
+        }
+
+    def submit(self, **changes):
+        payload = {**self.payload, **changes}
+        return self.client.post('/api/save-ticket/', json.dumps(payload), content_type='application/json')
+
+    def test_resubmission_returns_existing_reference(self):
+        first = self.submit().json()
+        # Same text up to case and spacing; no second ticket and no further emails
+        second = self.submit(email="KOFI@example.com ", message="How many  days do I have?").json()
+        self.assertEqual(second['ref_id'], first['ref_id'])
+        self.assertTrue(second['duplicate'])
+        self.assertEqual(Ticket.objects.count(), 1)
+
+        Ticket.objects.update(created_at=timezone.now() - timedelta(minutes=11))
+        self.assertNotEqual(self.submit().json()['ref_id'], first['ref_id'])
+        self.assertEqual(Ticket.objects.count(), 2)
+
+    def test_email_bucket_limits_bursts(self):
+        from django.test import override_settings
+
+        with override_settings(SUBMISSION_EMAIL_BURST=2, SUBMISSION_EMAIL_REFILL_SECONDS=60):
+            self.assertEqual(self.submit(subject="One").status_code, 200)
+            self.assertEqual(self.submit(subject="Two").status_code, 200)
+            refused = self.submit(subject="Three")
+            self.assertEqual(refused.status_code, 429)
+            self.assertTrue(0 < int(refused['Retry-After']) <= 60)
+            # Another sender from the same address still gets through
+            self.assertEqual(self.submit(email="ama@example.com").status_code, 200)
+        self.assertEqual(Ticket.objects.count(), 3)
+
+    def test_forwarded_for_uses_the_entry_added_by_the_trusted_proxy(self):
+        from .throttling import client_ip
+
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.2.3.4, 198.51.100.7')
+        self.assertEqual(client_ip(request), '10.0.0.2')
+        with override_settings(THROTTLE_TRUST_X_FORWARDED_FOR=True):
+            # The leftmost entry is whatever the client sent
+            self.assertEqual(client_ip(request), '198.51.100.7')
+            with override_settings(THROTTLE_PROXY_HOPS=2):
+                self.assertEqual(client_ip(request), '1.2.3.4')
+            with override_settings(THROTTLE_PROXY_HOPS=3):
+                self.assertEqual(client_ip(request), '1.2.3.4')
+
+    def test_spoofed_forwarded_for_does_not_escape_the_ip_bucket(self):
+        with override_settings(THROTTLE_TRUST_X_FORWARDED_FOR=True, SUBMISSION_IP_BURST=2, SUBMISSION_IP_REFILL_SECONDS=60):
+            statuses = [
+                self.client.post(
+                    '/api/save-ticket/', json.dumps({**self.payload, 'email': f"bot{n}@example.com"}),
+                    content_type='application/json', HTTP_X_FORWARDED_FOR=f"10.9.9.{n}, 203.0.113.5",
+                ).status_code
+                for n in range(3)
+            ]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_bucket_refills_over_time(self):
+        from .throttling import TokenBucket
+
+        bucket = TokenBucket('test', capacity=1, refill_seconds=10)
+        self.assertEqual(bucket._take(None, 100.0), ((0, 100.0), 0))
+        self.assertEqual(bucket._take((0, 100.0), 104.0), (None, 6.0))
+        self.assertEqual(bucket._take((0, 100.0), 110.0), ((0, 110.0), 0))
+
+
+# --- ARCHIVE ---
+
+class TicketArchiveTests(TestCase):
+    def setUp(self):
+        from .services import post_reply
+
+        self.old = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance')
+        post_reply(self.old.id, "Officer", "Paid in full", is_staff=True)
+        post_reply(self.old.id, None, "Thanks", is_staff=False, parent_id=self.old.messages.last().id)
+        self.recent = Ticket.objects.create(name="Kofi", email="kofi@example.com", subject="Leave", message="Days?", status='Resolved')
+        self.open = Ticket.objects.create(name="Esi", email="esi@example.com", subject="Transcript", message="When?")
+        long_ago = timezone.now() - timedelta(days=400)
+        Ticket.objects.filter(id=self.old.id).update(status='Resolved', resolved_at=long_ago, created_at=long_ago - timedelta(days=2))
+        Ticket.objects.filter(id=self.open.id).update(created_at=long_ago, updated_at=long_ago)
+
+    def archive(self, **options):
+        from .archive import archive_resolved
+        return list(archive_resolved(365, **options))
+
+    def test_archives_old_resolved_tickets_with_their_threads(self):
+        from .models import ArchivedTicket
+
+        before = self.client.get(f"/track-query/?ref={self.old.formatted_id}&format=tree").json()
+        self.assertEqual(self.archive(), [(1, 3)])
+        self.assertEqual(set(Ticket.objects.values_list('id', flat=True)), {self.recent.id, self.open.id})
+        self.assertFalse(TicketMessage.objects.filter(ticket_id=self.old.id).exists())
+        self.assertEqual(ArchivedTicket.objects.get().messages.count(), 3)
+
+        response = self.client.get(f"/track-query/?ref={self.old.formatted_id}&format=tree")
+        after = response.json()
+        self.assertTrue(after.pop('archived'))
+        self.assertEqual(after, before)
+        self.assertEqual(self.client.get(f"/track-query/?ref={self.old.formatted_id}", HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_thread_is_removed_without_per_message_statements(self):
+        for n in range(20):
+            TicketMessage.objects.create(ticket=self.old, sender_name="Officer", message=f"Note {n}", is_staff=True)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.archive(), [(1, 23)])
+        thread_statements = [q['sql'] for q in ctx.captured_queries if '"tickets_ticketmessage"' in q['sql']]
+        # Read the thread, unlink stray replies from other tickets, delete it
+        self.assertEqual(len(thread_statements), 3)
+        self.assertFalse(TicketMessage.objects.filter(ticket_id=self.old.id).exists())
+
+    def test_compressed_thread_reads_back(self):
+        from .models import ArchivedTicket
+
+        before = self.client.get(f"/track-query/?ref={self.old.formatted_id}").json()
+        self.assertEqual(self.archive(compress=True, batch_size=1), [(1, 3)])
+        archived = ArchivedTicket.objects.get()
+        self.assertFalse(archived.messages.exists())
+        self.assertEqual([row['message'] for row in archived.thread_rows()], ["Balance", "Paid in full", "Thanks"])
+        after = self.client.get(f"/track-query/?ref={self.old.formatted_id}").json()
+        self.assertEqual(after['thread'], before['thread'])
+
+    def test_rebuilt_reports_keep_archived_history(self):
+        from .models import DepartmentDailyStats
+        from .reporting import rebuild_rollups
+
+        self.archive()
+        rebuild_rollups()
+        stats = DepartmentDailyStats.objects.get(department='Finance', day=timezone.localdate(timezone.now() - timedelta(days=402)))
+        self.assertEqual(stats.opened, 1)
+        resolved = DepartmentDailyStats.objects.get(department='Finance', day=timezone.localdate(timezone.now() - timedelta(days=400)))
+        self.assertEqual(resolved.resolved, 1)
+        self.assertEqual(sum(DepartmentDailyStats.objects.values_list('staff_replies', flat=True)), 1)
+
+
+# --- BULK UPDATES ---
+
+class BulkUpdateTests(TestCase):
+    def setUp(self):
+        self.finance = [
+            Ticket.objects.create(name=f"Student {i}", email=f"s{i}@example.com", subject="Fees", message="Balance", department='Finance')
+            for i in range(3)
+        ]
+        self.hr = Ticket.objects.create(name="Kofi", email="kofi@example.com", subject="Leave", message="Days?", department='HR')
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+
+    def bulk(self, **data):
+        return self.client.post('/api/tickets/bulk-update/', json.dumps(data), content_type='application/json')
+
+    def test_resolves_only_tickets_in_the_staff_department(self):
+        from .models import DepartmentDailyStats
+
+        ids = [t.id for t in self.finance] + [self.hr.id]
+        response = self.bulk(ticket_ids=ids, status='Resolved')
+        self.assertEqual(response.json()['updated'], [t.id for t in self.finance])
+        self.assertEqual(response.json()['skipped'], [self.hr.id])
+        self.assertEqual(set(Ticket.objects.filter(status='Resolved').values_list('id', flat=True)), {t.id for t in self.finance})
+        self.assertFalse(Ticket.objects.filter(status='Resolved', resolved_at__isnull=True).exists())
+        self.assertEqual(DepartmentDailyStats.objects.get(department='Finance').resolved, 3)
+
+        # Already resolved tickets are left alone and keep their resolution time
+        resolved_at = Ticket.objects.get(id=self.finance[0].id).resolved_at
+        response = self.bulk(ticket_ids=ids[:1], status='Resolved')
+        self.assertEqual(response.json()['unchanged'], ids[:1])
+        self.assertEqual(Ticket.objects.get(id=self.finance[0].id).resolved_at, resolved_at)
+
+    def test_transfer_is_one_update_with_one_alert_and_one_event_batch(self):
+        from .events import get_broker, BATCH_EVENT_TYPE
+        from .models import DepartmentDailyStats, OutboundEmail
+
+        ids = [t.id for t in self.finance]
+        published = []
+        broker = get_broker()
+        original, broker.publish = broker.publish, published.append
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as queries:
+                    self.bulk(ticket_ids=ids, department='HR', status='In-Progress')
+        finally:
+            broker.publish = original
+
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "tickets_ticket"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Ticket.objects.filter(department='HR', status='In-Progress').count(), 3)
+        self.assertEqual(OutboundEmail.objects.filter(subject__startswith="TRANSFER ALERT: [HR]").count(), 1)
+        self.assertEqual(DepartmentDailyStats.objects.get(department='Finance').transferred_out, 3)
+        self.assertEqual(DepartmentDailyStats.objects.get(department='HR').transferred_in, 3)
+
+        self.assertEqual(len(published), 1)
+        batch = published[0]
+        self.assertEqual((batch['type'], batch['departments']), (BATCH_EVENT_TYPE, ['Finance', 'HR']))
+        self.assertEqual({e['ticket_id'] for e in batch['events']}, set(ids))
+        self.assertEqual({e['type'] for e in batch['events']}, {'status_changed'})
+
+    def test_batches_are_split_and_scoped_per_department(self):
+        from .events import MAX_PAYLOAD_BYTES, build_batch_events, department_predicate, event_bytes, scoped_event
+
+        more = Ticket.objects.bulk_create([
+            Ticket(name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance') for _ in range(3)
+        ])
+        Ticket.objects.filter(department='Finance').update(message="x" * 2000, reply_message="y" * 2000)
+        changes = {t.id: ('ticket_updated', 'Finance') for t in self.finance + more}
+        changes[self.hr.id] = ('ticket_updated', 'HR')
+        batches = build_batch_events(changes)
+        self.assertGreater(len(batches), 1)
+        for batch in batches:
+            self.assertLessEqual(event_bytes(batch), MAX_PAYLOAD_BYTES)
+
+        for batch in batches:
+            if department_predicate('HR')(batch):
+                self.assertEqual([e['ticket_id'] for e in scoped_event(batch, 'HR')['events']], [self.hr.id])
+
+    def test_single_status_update_is_scoped_and_leaves_the_thread_summary(self):
+        from .services import post_reply
+
+        post_reply(self.finance[0].id, "Officer", "Noted", is_staff=True)
+        response = self.client.post(f"/update-status/{self.finance[0].id}/", json.dumps({'status': 'Resolved'}), content_type='application/json')
+        self.assertEqual(response.json()['status'], 'success')
+        ticket = Ticket.objects.get(id=self.finance[0].id)
+        self.assertEqual((ticket.status, ticket.message_count, ticket.last_reply_by), ('Resolved', 2, 'STAFF'))
+
+        response = self.client.post(f"/update-status/{self.hr.id}/", json.dumps({'status': 'Resolved'}), content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.bulk(ticket_ids=[self.hr.id], status='Closed').status_code, 400)
+
+
+# --- TRACKING CACHE ---
+
+class TrackingCacheTests(TestCase):
+    def setUp(self):
+        from .tracking import tracking_cache
+        tracking_cache().clear()
+        self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        self.url = f"/track-query/?ref={self.ticket.formatted_id}"
+
+    def track(self, **headers):
+        return self.client.get(self.url, headers=headers)
+
+    def cached_entry(self):
+        from .tracking import cache_key, tracking_cache
+        return tracking_cache().get(cache_key(self.ticket.id, False))
+
+    def test_matching_etag_is_answered_without_reading_the_thread(self):
+        first = self.track()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Cache-Control'], 'no-cache')
+        # Only the version stamp is read
+        with self.assertNumQueries(1):
+            response = self.track(**{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_unchanged_last_modified_is_answered_without_reading_the_thread(self):
+        first = self.track()
+        with self.assertNumQueries(1):
+            response = self.track(**{'If-Modified-Since': first['Last-Modified']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_repeat_requests_are_served_from_the_cache(self):
+        self.track()
+        self.assertIsNotNone(self.cached_entry())
+        with self.assertNumQueries(1):
+            self.assertEqual(self.track().status_code, 200)
+
+    def test_new_message_invalidates_the_entry(self):
+        first = self.track()
+        with self.captureOnCommitCallbacks(execute=True):
+            TicketMessage.objects.create(ticket=self.ticket, sender_name="Officer", message="Paid in full", is_staff=True)
+        self.assertIsNone(self.cached_entry())
+
+        response = self.track(**{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn("Paid in full", [m['message'] for m in response.json()['thread']])
+
+    def test_status_change_invalidates_the_entry(self):
+        first = self.track()
+        self.ticket.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket.status = 'Resolved'
+            self.ticket.save()
+        self.assertIsNone(self.cached_entry())
+
+        response = self.track(**{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['status'], 'Resolved')
+
+    def test_file_cache_evicts_least_recently_read(self):
+        import os
+        import tempfile
+        import time
+        from .cache import LRUFileBasedCache
+
+        with tempfile.TemporaryDirectory() as location:
+            lru = LRUFileBasedCache(location, {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+            now = time.time()
+            for age, key in ((30, 'a'), (20, 'b'), (10, 'c')):
+                lru.set(key, key)
+                os.utime(lru._key_to_file(key), (now - age, now - age))
+
+            # 'a' was written first but read last, so 'b' is the least recently used
+            self.assertEqual(lru.get('a'), 'a')
+            lru.set('d', 'd')
+            self.assertEqual({key: lru.get(key) for key in 'abcd'}, {'a': 'a', 'b': None, 'c': 'c', 'd': 'd'})
+
+
+# --- PAGE AND ROW CACHING ---
+
+# Tests run with DEBUG off and no collectstatic manifest, so pages resolve {% static %} without hashing
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class PageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_public_pages_are_cached_whole(self):
+        for path in ('/', '/public-enquiry/', '/track-enquiry/'):
+            first = self.client.get(path)
+            self.assertIn('public', first['Cache-Control'])
+            self.assertIn('max-age=', first['Cache-Control'])
+            self.assertNotIn(b'csrfmiddlewaretoken', first.content)
+            self.assertNotIn('Cookie', first.get('Vary', ''))
+            second = self.client.get(path)
+            self.assertEqual(second.templates, [])
+            self.assertEqual(second.content, first.content)
+
+        response = self.client.get('/csrf/')
+        self.assertEqual(response.status_code, 204)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_dashboard_rows_are_reused_until_the_ticket_changes(self):
+        from .services import post_reply
+
+        ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance')
+        _, reply = post_reply(ticket.id, "Officer", "Noted", is_staff=True)
+        user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        StaffProfile.objects.create(user=user, department='Finance')
+        self.client.force_login(user)
+
+        # Auth context stamp, user and staff profile (the session is cached at login), the page of (id, updated_at),
+        # then full rows for the misses; afterwards only the stamp and the page, with the context and rows from cache
+        with self.assertNumQueries(5):
+            self.client.get('/api/dashboard/tickets/')
+        with self.assertNumQueries(2):
+            rows = self.client.get('/api/dashboard/tickets/').json()['tickets']
+        self.assertEqual(rows[0]['reply_message'], "Noted")
+
+        # Editing a message refreshes the summary without moving updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            reply.message = "Noted, refund issued"
+            reply.save()
+        rows = self.client.get('/api/dashboard/tickets/').json()['tickets']
+        self.assertEqual(rows[0]['reply_message'], "Noted, refund issued")
+
+        response = self.client.get('/dashboard/')
+        self.assertContains(response, 'id="dashboard-config"')
+        self.assertNotIn(b'{{', response.content)
+
+
+# --- INCREMENTAL THREAD POLLING ---
+
+class ThreadPollingTests(TestCase):
+    def setUp(self):
+        from django.test import AsyncRequestFactory
+        self.factory = AsyncRequestFactory()
+        self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        self.user = User.objects.create_superuser('poll_admin', 'admin@ugc.edu.gh', 'pass')
+
+    def reply(self, text, is_staff=True):
+        return TicketMessage.objects.create(ticket=self.ticket, sender_name="Officer", message=text, is_staff=is_staff)
+
+    def test_since_returns_only_newer_messages(self):
+        self.client.force_login(self.user)
+        full = self.client.get(f"/get-messages/{self.ticket.id}/").json()
+        cursor = full['cursor']
+        self.assertEqual(cursor, full['messages'][-1]['id'])
+
+        self.assertEqual(self.client.get(f"/get-messages/{self.ticket.id}/?since={cursor}").json()['messages'], [])
+        first, second = self.reply("One"), self.reply("Two")
+        data = self.client.get(f"/get-messages/{self.ticket.id}/?since={cursor}").json()
+        self.assertEqual([m['message'] for m in data['messages']], ["One", "Two"])
+        self.assertEqual(data['cursor'], second.id)
+
+        # Public tracking: the current status and the new messages, from two queries
+        self.client.logout()
+        Ticket.objects.filter(id=self.ticket.id).update(status='In-Progress')
+        with self.assertNumQueries(2):
+            data = self.client.get(f"/track-query/?ref={self.ticket.formatted_id}&since={first.id}").json()
+        self.assertEqual((data['status'], [m['message'] for m in data['thread']], data['cursor']), ('In-Progress', ["Two"], second.id))
+        self.assertEqual(self.client.get(f"/track-query/?ref={self.ticket.formatted_id}&since=abc").status_code, 400)
+
+    def test_tracking_payload_carries_the_cursor(self):
+        last = self.reply("One")
+        data = self.client.get(f"/track-query/?ref={self.ticket.formatted_id}").json()
+        self.assertEqual(data['cursor'], last.id)
+
+    async def test_long_poll_is_released_by_a_new_message(self):
+        import asyncio
+        from asgiref.sync import sync_to_async
+        from .events import build_event, get_broker
+        from .views import atrack_query
+
+        cursor = await TicketMessage.objects.filter(ticket=self.ticket).values_list('id', flat=True).alast()
+        url = f"/track-query/?ref={self.ticket.formatted_id}&since={cursor}&wait=5"
+        poll = asyncio.ensure_future(atrack_query(self.factory.get(url)))
+        await asyncio.sleep(0.2)
+        self.assertFalse(poll.done())
+
+        await sync_to_async(self.reply)("Refund issued")
+        # Publishing normally waits for the commit that TestCase never makes
+        get_broker().publish(await sync_to_async(build_event)('new_reply', self.ticket.id))
+        response = await asyncio.wait_for(poll, 2)
+        data = json.loads(response.content)
+        self.assertEqual([m['message'] for m in data['thread']], ["Refund issued"])
+        self.assertTrue(data['long_poll'])
+
+    async def test_long_poll_times_out_empty(self):
+        from .views import aget_messages
+
+        cursor = await TicketMessage.objects.filter(ticket=self.ticket).values_list('id', flat=True).alast()
+        request = self.factory.get(f"/get-messages/{self.ticket.id}/?since={cursor}&wait=0.2")
+        async def auser():
+            return self.user
+        request.auser = auser
+        response = await aget_messages(request, self.ticket.id)
+        self.assertEqual(json.loads(response.content), {'messages': [], 'cursor': cursor, 'long_poll': True})
+
+
+# --- SOFT DELETE & PURGE ---
+
+class SoftDeleteTests(TestCase):
+    def setUp(self):
+        from .services import post_reply
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ugc.edu.gh', 'pass'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Hostel refund", message="Paid twice")
+            post_reply(self.ticket.id, "Officer", "Refund approved", is_staff=True)
+            post_reply(self.ticket.id, None, "Thanks", is_staff=False, parent_id=self.ticket.messages.last().id)
+            self.other = Ticket.objects.create(name="Kofi", email="kofi@example.com", subject="Hostel keys", message="Lost")
+
+    def delete(self, *tickets):
+        response = self.client.post(
+            '/bulk-delete-tickets/', json.dumps({'ticket_ids': [t.id for t in tickets]}), content_type='application/json',
+        )
+        self.assertEqual(response.json()['status'], 'deleted')
+        return response.json()
+
+    def age(self, ticket, days):
+        Ticket.all_objects.filter(id=ticket.id).update(deleted_at=timezone.now() - timedelta(days=days))
+
+    def test_deleted_ticket_is_hidden_but_kept(self):
+        from .search import search_tickets
+
+        self.assertEqual(self.delete(self.ticket)['ticket_ids'], [self.ticket.id])
+        self.assertFalse(Ticket.objects.filter(id=self.ticket.id).exists())
+        self.assertEqual(TicketMessage.objects.filter(ticket_id=self.ticket.id).count(), 3)
+        self.assertEqual(self.client.get(f"/track-query/?ref={self.ticket.formatted_id}").status_code, 404)
+        self.assertEqual(self.client.get(f"/get-messages/{self.ticket.id}/").status_code, 404)
+        self.assertEqual([d.ticket_id for d, _ in search_tickets("hostel")], [self.other.id])
+        self.assertEqual([t['id'] for t in self.client.get('/api/dashboard/tickets/').json()['tickets']], [self.other.id])
+
+    def test_restore_within_the_window_only(self):
+        self.delete(self.ticket, self.other)
+        self.age(self.other, 31)
+        response = self.client.post(
+            '/restore-tickets/', json.dumps({'ticket_ids': [self.ticket.id, self.other.id]}), content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'status': 'success', 'restored': [self.ticket.id], 'skipped': [self.other.id]})
+        self.assertEqual(list(Ticket.objects.values_list('id', flat=True)), [self.ticket.id])
+        self.assertEqual(self.client.get(f"/track-query/?ref={self.ticket.formatted_id}").json()['status'], 'Open')
+
+    def test_deletion_event_names_only_the_ids(self):
+        from .events import DELETED_EVENT_TYPE, department_predicate, get_broker
+
+        published = []
+        broker = get_broker()
+        original, broker.publish = broker.publish, published.append
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.delete(self.ticket, self.other)
+        finally:
+            broker.publish = original
+        self.assertEqual(len(published), 1)
+        self.assertEqual(published[0]['type'], DELETED_EVENT_TYPE)
+        self.assertEqual(published[0]['ticket_ids'], [self.ticket.id, self.other.id])
+        self.assertTrue(department_predicate('I.T.')(published[0]))
+        self.assertFalse(department_predicate('HR')(published[0]))
+
+    def test_purge_removes_expired_tickets_in_a_fixed_number_of_queries(self):
+        from django.core.management import call_command
+        from .models import TicketSearchDocument
+        from .purge import purge_deleted
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(20):
+                TicketMessage.objects.create(ticket=self.ticket, sender_name="Officer", message=f"Note {i}", is_staff=True)
+        self.delete(self.ticket, self.other)
+        self.age(self.ticket, 31)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(list(purge_deleted()), [(1, 23)])
+        self.assertLessEqual(len(queries), 12)
+        self.assertFalse(Ticket.all_objects.filter(id=self.ticket.id).exists())
+        self.assertFalse(TicketMessage.objects.filter(ticket_id=self.ticket.id).exists())
+        self.assertFalse(TicketSearchDocument.objects.filter(ticket_id=self.ticket.id).exists())
+        # Still inside the restore window
+        self.assertTrue(Ticket.all_objects.filter(id=self.other.id).exists())
+
+        out = StringIO()
+        call_command('purge_deleted_tickets', days=0, stdout=out)
+        self.assertIn("Purged 1 tickets and 1 messages.", out.getvalue())
+        self.assertFalse(Ticket.all_objects.exists())
+
+
+# --- READ REPLICA ROUTING ---
+
+@override_settings(REPLICA_DATABASES=['replica1', 'replica2'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def serve(self, request, write=False):
+        from django.db import router
+        from django.http import HttpResponse
+        from .middleware import ReplicaRoutingMiddleware
+
+        seen = []
+        def view(request):
+            seen.append((Ticket.objects.all().db, TicketMessage.objects.all().db))
+            if write:
+                router.db_for_write(TicketMessage)
+                seen.append((Ticket.objects.all().db, TicketMessage.objects.all().db))
+            return HttpResponse()
+        return ReplicaRoutingMiddleware(view)(request), seen
+
+    def test_outside_requests_everything_uses_the_primary(self):
+        self.assertEqual(Ticket.objects.all().db, 'default')
+
+    def test_a_request_reads_one_replica_until_it_writes(self):
+        response, seen = self.serve(RequestFactory().get('/track-query/'), write=True)
+        replica = seen[0][0]
+        self.assertIn(replica, ('replica1', 'replica2'))
+        self.assertEqual(seen, [(replica, replica), ('default', 'default')])
+        self.assertEqual(response.cookies['ugc_primary']['max-age'], 5)
+
+    def test_posts_and_pinned_browsers_read_the_primary(self):
+        response, seen = self.serve(RequestFactory().post('/user-reply/1/'))
+        self.assertEqual(seen, [('default', 'default')])
+        self.assertNotIn('ugc_primary', response.cookies)
+
+        request = RequestFactory().get('/track-query/')
+        request.COOKIES['ugc_primary'] = '1'
+        self.assertEqual(self.serve(request)[1], [('default', 'default')])
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas_nothing_is_pinned(self):
+        response, seen = self.serve(RequestFactory().get('/track-query/'), write=True)
+        self.assertEqual(seen[0], ('default', 'default'))
+        self.assertNotIn('ugc_primary', response.cookies)
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReadYourWritesTests(TestCase):
+    def test_reply_pins_the_tracking_reads_that_follow(self):
+        ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance")
+        response = self.client.post(f'/user-reply/{ticket.id}/', json.dumps({'message': "Any news?"}), content_type='application/json')
+        self.assertEqual(response.cookies['ugc_primary']['max-age'], 5)
+        # The test client sends the cookie back, as the browser would
+        data = self.client.get(f"/track-query/?ref={ticket.formatted_id}").json()
+        self.assertEqual(data['thread'][-1]['message'], "Any news?")
+
+
+# --- CACHED AUTH CONTEXT ---
+
+class AuthContextTests(TestCase):
+    def setUp(self):
+        self.ticket = Ticket.objects.create(name="Ama", email="ama@example.com", subject="Fees", message="Balance", department='Finance')
+        self.user = User.objects.create_user('finance', 'finance@ugc.edu.gh', 'pass')
+        self.profile = StaffProfile.objects.create(user=self.user, department='Finance', role='Officer')
+        self.client.force_login(self.user)
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        tables = ('"auth_user"', '"django_session"', '"tickets_staffprofile"', '"tickets_authcontextstamp"')
+        return [q['sql'] for q in ctx.captured_queries if any(table in q['sql'] for table in tables)]
+
+    def test_warm_requests_only_read_the_stamp(self):
+        self.assertEqual(len(self.auth_queries('/api/dashboard/tickets/')), 3)
+        for url in ('/api/dashboard/tickets/', f'/get-messages/{self.ticket.id}/'):
+            queries = self.auth_queries(url)
+            self.assertEqual(len(queries), 1)
+            self.assertIn('"tickets_authcontextstamp"', queries[0])
+
+    def test_change_made_by_another_worker_is_seen_through_the_stamp(self):
+        from .auth_context import bump_stamp
+
+        self.client.get('/api/dashboard/tickets/')
+        # Another worker deactivated the user: its cache invalidation never reached this process, the stamp did
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        bump_stamp()
+        self.assertEqual(self.client.get(f'/get-messages/{self.ticket.id}/').status_code, 403)
+
+    def test_per_process_caches_are_refused_with_several_workers(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from .auth_context import check_shared_caches
+
+        with override_settings(WEB_WORKERS=1):
+            check_shared_caches()
+        with override_settings(WEB_WORKERS=4), self.assertRaisesMessage(ImproperlyConfigured, "sessions cache is per process"):
+            check_shared_caches()
+
+    def test_profile_change_is_seen_on_the_next_request(self):
+        self.client.get('/api/dashboard/tickets/')
+        self.profile.department = 'HR'
+        self.profile.save()
+        self.assertEqual(self.client.get('/api/dashboard/tickets/').json()['tickets'], [])
+
+    def test_password_change_signs_out_older_sessions(self):
+        self.client.get('/api/dashboard/tickets/')
+        self.user.set_password('new-pass')
+        self.user.save()
+        self.assertEqual(self.client.get(f'/get-messages/{self.ticket.id}/').status_code, 403)
+
+
+# --- INBOUND EMAIL REPLIES ---
+
+class InboundEmailTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        self.ticket = Ticket.objects.create(name="Ama", email="Ama@example.com", subject="Fees", message="Balance", department='Finance')
+        Ticket.objects.filter(id=self.ticket.id).update(status='Resolved', resolved_at=timezone.now())
+        self.spool = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool.cleanup)
+
+    def reply(self, body, sender="ama@example.com", message_id=None, ref=None):
+        from email.message import EmailMessage
+
+        message = EmailMessage()
+        message['From'] = f"Ama <{sender}>"
+        message['Subject'] = f"Re: UGC Response: {ref or self.ticket.formatted_id}"
+        if message_id:
+            message['Message-ID'] = message_id
+        message.set_content(body)
+        return message
+
+    def maildir(self, *messages):
+        import mailbox
+        import os
+
+        box = mailbox.Maildir(os.path.join(self.spool.name, 'Maildir'))
+        for message in messages:
+            box.add(message)
+        return box
+
+    def ingest(self, path, **options):
+        from .inbound import ingest_spool
+
+        with self.captureOnCommitCallbacks(execute=True):
+            return list(ingest_spool(path, **options))
+
+    def test_replies_join_the_thread_without_quoted_text(self):
+        from .models import DepartmentDailyStats
+
+        body = "Still not refunded.\n\nOn Mon, 12 Oct 2026 at 09:14, UGC Support\n<support@ugc.edu.gh> wrote:\n> Hello Ama,\n> Refund approved\n"
+        box = self.maildir(self.reply(body, message_id='<1@mail>'), self.reply("Any update?\n-- \nAma", message_id='<2@mail>'))
+        outcomes = self.ingest(box._path, batch_size=1)
+        self.assertEqual([o['ACCEPTED'] for o in outcomes], [1, 1])
+
+        self.assertEqual(
+            sorted(self.ticket.messages.values_list('message', flat=True)),
+            ["Any update?", "Balance", "Still not refunded."],
+        )
+        ticket = Ticket.objects.get(id=self.ticket.id)
+        self.assertEqual((ticket.status, ticket.resolved_at, ticket.message_count, ticket.last_reply_by), ('Open', None, 3, 'USER'))
+        self.assertEqual(ticket.reply_message, self.ticket.messages.order_by('-created_at', '-id').first().message)
+        stats = DepartmentDailyStats.objects.get(department='Finance')
+        self.assertEqual((stats.user_replies, stats.reopened), (2, 1))
+
+    def test_rerun_and_duplicates_are_skipped(self):
+        box = self.maildir(self.reply("Hello?", message_id='<1@mail>'), self.reply("Hello?", message_id='<1@mail>'))
+        self.assertEqual(self.ingest(box._path), [{'ACCEPTED': 1, 'DUPLICATE': 1}])
+        self.assertEqual(self.ingest(box._path), [{'DUPLICATE': 2}])
+        self.assertEqual(self.ticket.messages.count(), 2)
+
+    def test_unmatched_messages_are_logged_not_added(self):
+        import mailbox
+        import os
+        from .models import InboundEmail
+
+        path = os.path.join(self.spool.name, 'replies.mbox')
+        box = mailbox.mbox(path)
+        box.add(self.reply("It's me", sender="someone@else.com"))
+        box.add(self.reply("Wrong ticket", ref="UGC-99999999"))
+        box.add(self.reply("> only quoted"))
+        box.add(self.reply("No reference", ref="enquiry"))
+        box.flush()
+
+        self.assertEqual(self.ingest(path), [{'SENDER_MISMATCH': 1, 'UNKNOWN_TICKET': 1, 'EMPTY': 1, 'NO_REFERENCE': 1}])
+        self.assertEqual(InboundEmail.objects.count(), 4)
+        self.assertEqual(self.ticket.messages.count(), 1)
+        self.assertEqual(Ticket.objects.get(id=self.ticket.id).status, 'Resolved')
+
+    def test_command_empties_a_maildir(self):
+        from django.core.management import call_command
+
+        box = self.maildir(*[self.reply(f"Reply {n}", message_id=f'<{n}@mail>') for n in range(5)])
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('ingest_email_replies', box._path, batch_size=2, delete=True, stdout=out)
+        self.assertIn("Added 5 replies from 5 messages.", out.getvalue())
+        self.assertEqual(len(box), 0)
+        self.assertEqual(Ticket.objects.get(id=self.ticket.id).message_count, 6)
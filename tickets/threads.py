@@ -0,0 +1,64 @@
+from .models import TicketMessage
+
+# Only the columns a thread payload needs; parent_id is read straight off the row
+THREAD_COLUMNS = ('id', 'parent_id', 'sender_name', 'message', 'is_staff', 'created_at')
+
+# Key names and timestamp formats each endpoint has always exposed
+PUBLIC_STYLE = {'sender_key': 'sender', 'time_key': 'timestamp', 'time_format': "%b %d, %Y %H:%M"}
+STAFF_STYLE = {'sender_key': 'sender_name', 'time_key': 'created_at', 'time_format': "%b %d, %H:%M"}
+
+
+def thread_rows(ticket_id):
+    return (
+        TicketMessage.objects.filter(ticket_id=ticket_id)
+        .order_by('created_at', 'id')
+        .values(*THREAD_COLUMNS)
+    )
+
+
+def thread_rows_since(ticket_id, since):
+    """Messages added after message `since` (an id cursor), oldest first; reads only the new rows."""
+    return (
+        TicketMessage.objects.filter(ticket_id=ticket_id, id__gt=since)
+        .order_by('id')
+        .values(*THREAD_COLUMNS)
+    )
+
+
+def thread_cursor(rows, since=0):
+    """The cursor a client polls with next: the newest message id it has seen."""
+    return max((row['id'] for row in rows), default=since)
+
+
+def serialize_thread(rows, style, nested=False):
+    """Serializes message rows in one pass with a single query.
+
+    Returns the flat, chronological list by default. With nested=True each
+    message carries a 'replies' list and only top-level messages are returned;
+    replies whose parent is missing from the thread are promoted to the top level.
+    """
+    sender_key, time_key, time_format = style['sender_key'], style['time_key'], style['time_format']
+    flat, roots, nodes = [], [], {}
+
+    for row in rows:
+        node = {
+            'id': row['id'],
+            sender_key: row['sender_name'],
+            'message': row['message'],
+            'is_staff': row['is_staff'],
+            'parent_id': row['parent_id'],
+            time_key: row['created_at'].strftime(time_format),
+        }
+        flat.append(node)
+        if not nested:
+            continue
+
+        node['replies'] = []
+        nodes[node['id']] = node
+        parent = nodes.get(row['parent_id'])
+        if parent is not None:
+            parent['replies'].append(node)
+        else:
+            roots.append(node)
+
+    return roots if nested else flat
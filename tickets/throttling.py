@@ -0,0 +1,94 @@
+import hashlib
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def throttle_cache():
+    return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'throttle')]
+
+
+class TokenBucket:
+    """Allows bursts of `capacity` requests, refilled at one token per `refill_seconds`.
+
+    The bucket's (tokens, timestamp) lives in the throttle cache, so it is
+    shared by every worker using the same backend. Read and write are not
+    atomic: concurrent requests for one key may both get the last token,
+    which is an acceptable overshoot for abuse protection.
+    """
+
+    def __init__(self, scope, capacity, refill_seconds):
+        self.scope = scope
+        self.capacity = capacity
+        self.refill_seconds = refill_seconds
+
+    def key(self, identifier):
+        digest = hashlib.sha1(identifier.lower().encode()).hexdigest()
+        return f"throttle:{self.scope}:{digest}"
+
+    def _take(self, state, now):
+        """(new state or None when refused, seconds until a token is available)."""
+        tokens, stamp = state if state else (self.capacity, now)
+        tokens = min(self.capacity, tokens + (now - stamp) / self.refill_seconds)
+        if tokens < 1:
+            return None, (1 - tokens) * self.refill_seconds
+        return (tokens - 1, now), 0
+
+    @property
+    def timeout(self):
+        # An idle bucket is full again after this long, so its entry can expire
+        return math.ceil(self.capacity * self.refill_seconds)
+
+    def take(self, identifier):
+        """Consumes a token; returns 0, or the seconds to wait when the bucket is empty."""
+        cache, key = throttle_cache(), self.key(identifier)
+        state, wait = self._take(cache.get(key), time.time())
+        if state is not None:
+            cache.set(key, state, self.timeout)
+        return wait
+
+    async def atake(self, identifier):
+        cache, key = throttle_cache(), self.key(identifier)
+        state, wait = self._take(await cache.aget(key), time.time())
+        if state is not None:
+            await cache.aset(key, state, self.timeout)
+        return wait
+
+
+def submission_buckets():
+    return (
+        TokenBucket('submit-ip', getattr(settings, 'SUBMISSION_IP_BURST', 30), getattr(settings, 'SUBMISSION_IP_REFILL_SECONDS', 6)),
+        TokenBucket('submit-email', getattr(settings, 'SUBMISSION_EMAIL_BURST', 5), getattr(settings, 'SUBMISSION_EMAIL_REFILL_SECONDS', 120)),
+    )
+
+
+def client_ip(request):
+    """The address to throttle on: REMOTE_ADDR, or the X-Forwarded-For entry the trusted proxies added.
+
+    Each proxy appends the address it received the request from, so only the
+    last THROTTLE_PROXY_HOPS entries are trustworthy; anything to their left
+    was sent by the client and could be anything.
+    """
+    if getattr(settings, 'THROTTLE_TRUST_X_FORWARDED_FOR', False):
+        entries = [e.strip() for e in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if e.strip()]
+        if entries:
+            hops = max(getattr(settings, 'THROTTLE_PROXY_HOPS', 1), 1)
+            return entries[-min(hops, len(entries))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def submission_retry_after(request, email):
+    """Seconds the client must wait before submitting again (0 when allowed), per IP and per email."""
+    ip_bucket, email_bucket = submission_buckets()
+    return ip_bucket.take(client_ip(request)) or email_bucket.take(email)
+
+
+async def asubmission_retry_after(request, email):
+    ip_bucket, email_bucket = submission_buckets()
+    return await ip_bucket.atake(client_ip(request)) or await email_bucket.atake(email)
+
+
+def dedup_minutes():
+    return getattr(settings, 'SUBMISSION_DEDUP_MINUTES', 10)
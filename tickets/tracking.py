@@ -0,0 +1,139 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Ticket, ArchivedTicket
+from .threads import PUBLIC_STYLE, serialize_thread, thread_cursor, thread_rows, thread_rows_since
+
+
+def tracking_cache():
+    return caches[getattr(settings, 'TRACKING_CACHE_ALIAS', 'tracking')]
+
+
+def cache_key(ticket_id, nested):
+    return f"track-query:{ticket_id}:{'tree' if nested else 'flat'}"
+
+
+def version_token(ticket_id, updated_at, archived=False):
+    """Changes whenever Ticket.updated_at moves, and when the ticket is archived; doubles as the ETag value."""
+    token = f"{ticket_id}-{int(updated_at.timestamp() * 1_000_000)}"
+    return f"{token}-archived" if archived else token
+
+
+def invalidate_tracking(*ticket_ids):
+    tracking_cache().delete_many([cache_key(ticket_id, nested) for ticket_id in ticket_ids for nested in (False, True)])
+
+
+def build_tracking_payload(ticket, nested=False, rows=None):
+    rows = list(thread_rows(ticket.id) if rows is None else rows)
+    return {
+        'id': ticket.id,
+        'ref_id': ticket.formatted_id,
+        'subject': ticket.subject,
+        'department': ticket.department,
+        'original_message': ticket.message,
+        'status': ticket.status,
+        'thread': serialize_thread(rows, PUBLIC_STYLE, nested=nested),
+        'cursor': thread_cursor(rows),
+        'reply_date': ticket.updated_at.strftime("%b %d, %Y") if ticket.updated_at else ""
+    }
+
+
+def delta_payload(ticket_id, status, rows, since, archived=False):
+    payload = {
+        'id': ticket_id,
+        'status': status,
+        'thread': serialize_thread(rows, PUBLIC_STYLE),
+        'cursor': thread_cursor(rows, since),
+    }
+    return {**payload, 'archived': True} if archived else payload
+
+
+def tracking_delta(ticket_id, since):
+    """Status plus the messages after `since`, for a polling tracking page; None for an unknown ticket.
+
+    Bypasses the payload cache: two small queries, whatever the thread length.
+    """
+    status = Ticket.objects.filter(id=ticket_id).values_list('status', flat=True).first()
+    if status is not None:
+        return delta_payload(ticket_id, status, list(thread_rows_since(ticket_id, since)), since)
+    ticket = ArchivedTicket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return None
+    rows = [row for row in ticket.thread_rows() if row['id'] > since]
+    return delta_payload(ticket_id, ticket.status, rows, since, archived=True)
+
+
+async def atracking_delta(ticket_id, since):
+    status = await Ticket.objects.filter(id=ticket_id).values_list('status', flat=True).afirst()
+    if status is not None:
+        rows = [row async for row in thread_rows_since(ticket_id, since)]
+        return delta_payload(ticket_id, status, rows, since)
+    return await sync_to_async(tracking_delta)(ticket_id, since)
+
+
+def tracking_version(ticket_id):
+    """(updated_at, archived) for a live or archived ticket; (None, False) when it exists in neither."""
+    updated_at = Ticket.objects.filter(id=ticket_id).values_list('updated_at', flat=True).first()
+    if updated_at is not None:
+        return updated_at, False
+    # The archive is only consulted after a miss on the live table
+    updated_at = ArchivedTicket.objects.filter(id=ticket_id).values_list('updated_at', flat=True).first()
+    return updated_at, updated_at is not None
+
+
+async def atracking_version(ticket_id):
+    updated_at = await Ticket.objects.filter(id=ticket_id).values_list('updated_at', flat=True).afirst()
+    if updated_at is not None:
+        return updated_at, False
+    updated_at = await ArchivedTicket.objects.filter(id=ticket_id).values_list('updated_at', flat=True).afirst()
+    return updated_at, updated_at is not None
+
+
+def build_archived_payload(ticket_id, nested=False):
+    ticket = ArchivedTicket.objects.get(id=ticket_id)
+    return {**build_tracking_payload(ticket, nested, rows=ticket.thread_rows()), 'archived': True}
+
+
+def get_tracking_payload(ticket_id, token, nested=False, archived=False):
+    """Returns the cached payload for this ticket version, rebuilding it on a miss.
+
+    Entries are stored with the version token they were built from, so a write
+    that bumps updated_at is never served stale even before invalidation runs.
+    """
+    cache = tracking_cache()
+    key = cache_key(ticket_id, nested)
+    entry = cache.get(key)
+    if entry and entry['token'] == token:
+        return entry['data']
+
+    if archived:
+        # Archived tickets never change, so the token they were requested with stays valid
+        data = build_archived_payload(ticket_id, nested)
+        cache.set(key, {'token': token, 'data': data})
+        return data
+
+    ticket = Ticket.objects.get(id=ticket_id)
+    data = build_tracking_payload(ticket, nested)
+    cache.set(key, {'token': version_token(ticket.id, ticket.updated_at), 'data': data})
+    return data
+
+
+async def aget_tracking_payload(ticket_id, token, nested=False, archived=False):
+    """get_tracking_payload() for async views, using the async cache and ORM APIs."""
+    cache = tracking_cache()
+    key = cache_key(ticket_id, nested)
+    entry = await cache.aget(key)
+    if entry and entry['token'] == token:
+        return entry['data']
+
+    if archived:
+        data = await sync_to_async(build_archived_payload)(ticket_id, nested)
+        await cache.aset(key, {'token': token, 'data': data})
+        return data
+
+    ticket = await Ticket.objects.aget(id=ticket_id)
+    rows = [row async for row in thread_rows(ticket.id)]
+    data = build_tracking_payload(ticket, nested, rows=rows)
+    await cache.aset(key, {'token': version_token(ticket.id, ticket.updated_at), 'data': data})
+    return data
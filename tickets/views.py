@@ -1,147 +1,333 @@
 import json
-import threading
+import math
 import re
+from datetime import datetime
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib import messages
-from django.core.mail import send_mail
+from django.middleware.csrf import get_token
 from django.conf import settings
-from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control, cache_page, never_cache
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.utils import timezone
-from django.db.models import OuterRef, Subquery
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare
+from django.utils.http import http_date, urlsafe_base64_encode, urlsafe_base64_decode
+from django.db import transaction
+from django.db.models import Q
 
 # NEW IMPORT FOR IFRAME FIX
 from django.views.decorators.clickjacking import xframe_options_exempt
 
 # Import your models
-from .models import Ticket, StaffProfile, StudentMaster, StaffMaster, TicketMessage
-
-# --- HELPER FUNCTION FOR FAST EMAILS ---
-def send_email_async(subject, email_body, recipient_list, fail_silently=False):
-    """Sends emails in a background thread without slowing down the user."""
-    if isinstance(recipient_list, str):
-        recipient_list = [recipient_list]
-        
-    thread = threading.Thread(
-        target=send_mail,
-        args=(subject, email_body, settings.DEFAULT_FROM_EMAIL, recipient_list),
-        kwargs={'fail_silently': fail_silently}
-    )
-    thread.start()
+from . import identity
+from .auth_context import staff_profile
+from .metrics import registry as metrics_registry
+from .events import department_predicate, get_broker, long_poll, scoped_event
+from .exports import EXPORT_FORMATS, astream, export_queryset, stream_export
+from .models import Ticket, TicketMessage, OutboundEmail
+from .reporting import REPORT_WINDOWS, build_report
+from .search import parse_query, search_tickets, snippet
+from .serializers import serialize_dashboard_row, serialize_dashboard_rows
+from .purge import restore_days
+from .services import TICKET_STATUSES, bulk_update_tickets, post_reply, restore_tickets, soft_delete_tickets
+from .throttling import asubmission_retry_after, dedup_minutes, submission_retry_after
+from .threads import STAFF_STYLE, serialize_thread, thread_cursor, thread_rows, thread_rows_since
+from .tracking import (
+    aget_tracking_payload, atracking_delta, atracking_version, get_tracking_payload, tracking_delta, tracking_version,
+    version_token,
+)
+
+def wants_tree(request):
+    """Thread endpoints return a nested reply tree with ?format=tree, a flat list otherwise."""
+    return request.GET.get('format') == 'tree'
+
+def poll_params(request):
+    """(since, wait) from ?since=<message id>&wait=<seconds>.
+
+    since is None for a full read; wait is capped at THREAD_LONG_POLL_SECONDS
+    and only honoured by the async views. Raises ValueError when malformed.
+    """
+    since = request.GET.get('since')
+    since = max(int(since), 0) if since not in (None, '') else None
+    limit = getattr(settings, 'THREAD_LONG_POLL_SECONDS', 25)
+    wait = min(max(float(request.GET.get('wait') or 0), 0), limit)
+    return since, wait
 
 # --- PUBLIC VIEWS ---
 
+def public_page(view):
+    """Caches a page that is the same for every visitor, and lets browsers and proxies keep it too.
+
+    Such pages must not touch the session or embed a CSRF token; forms on
+    them get the token cookie from csrf_cookie when they are submitted.
+    """
+    seconds = getattr(settings, 'PUBLIC_PAGE_CACHE_SECONDS', 600)
+    return cache_page(seconds, key_prefix='public-page')(cache_control(public=True)(view))
+
 @xframe_options_exempt
+@public_page
 def home(request):
     return render(request, 'index.html')
 
 @xframe_options_exempt
+@public_page
 def public_enquiry(request):
     return render(request, 'public_enquiry.html', {
         'public_depts': Ticket.DEPARTMENT_CHOICES
     })
 
 @xframe_options_exempt
+@public_page
 def track_status(request):
     return render(request, 'track_enquiry.html')
 
+@never_cache
+@ensure_csrf_cookie
+def csrf_cookie(request):
+    """Sets the CSRF cookie for forms on cached public pages."""
+    return HttpResponse(status=204)
+
+def parse_ref(request):
+    """Digits of ?ref=UGC-123 (the ticket id as typed), or None."""
+    match = re.search(r'\d+', request.GET.get('ref', '').strip())
+    return match.group() if match else None
+
+def tracking_response(request, ticket_id, updated_at, archived=False):
+    """(token, 304 response or None) for the ticket version stamped with updated_at."""
+    token = version_token(ticket_id, updated_at, archived)
+    not_modified = get_conditional_response(request, etag=f'"{token}"', last_modified=int(updated_at.timestamp()))
+    return token, not_modified
+
+def tracking_json(data, token, updated_at):
+    response = JsonResponse(data)
+    response['ETag'] = f'"{token}"'
+    response['Last-Modified'] = http_date(int(updated_at.timestamp()))
+    # Let browsers keep the copy but always revalidate it
+    response['Cache-Control'] = 'no-cache'
+    return response
+
 def track_query(request):
-    ref_number = request.GET.get('ref', '').strip()
-    match = re.search(r'\d+', ref_number)
-    
-    if not match:
+    ref = parse_ref(request)
+    if ref is None:
         return JsonResponse({'error': 'Invalid format. Enter a reference like UGC-123.'}, status=400)
-    
     try:
-        ticket_id = int(match.group())
-        ticket = Ticket.objects.get(id=ticket_id)
-        
-        messages_query = ticket.messages.all().order_by('created_at')
-        thread = []
-        for msg in messages_query:
-            thread.append({
-                'id': msg.id,
-                'sender': msg.sender_name,
-                'message': msg.message,
-                'is_staff': msg.is_staff,
-                'parent_id': msg.parent.id if msg.parent else None,
-                'timestamp': msg.created_at.strftime("%b %d, %Y %H:%M")
-            })
+        since, _ = poll_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since cursor.'}, status=400)
+
+    try:
+        ticket_id = int(ref)
+        if since is not None:
+            # Polling: only what was added after the client's cursor; a sync worker never holds the request
+            data = tracking_delta(ticket_id, since)
+            if data is None:
+                raise Ticket.DoesNotExist
+            return JsonResponse({**data, 'long_poll': False})
+
+        # Only the version stamp is read up front; unchanged threads end here with a 304
+        updated_at, archived = tracking_version(ticket_id)
+        if updated_at is None:
+            raise Ticket.DoesNotExist
+
+        token, not_modified = tracking_response(request, ticket_id, updated_at, archived)
+        if not_modified is not None:
+            return not_modified
+        data = get_tracking_payload(ticket_id, token, nested=wants_tree(request), archived=archived)
+        return tracking_json(data, token, updated_at)
+
+    except Ticket.DoesNotExist:
+        return JsonResponse({'error': f'Reference UGC-{ref} not found.'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': 'An internal error occurred.'}, status=500)
+
+async def atrack_query(request):
+    """track_query for the ASGI server: the same responses, awaiting the ORM and cache.
+
+    With ?since and ?wait a poll that finds nothing new is held until a
+    message (or status change) arrives for the ticket or the wait runs out.
+    """
+    ref = parse_ref(request)
+    if ref is None:
+        return JsonResponse({'error': 'Invalid format. Enter a reference like UGC-123.'}, status=400)
+    try:
+        since, wait = poll_params(request)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid since cursor.'}, status=400)
+
+    try:
+        ticket_id = int(ref)
+        if since is not None:
+            data = await long_poll(
+                ticket_id, lambda: atracking_delta(ticket_id, since), wait,
+                ready=lambda data: data is None or bool(data['thread']),
+            )
+            if data is None:
+                raise Ticket.DoesNotExist
+            return JsonResponse({**data, 'long_poll': bool(wait)})
+
+        updated_at, archived = await atracking_version(ticket_id)
+        if updated_at is None:
+            raise Ticket.DoesNotExist
 
-        data = {
-            'id': ticket.id,
-            'ref_id': ticket.formatted_id,
-            'subject': ticket.subject,
-            'department': ticket.department,
-            'original_message': ticket.message,
-            'status': ticket.status,
-            'thread': thread,
-            'reply_date': ticket.updated_at.strftime("%b %d, %Y") if ticket.updated_at else ""
-        }
-        return JsonResponse(data)
+        token, not_modified = tracking_response(request, ticket_id, updated_at, archived)
+        if not_modified is not None:
+            return not_modified
+        data = await aget_tracking_payload(ticket_id, token, nested=wants_tree(request), archived=archived)
+        return tracking_json(data, token, updated_at)
 
     except Ticket.DoesNotExist:
-        return JsonResponse({'error': f'Reference UGC-{match.group()} not found.'}, status=404)
+        return JsonResponse({'error': f'Reference UGC-{ref} not found.'}, status=404)
     except Exception as e:
         return JsonResponse({'error': 'An internal error occurred.'}, status=500)
 
+def read_submission(request):
+    """Intake form fields from a JSON or form POST; None when a required one is missing."""
+    if request.content_type == 'application/json':
+        data = json.loads(request.body)
+    else:
+        data = request.POST
+
+    fields = {
+        'name': data.get('name', '').strip(),
+        'email': data.get('email', '').strip(),
+        'phone': data.get('phone', ''),
+        'user_type': data.get('user_type', 'visitor').lower(),
+        'student_id': data.get('student_id', '').strip(),
+        'staff_id': data.get('staff_id', '').strip(),
+        'department': data.get('department'),
+        'subject': data.get('subject'),
+        'message': data.get('message'),
+    }
+    if not all(fields[name] for name in ('name', 'email', 'department', 'subject', 'message')):
+        return None
+    return fields
+
+# Submitter types whose ID must be on the master list: (identity index, form field, error message)
+CLAIMED_IDENTITIES = {
+    'student': (identity.students, 'student_id', 'Invalid Student ID'),
+    'staff': (identity.staff, 'staff_id', 'Invalid Staff ID'),
+}
+
+def claimed_identity(fields):
+    """(identity index, ID as typed) for a student or staff submission; (None, None) for a visitor."""
+    claim = CLAIMED_IDENTITIES.get(fields['user_type'])
+    if claim is None:
+        return None, None
+    index, field, _ = claim
+    return index, fields[field]
+
+def identity_pks(fields, validated_pk):
+    """(validated_student_pk, validated_staff_pk) from the index lookup, or a 400 response for an unknown ID."""
+    claim = CLAIMED_IDENTITIES.get(fields['user_type'])
+    if claim is None:
+        return None, None
+    if validated_pk is None:
+        return JsonResponse({'status': 'error', 'message': claim[2]}, status=400)
+    return (validated_pk, None) if fields['user_type'] == 'student' else (None, validated_pk)
+
+def ticket_values(fields, content_hash, validated_student_pk, validated_staff_pk):
+    """Ticket.objects.create() arguments for validated intake fields."""
+    final_user_type = 'STUDENT' if validated_student_pk else 'STAFF' if validated_staff_pk else 'VISITOR'
+    return dict(
+        name=fields['name'], email=fields['email'], phone=fields['phone'],
+        user_type=final_user_type,
+        student_id=fields['student_id'] if final_user_type == 'STUDENT' else None,
+        staff_id=fields['staff_id'] if final_user_type == 'STAFF' else None,
+        validated_student_id=validated_student_pk,
+        validated_staff_id=validated_staff_pk,
+        department=fields['department'], subject=fields['subject'], message=fields['message'], status='Open',
+        content_hash=content_hash,
+    )
+
+def submission_hash(fields):
+    return Ticket.compute_content_hash(fields['email'], fields['subject'], fields['message'])
+
+def throttled_response(wait):
+    response = JsonResponse(
+        {'status': 'error', 'message': 'Too many submissions. Please wait a moment and try again.'}, status=429
+    )
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+def duplicate_response(fields, ticket_id):
+    # The earlier submission already queued both emails; answer with its reference instead
+    return JsonResponse({
+        'status': 'success', 'name': fields['name'], 'ref_id': Ticket(id=ticket_id).formatted_id, 'duplicate': True,
+    })
+
+def created_response(ticket):
+    return JsonResponse({'status': 'success', 'name': ticket.name, 'ref_id': ticket.formatted_id})
+
+def confirmation_email(ticket):
+    user_subject = f"UGC Ticket Logged: {ticket.formatted_id}"
+    user_body = f"Dear {ticket.name},\n\nYour enquiry has been received.\nReference: {ticket.formatted_id}"
+    return user_subject, user_body, [ticket.email]
+
 def submit_ticket(request):
     if request.method == 'POST':
         try:
-            if request.content_type == 'application/json':
-                data = json.loads(request.body)
-            else:
-                data = request.POST
-
-            name = data.get('name', '').strip()
-            email = data.get('email', '').strip()
-            phone = data.get('phone', '')
-            raw_user_type = data.get('user_type', 'visitor').lower()
-            student_id = data.get('student_id', '').strip()
-            staff_id = data.get('staff_id', '').strip()
-            dept = data.get('department')
-            subj = data.get('subject')
-            msg = data.get('message')
-
-            if not all([name, email, dept, subj, msg]):
+            fields = read_submission(request)
+            if fields is None:
                 return JsonResponse({'status': 'error', 'message': 'Missing fields'}, status=400)
 
-            validated_student_obj = None
-            validated_staff_obj = None
-            final_user_type = 'VISITOR'
-
-            if raw_user_type == 'student':
-                try:
-                    student = StudentMaster.objects.get(index_number__iexact=student_id, is_active=True)
-                    validated_student_obj = student
-                    final_user_type = 'STUDENT'
-                except StudentMaster.DoesNotExist:
-                    return JsonResponse({'status': 'error', 'message': 'Invalid Student ID'}, status=400)
-
-            elif raw_user_type == 'staff':
-                try:
-                    staff = StaffMaster.objects.get(staff_id__iexact=staff_id, is_active=True)
-                    validated_staff_obj = staff
-                    final_user_type = 'STAFF'
-                except StaffMaster.DoesNotExist:
-                    return JsonResponse({'status': 'error', 'message': 'Invalid Staff ID'}, status=400)
-
-            ticket = Ticket.objects.create(
-                name=name, email=email, phone=phone,
-                user_type=final_user_type,
-                student_id=student_id if final_user_type == 'STUDENT' else None,
-                staff_id=staff_id if final_user_type == 'STAFF' else None,
-                validated_student=validated_student_obj,
-                validated_staff=validated_staff_obj,
-                department=dept, subject=subj, message=msg, status='Open'
-            )
+            wait = submission_retry_after(request, fields['email'])
+            if wait:
+                return throttled_response(wait)
+
+            index, claimed_id = claimed_identity(fields)
+            pks = identity_pks(fields, index.lookup(claimed_id) if index else None)
+            if isinstance(pks, JsonResponse):
+                return pks
 
-            user_subject = f"UGC Ticket Logged: {ticket.formatted_id}"
-            user_body = f"Dear {ticket.name},\n\nYour enquiry has been received.\nReference: {ticket.formatted_id}"
-            send_email_async(user_subject, user_body, [ticket.email])
+            content_hash = submission_hash(fields)
+            duplicate_id = Ticket.objects.recent_duplicates(content_hash, dedup_minutes()).values_list('id', flat=True).first()
+            if duplicate_id:
+                return duplicate_response(fields, duplicate_id)
 
-            return JsonResponse({'status': 'success', 'name': ticket.name, 'ref_id': ticket.formatted_id})
+            ticket = Ticket.objects.create(**ticket_values(fields, content_hash, *pks))
+            OutboundEmail.queue(*confirmation_email(ticket))
+
+            return created_response(ticket)
+        except Exception as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    return JsonResponse({'status': 'error', 'message': 'POST only'}, status=405)
+
+async def asubmit_ticket(request):
+    """submit_ticket for the ASGI server.
+
+    Known student/staff IDs validate on the event loop; the duplicate check,
+    the ticket insert (with its opening message and department alert) and
+    the confirmation email each take one trip to the database thread. Emails
+    are only queued here and delivered by the send_queued_emails worker.
+    """
+    if request.method == 'POST':
+        try:
+            fields = read_submission(request)
+            if fields is None:
+                return JsonResponse({'status': 'error', 'message': 'Missing fields'}, status=400)
+
+            wait = await asubmission_retry_after(request, fields['email'])
+            if wait:
+                return throttled_response(wait)
+
+            index, claimed_id = claimed_identity(fields)
+            pks = identity_pks(fields, await index.alookup(claimed_id) if index else None)
+            if isinstance(pks, JsonResponse):
+                return pks
+
+            content_hash = submission_hash(fields)
+            duplicate_id = await Ticket.objects.recent_duplicates(content_hash, dedup_minutes()).values_list('id', flat=True).afirst()
+            if duplicate_id:
+                return duplicate_response(fields, duplicate_id)
+
+            ticket = await Ticket.objects.acreate(**ticket_values(fields, content_hash, *pks))
+            await OutboundEmail.aqueue(*confirmation_email(ticket))
+
+            return created_response(ticket)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
     return JsonResponse({'status': 'error', 'message': 'POST only'}, status=405)
@@ -152,33 +338,62 @@ def submit_ticket(request):
 def get_messages(request, ticket_id):
     if not request.user.is_authenticated:
         return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
-    
-    ticket = get_object_or_404(Ticket, id=ticket_id)
-    messages_query = ticket.messages.all().order_by('created_at')
-    
-    msg_list = []
-    for m in messages_query:
-        msg_list.append({
-            'id': m.id,
-            'sender_name': m.sender_name,
-            'message': m.message,
-            'is_staff': m.is_staff,
-            'parent_id': m.parent.id if m.parent else None,
-            'created_at': m.created_at.strftime("%b %d, %H:%M")
-        })
-    return JsonResponse({'messages': msg_list})
+    try:
+        since, _ = poll_params(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid since cursor'}, status=400)
+
+    if not Ticket.objects.filter(id=ticket_id).exists():
+        raise Http404
+    if since is not None:
+        rows = list(thread_rows_since(ticket_id, since))
+        return JsonResponse({'messages': serialize_thread(rows, STAFF_STYLE), 'cursor': thread_cursor(rows, since), 'long_poll': False})
+
+    rows = list(thread_rows(ticket_id))
+    msg_list = serialize_thread(rows, STAFF_STYLE, nested=wants_tree(request))
+    return JsonResponse({'messages': msg_list, 'cursor': thread_cursor(rows)})
+
+async def aget_messages(request, ticket_id):
+    """get_messages for the ASGI server; ?since=<id>&wait=<seconds> long-polls for new messages."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    try:
+        since, wait = poll_params(request)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid since cursor'}, status=400)
+
+    if not await Ticket.objects.filter(id=ticket_id).aexists():
+        raise Http404
+    if since is not None:
+        async def fetch():
+            return [row async for row in thread_rows_since(ticket_id, since)]
+        rows = await long_poll(ticket_id, fetch, wait)
+        return JsonResponse({'messages': serialize_thread(rows, STAFF_STYLE), 'cursor': thread_cursor(rows, since), 'long_poll': bool(wait)})
+
+    rows = [row async for row in thread_rows(ticket_id)]
+    msg_list = serialize_thread(rows, STAFF_STYLE, nested=wants_tree(request))
+    return JsonResponse({'messages': msg_list, 'cursor': thread_cursor(rows)})
 
 @csrf_exempt
 def update_status(request, ticket_id):
     if request.method == 'POST' and request.user.is_authenticated:
+        scope = get_staff_scope(request.user)
+        if scope is None:
+            return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
         try:
             data = json.loads(request.body)
-            ticket = get_object_or_404(Ticket, id=ticket_id)
-            ticket.status = data.get('status')
-            ticket.save()
-            return JsonResponse({'status': 'success'})
-        except Exception as e:
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+        status = data.get('status')
+        if status not in TICKET_STATUSES:
+            return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+        tickets = scoped_tickets(scope).filter(id=ticket_id)
+        if not tickets.exists():
+            return JsonResponse({'status': 'error', 'message': 'Ticket not found'}, status=404)
+        # Writes status/resolved_at only, rather than saving the whole row
+        bulk_update_tickets(tickets, status=status)
+        return JsonResponse({'status': 'success'})
     return JsonResponse({'status': 'error'}, status=400)
 
 @csrf_exempt
@@ -187,8 +402,6 @@ def submit_reply(request, ticket_id):
         return JsonResponse({'status': 'error'}, status=403)
 
     if request.method == 'POST':
-        ticket = get_object_or_404(Ticket, id=ticket_id)
-        
         if request.content_type == 'application/json':
             data = json.loads(request.body)
             reply_text = data.get('message')
@@ -200,36 +413,28 @@ def submit_reply(request, ticket_id):
         if not reply_text:
             return JsonResponse({'status': 'error', 'message': 'Empty reply'}, status=400)
 
-        parent_msg = TicketMessage.objects.filter(id=parent_id).first() if parent_id else None
         actual_staff_name = request.user.get_full_name() or request.user.username
         
-        try:
-            user_profile = request.user.staffprofile
-            dept_display = "Super Admin" if user_profile.department == 'Super Command' else f"{user_profile.department} Dept"
-        except StaffProfile.DoesNotExist:
+        profile = staff_profile(request.user)
+        if profile is None:
             dept_display = "Management"
+        else:
+            dept_display = "Super Admin" if profile[0] == 'Super Command' else f"{profile[0]} Dept"
 
-        TicketMessage.objects.create(
-            ticket=ticket,
-            sender_name=actual_staff_name,
-            message=reply_text,
-            is_staff=True,
-            parent=parent_msg
-        )
-
-        ticket.updated_at = timezone.now()
-        ticket.save()
-
-        subject = f"UGC Response: {ticket.formatted_id}"
-        email_body = f"Hello {ticket.name},\n\nYou have a new response from {actual_staff_name} ({dept_display}).\n\n{reply_text}"
-        send_email_async(subject, email_body, [ticket.email], fail_silently=True)
+        try:
+            with transaction.atomic():
+                ticket, _ = post_reply(ticket_id, actual_staff_name, reply_text, is_staff=True, parent_id=parent_id)
+                subject = f"UGC Response: {ticket.formatted_id}"
+                email_body = f"Hello {ticket.name},\n\nYou have a new response from {actual_staff_name} ({dept_display}).\n\n{reply_text}"
+                OutboundEmail.queue(subject, email_body, [ticket.email])
+        except Ticket.DoesNotExist:
+            return JsonResponse({'status': 'error', 'message': 'Ticket not found'}, status=404)
 
         return JsonResponse({'status': 'success'})
 
 @csrf_exempt
 def user_reply(request, ticket_id):
     if request.method == 'POST':
-        ticket = get_object_or_404(Ticket, id=ticket_id)
         try:
             data = json.loads(request.body)
             reply_text = data.get('message', '').strip()
@@ -238,20 +443,12 @@ def user_reply(request, ticket_id):
             if not reply_text:
                 return JsonResponse({'status': 'error', 'message': 'Empty message'}, status=400)
 
-            parent_msg = TicketMessage.objects.filter(id=parent_id).first() if parent_id else None
-
-            TicketMessage.objects.create(
-                ticket=ticket, 
-                sender_name=ticket.name, 
-                message=reply_text, 
-                is_staff=False,
-                parent=parent_msg
-            )
-            
-            ticket.updated_at = timezone.now()
-            ticket.save()
+            # No sender name: the reply is signed with the name on the ticket
+            post_reply(ticket_id, None, reply_text, is_staff=False, parent_id=parent_id)
 
             return JsonResponse({'status': 'success'})
+        except Ticket.DoesNotExist:
+            return JsonResponse({'status': 'error', 'message': 'Ticket not found'}, status=404)
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
@@ -270,59 +467,307 @@ def logout_view(request):
     auth_logout(request)
     return redirect('home')
 
+# --- DASHBOARD SCOPE & PAGINATION HELPERS ---
+
+SUPER_COMMAND_LABEL = 'University-Wide (Super Command)'
+EVENT_HEARTBEAT_SECONDS = 20
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 200
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50
+BULK_UPDATE_LIMIT = 500
+REF_ID_PATTERN = re.compile(r'^(?:UGC-?)?0*(\d+)$', re.IGNORECASE)
+
+def get_staff_scope(user):
+    """Resolves which tickets a staff member may see.
+
+    Returns None when the user has no staff profile, otherwise a dict with the
+    department filter (None means university-wide), display label and role.
+    """
+    if user.is_superuser:
+        return {'department': None, 'display_dept': SUPER_COMMAND_LABEL, 'role': 'Admin', 'is_super': True}
+    profile = staff_profile(user)
+    if profile is None:
+        return None
+    department, role = profile
+    if department == 'Super Command':
+        return {'department': None, 'display_dept': SUPER_COMMAND_LABEL, 'role': role, 'is_super': True}
+    return {
+        'department': department,
+        'display_dept': department,
+        'role': role,
+        'is_super': False,
+    }
+
+def scoped_tickets(scope):
+    """Base ticket queryset restricted to the staff member's department."""
+    if scope['department'] is None:
+        return Ticket.objects.all()
+    return Ticket.objects.filter(department=scope['department'])
+
+def encode_cursor(ticket):
+    raw = f"{ticket.updated_at.isoformat()}|{ticket.id}"
+    return urlsafe_base64_encode(raw.encode())
+
+def decode_cursor(cursor):
+    """Returns (updated_at, id) from a keyset cursor or raises ValueError."""
+    try:
+        raw = urlsafe_base64_decode(cursor).decode()
+        stamp, ticket_id = raw.rsplit('|', 1)
+        updated_at = datetime.fromisoformat(stamp)
+        return updated_at, int(ticket_id)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def search_filter(term):
+    """Builds the free-text filter used by the dashboard search box."""
+    query = (
+        Q(name__icontains=term) | Q(subject__icontains=term) | Q(email__icontains=term) |
+        Q(student_id__icontains=term) | Q(staff_id__icontains=term)
+    )
+    ref_match = REF_ID_PATTERN.match(term)
+    if ref_match:
+        query |= Q(id=int(ref_match.group(1)))
+    return query
+
+def dashboard_queryset(scope, params):
+    """Filtered, keyset-ordered dashboard feed; raises ValueError for a malformed cursor."""
+    queryset = scoped_tickets(scope)
+
+    status = params.get('status', '').strip()
+    if status:
+        queryset = queryset.filter(status=status)
+
+    department = params.get('department', '').strip()
+    if department and scope['is_super']:
+        queryset = queryset.filter(department=department)
+
+    term = params.get('q', '').strip()
+    if term:
+        queryset = queryset.filter(search_filter(term))
+
+    cursor = params.get('cursor')
+    if cursor:
+        updated_at, last_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(updated_at__lt=updated_at) | Q(updated_at=updated_at, id__lt=last_id))
+
+    return queryset.order_by('-updated_at', '-id')
+
 def staff_dashboard(request):
     if not request.user.is_authenticated:
         return redirect('login')
-    
-    last_msg_subquery = TicketMessage.objects.filter(ticket=OuterRef('pk')).order_by('-created_at')
-    last_staff_subquery = TicketMessage.objects.filter(ticket=OuterRef('pk'), is_staff=True).order_by('-created_at')
-
-    tickets_base = Ticket.objects.annotate(
-        ann_message=Subquery(last_msg_subquery.values('message')[:1]),
-        ann_is_staff=Subquery(last_msg_subquery.values('is_staff')[:1]),
-        ann_staff_name=Subquery(last_staff_subquery.values('sender_name')[:1])
-    )
 
-    order_by = '-updated_at'
-    is_super = False
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return redirect('home')
+
+    # Rows are fetched page by page from dashboard_tickets; only the headline count is computed here.
+    return render(request, 'dashboard.html', {
+        'total_tickets': scoped_tickets(scope).count(),
+        'department': scope['display_dept'],
+        'role': scope['role'],
+        'is_super_command': scope['is_super'],
+        'dept_choices': Ticket.DEPARTMENT_CHOICES,
+        # Read by static/dashboard.js
+        'dashboard_config': {
+            'is_super_command': scope['is_super'],
+            'department': scope['department'],
+            'page_size': DASHBOARD_PAGE_SIZE,
+            'restore_days': restore_days(),
+            'csrf_token': get_token(request),
+        },
+    })
+
+def department_reports(request):
+    """Department performance over a recent window, read from the daily rollups."""
+    if not request.user.is_authenticated:
+        return redirect('login')
+
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return redirect('home')
 
-    if request.user.is_superuser:
-        is_super = True
-        queryset = tickets_base.all().order_by(order_by)
-        display_dept = 'University-Wide (Super Command)'
-        role = 'Admin'
+    all_departments = [value for value, _ in Ticket.DEPARTMENT_CHOICES]
+    if scope['is_super']:
+        selected = request.GET.get('department', '')
+        departments = [selected] if selected in all_departments else all_departments
     else:
-        try:
-            user_profile = request.user.staffprofile
-            if user_profile.department == 'Super Command':
-                is_super = True
-                queryset = tickets_base.all().order_by(order_by)
-                display_dept = "University-Wide (Super Command)"
-            else:
-                queryset = tickets_base.filter(department=user_profile.department).order_by(order_by)
-                display_dept = user_profile.department
-            role = user_profile.role
-        except StaffProfile.DoesNotExist:
-            return redirect('home')
-
-    for t in queryset:
-        t.last_reply_by = 'USER' if t.ann_is_staff == False else 'STAFF'
-        t.reply_message = t.ann_message
-        t.last_staff_name = t.ann_staff_name
+        selected = scope['department']
+        departments = [selected]
 
-    return render(request, 'dashboard.html', {
-        'tickets': queryset, 
-        'department': display_dept, 
-        'role': role,
-        'is_super_command': is_super 
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in REPORT_WINDOWS:
+        days = 30
+
+    return render(request, 'departments_reports.html', {
+        'report': build_report(departments, days=days),
+        'department': scope['display_dept'],
+        'is_super_command': scope['is_super'],
+        'dept_choices': Ticket.DEPARTMENT_CHOICES,
+        'selected_department': selected,
+        'days': days,
+        'windows': REPORT_WINDOWS,
     })
 
+def dashboard_tickets(request):
+    """Keyset-paginated, server-side filtered ticket feed for the staff dashboard."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
+
+    try:
+        queryset = dashboard_queryset(scope, request.GET)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', DASHBOARD_PAGE_SIZE)), 1), DASHBOARD_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = DASHBOARD_PAGE_SIZE
+
+    # Fetch one extra row to know whether another page exists; full rows come from the row cache.
+    page = list(queryset.only('id', 'updated_at')[:limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    return JsonResponse({
+        'tickets': serialize_dashboard_rows(page),
+        'next_cursor': encode_cursor(page[-1]) if has_more else None,
+    })
+
+def ticket_search(request):
+    """Ranked full-text search over subjects and whole conversation threads, scoped like the dashboard."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'status': 'error', 'message': 'Enter something to search for'}, status=400)
+
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), SEARCH_MAX_PAGE)
+    except ValueError:
+        page = 1
+
+    department = request.GET.get('department', '').strip() if scope['is_super'] else scope['department']
+    offset = (page - 1) * SEARCH_PAGE_SIZE
+    # One extra hit tells us whether another page exists
+    hits = search_tickets(
+        query, department=department or None, status=request.GET.get('status', '').strip() or None,
+        offset=offset, limit=SEARCH_PAGE_SIZE + 1,
+    )
+    has_more = len(hits) > SEARCH_PAGE_SIZE and page < SEARCH_MAX_PAGE
+
+    terms, phrases = parse_query(query)
+    results = []
+    for document, rank in hits[:SEARCH_PAGE_SIZE]:
+        row = serialize_dashboard_row(document.ticket)
+        row['rank'] = round(rank, 4)
+        row['snippet'] = snippet(document.body, [p.lower() for p in phrases] + terms)
+        results.append(row)
+
+    return JsonResponse({'results': results, 'page': page, 'next_page': page + 1 if has_more else None})
+
+async def dashboard_events(request):
+    """Server-sent event stream of ticket activity in the staff member's department (ASGI only)."""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'status': 'error', 'message': 'Live updates require the ASGI server'}, status=501)
+
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    scope = await sync_to_async(get_staff_scope)(user)
+    if scope is None:
+        return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
+
+    subscription = get_broker().subscribe(department_predicate(scope['department']))
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                event = await subscription.get(timeout=EVENT_HEARTBEAT_SECONDS)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                event = scoped_event(event, scope['department'])
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def export_tickets(request):
+    """Streams tickets as CSV or JSON Lines; ?department, ?status, ?from/?to (YYYY-MM-DD), ?threads=1."""
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
+
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({'status': 'error', 'message': 'Format must be csv or jsonl'}, status=400)
+
+    # Department staff only ever export their own department
+    department = request.GET.get('department') if scope['is_super'] else scope['department']
+    threads = request.GET.get('threads') in ('1', 'true')
+    try:
+        queryset = export_queryset(
+            department=department,
+            status=request.GET.get('status'),
+            date_from=request.GET.get('from'),
+            date_to=request.GET.get('to'),
+        )
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+
+    # The stream is read after the request's routing has ended, so the database is chosen now
+    queryset = queryset.using(queryset.db)
+    chunks = stream_export(export_format, queryset, threads=threads)
+    if isinstance(request, ASGIRequest):
+        chunks = astream(chunks)
+
+    spec = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(chunks, content_type=spec['content_type'])
+    filename = f"ugc-tickets-{timezone.localdate():%Y%m%d}.{spec['extension']}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def metrics(request):
+    """Prometheus scrape endpoint: `Authorization: Bearer <METRICS_TOKEN>`, or a signed-in superuser."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    if not ((token and constant_time_compare(supplied, token)) or request.user.is_superuser):
+        return JsonResponse({'status': 'error', 'message': 'Unauthorized'}, status=403)
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @csrf_exempt
 def delete_ticket(request, ticket_id):
     if request.user.is_authenticated:
-        ticket = get_object_or_404(Ticket, id=ticket_id)
-        ticket.delete()
-        return JsonResponse({'status': 'deleted', 'message': 'Ticket purged.'})
+        if not soft_delete_tickets(Ticket.objects.filter(id=ticket_id)):
+            raise Http404("No Ticket matches the given query.")
+        return JsonResponse({
+            'status': 'deleted', 'message': f'Ticket deleted. It can be restored for {restore_days()} days.',
+            'ticket_ids': [ticket_id], 'restore_days': restore_days(),
+        })
     return JsonResponse({'status': 'error'}, status=403)
 
 @csrf_exempt
@@ -330,9 +775,69 @@ def bulk_delete_tickets(request):
     if request.method == 'POST' and request.user.is_authenticated:
         try:
             data = json.loads(request.body)
-            ticket_ids = data.get('ticket_ids', [])
-            Ticket.objects.filter(id__in=ticket_ids).delete()
-            return JsonResponse({'status': 'deleted', 'message': f'Deleted {len(ticket_ids)} tickets.'})
+            ticket_ids = [int(i) for i in data.get('ticket_ids', [])]
+            deleted = soft_delete_tickets(Ticket.objects.filter(id__in=ticket_ids))
+            return JsonResponse({
+                'status': 'deleted', 'message': f'Deleted {len(deleted)} tickets.',
+                'ticket_ids': deleted, 'restore_days': restore_days(),
+            })
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
-    return JsonResponse({'status': 'error'}, status=405)
\ No newline at end of file
+    return JsonResponse({'status': 'error'}, status=405)
+
+@csrf_exempt
+def restore_deleted_tickets(request):
+    """Undoes deletions made within the last TICKET_RESTORE_DAYS; ids past that (or never deleted) are skipped."""
+    if request.method != 'POST' or not request.user.is_authenticated:
+        return JsonResponse({'status': 'error'}, status=405)
+    try:
+        ticket_ids = {int(i) for i in json.loads(request.body).get('ticket_ids', [])}
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
+    if len(ticket_ids) > BULK_UPDATE_LIMIT:
+        return JsonResponse({'status': 'error', 'message': f'At most {BULK_UPDATE_LIMIT} tickets per request'}, status=400)
+
+    restored = restore_tickets(ticket_ids)
+    return JsonResponse({'status': 'success', 'restored': restored, 'skipped': sorted(ticket_ids - set(restored))})
+
+@csrf_exempt
+def bulk_update(request):
+    """Changes the status and/or department of many tickets at once.
+
+    Non-Super Command staff can only act on tickets in their own department;
+    ids outside that scope (or unknown) are reported back as skipped.
+    """
+    if request.method != 'POST' or not request.user.is_authenticated:
+        return JsonResponse({'status': 'error'}, status=405)
+    scope = get_staff_scope(request.user)
+    if scope is None:
+        return JsonResponse({'status': 'error', 'message': 'No staff profile'}, status=403)
+
+    try:
+        data = json.loads(request.body)
+        ticket_ids = {int(i) for i in data.get('ticket_ids', [])}
+    except (ValueError, TypeError):
+        return JsonResponse({'status': 'error', 'message': 'Invalid request'}, status=400)
+    status = data.get('status') or None
+    department = data.get('department') or None
+
+    if not ticket_ids:
+        return JsonResponse({'status': 'error', 'message': 'No tickets selected'}, status=400)
+    if len(ticket_ids) > BULK_UPDATE_LIMIT:
+        return JsonResponse({'status': 'error', 'message': f'At most {BULK_UPDATE_LIMIT} tickets per request'}, status=400)
+    if status is None and department is None:
+        return JsonResponse({'status': 'error', 'message': 'Nothing to change'}, status=400)
+    if status is not None and status not in TICKET_STATUSES:
+        return JsonResponse({'status': 'error', 'message': 'Invalid status'}, status=400)
+    if department is not None and department not in dict(Ticket.DEPARTMENT_CHOICES):
+        return JsonResponse({'status': 'error', 'message': 'Invalid department'}, status=400)
+
+    tickets = scoped_tickets(scope).filter(id__in=ticket_ids)
+    allowed = set(tickets.values_list('id', flat=True))
+    updated = bulk_update_tickets(tickets, status=status, department=department)
+    return JsonResponse({
+        'status': 'success',
+        'updated': updated,
+        'unchanged': sorted(allowed - set(updated)),
+        'skipped': sorted(ticket_ids - allowed),
+    })